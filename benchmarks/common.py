@@ -0,0 +1,109 @@
+"""
+Helpers shared by the benchmarks.
+
+The benchmarks run against the database configured on the .env file.
+Just like the test suite, everything they write is done inside an
+outer transaction that is rolled back at the end, so no data is kept.
+"""
+
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+from uuid import uuid4
+
+from sqlalchemy import insert
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from pydo.extensions import db, password_hasher
+from pydo.factory import create_app
+from pydo.models import User, Task
+
+STATUSES = ['pending', 'in_progress', 'completed']
+
+
+@contextmanager
+def benchmark_session():
+    """
+    Provides an app context with a database session wrapped in an outer
+    transaction, which is rolled back on exit (see "db_session" on conftest.py).
+    """
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        connection = db.engine.connect()
+        transaction = connection.begin()
+
+        session = scoped_session(sessionmaker(bind=connection))
+        db.session = session
+
+        try:
+            yield session
+        finally:
+            session.remove()
+            transaction.rollback()
+            connection.close()
+
+
+def seed_users(count: int) -> List[User]:
+    password_hash = password_hasher.hash('12345678')
+    users = [
+        User(
+            username=f'benchmark_user_{index}',
+            email=f'benchmark_user_{index}@pydo.com',
+            password_hash=password_hash,
+        )
+        for index in range(count)
+    ]
+    db.session.add_all(users)
+    db.session.commit()
+    return users
+
+
+def seed_tasks(count: int, users: List[User]) -> None:
+    """
+    Insert "count" tasks, spread across the users, statuses and due dates.
+    """
+    reference_date = datetime(2025, 1, 1, 8, 0, 0)
+    now = datetime.utcnow()
+    batch_size = 10_000
+    for batch_start in range(0, count, batch_size):
+        batch = []
+        for index in range(batch_start, min(batch_start + batch_size, count)):
+            batch.append(
+                {
+                    'uuid': uuid4(),
+                    'user_uuid': users[index % len(users)].uuid,
+                    'title': f'Task {index}',
+                    'description': f'Description of the task number {index}',
+                    'status': STATUSES[index % len(STATUSES)],
+                    'due_date': reference_date + timedelta(minutes=index),
+                    'created_at': now,
+                    'last_updated_at': now,
+                }
+            )
+        db.session.execute(insert(Task), batch)
+    db.session.commit()
+
+
+def measure(function: Callable, repeat: int = 3) -> Dict:
+    """
+    Run function "repeat" times, returning its best wall time (in seconds)
+    and the peak of memory allocated by python while running it (in bytes).
+    """
+    best_time = None
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+
+    db.session.expunge_all()
+    tracemalloc.start()
+    function()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'seconds': best_time, 'peak_memory': peak_memory}
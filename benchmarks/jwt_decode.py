@@ -0,0 +1,78 @@
+"""
+Measure the cost of verifying the access token of a request, with and without
+the cache of the verified tokens (see "CachedJWTManager" on extensions.py):
+decoding the token alone ("decode_token") and everything "jwt_required" does
+("verify_jwt_in_request"), for a client sending the same token on every request.
+
+This benchmark does not need the database.
+
+Usage (from the project root):
+
+    $ python -m benchmarks.jwt_decode
+
+Results on a development machine (python 3.11, PyJWT 2.10), best of 5 runs:
+
+    operation                   uncached (us)    cached (us)
+    decode_token                         87.2            2.9
+    verify_jwt_in_request               142.3           51.0
+"""
+
+import time
+from datetime import timedelta
+from typing import Callable
+from uuid import uuid4
+
+from flask_jwt_extended import (
+    create_access_token,
+    decode_token,
+    verify_jwt_in_request,
+)
+
+from pydo.extensions import jwt_decode_cache
+from pydo.factory import create_app
+
+CALLS = 20_000
+REPEAT = 5
+
+
+def microseconds_per_call(function: Callable) -> float:
+    best_time = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        for _ in range(CALLS):
+            function()
+        elapsed = time.perf_counter() - start
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+    return best_time / CALLS * 1_000_000
+
+
+def run():
+    app = create_app()
+    max_size = jwt_decode_cache.max_size
+
+    with app.app_context():
+        token = create_access_token(
+            identity=str(uuid4()), expires_delta=timedelta(hours=1)
+        )
+
+    headers = {'Authorization': f'Bearer {token}'}
+    with app.test_request_context('/tasks', headers=headers):
+        operations = {
+            'decode_token': lambda: decode_token(token),
+            'verify_jwt_in_request': verify_jwt_in_request,
+        }
+
+        print(f'{"operation":<24} {"uncached (us)":>16} {"cached (us)":>14}')
+        for name, function in operations.items():
+            jwt_decode_cache.clear()
+            jwt_decode_cache.max_size = 0
+            uncached = microseconds_per_call(function)
+
+            jwt_decode_cache.max_size = max_size
+            cached = microseconds_per_call(function)
+
+            print(f'{name:<24} {uncached:>16.1f} {cached:>14.1f}')
+
+
+if __name__ == '__main__':
+    run()
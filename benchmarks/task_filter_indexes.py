@@ -0,0 +1,96 @@
+"""
+Measure the filter shapes of "Task.filter_by" / "Task.filter_page" on a large
+task table, without and with the indexes declared on the Task model.
+
+Usage (from the project root):
+
+    $ python -m benchmarks.task_filter_indexes
+
+Results on a development machine (PostgreSQL 16, python 3.11),
+500k tasks spread across 1000 users (ms per query):
+
+    filter                      no indexes   indexes
+    user                             74.44     11.64
+    user + open status               91.51      9.45
+    user + status + due date         78.88      2.85
+    due date range                  250.68    177.60
+    first page (keyset)             282.27      1.44
+
+"due date range" matches ~10k tasks, so most of its time is spent
+transferring and building the rows, not finding them.
+"""
+
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from pydo.extensions import db
+from pydo.models import Task
+
+from benchmarks.common import benchmark_session, seed_tasks, seed_users
+
+TASKS_COUNT = 500_000
+USERS_COUNT = 1_000
+REPEAT = 20
+
+
+def get_filter_shapes(user_uuid):
+    start_due_date = datetime(2025, 3, 1)
+    end_due_date = datetime(2025, 3, 8)
+    return {
+        'user': lambda: Task.filter_by(user_uuids=[user_uuid], read_only=True),
+        'user + open status': lambda: Task.filter_by(
+            user_uuids=[user_uuid], status=['pending', 'in_progress'], read_only=True
+        ),
+        'user + status + due date': lambda: Task.filter_by(
+            user_uuids=[user_uuid],
+            status=['pending'],
+            start_due_date=start_due_date,
+            end_due_date=end_due_date,
+            read_only=True,
+        ),
+        'due date range': lambda: Task.filter_by(
+            start_due_date=start_due_date, end_due_date=end_due_date, read_only=True
+        ),
+        'first page (keyset)': lambda: Task.filter_page(limit=20, read_only=True),
+    }
+
+
+def measure_shapes(filter_shapes):
+    timings = {}
+    for name, run_query in filter_shapes.items():
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            run_query()
+        timings[name] = (time.perf_counter() - start) * 1000 / REPEAT
+    return timings
+
+
+def run():
+    with benchmark_session():
+        users = seed_users(count=USERS_COUNT)
+        seed_tasks(count=TASKS_COUNT, users=users)
+        filter_shapes = get_filter_shapes(user_uuid=users[0].uuid)
+
+        indexes = Task.__table__.indexes
+        for index in indexes:
+            index.drop(bind=db.session.connection())
+        db.session.execute(text('ANALYZE task'))
+        timings_without_indexes = measure_shapes(filter_shapes)
+
+        for index in indexes:
+            index.create(bind=db.session.connection())
+        db.session.execute(text('ANALYZE task'))
+        timings_with_indexes = measure_shapes(filter_shapes)
+
+    print(f'{"filter":<26} {"no indexes":>11} {"indexes":>9}')
+    for name in filter_shapes:
+        print(
+            f'{name:<26} {timings_without_indexes[name]:>11.2f} '
+            f'{timings_with_indexes[name]:>9.2f}'
+        )
+
+
+if __name__ == '__main__':
+    run()
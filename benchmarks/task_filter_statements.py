@@ -0,0 +1,116 @@
+"""
+Measure how "Task.filter_by" queries are built and compiled for random
+combinations of its filters, with lists of varying lengths.
+
+For each combination, it measures:
+- building the query (see "Task.build_filter_query");
+- compiling its statement (without SQLAlchemy's compiled cache);
+- running it through "Task.filter_by" on an empty table (with the compiled cache).
+
+It also counts the distinct statements sent to the database, since SQLAlchemy
+compiles (and caches) each one separately. PostgreSQL parses and plans every
+query anyway, since psycopg2 interpolates the parameters on the client.
+
+Usage (from the project root):
+
+    $ python -m benchmarks.task_filter_statements
+
+Results on a development machine (PostgreSQL 16, python 3.11),
+2000 filter combinations (best of 3 runs):
+
+                                  IN (...)    = ANY(:array)
+    build (µs/query)                 265.0            167.0
+    compile (µs/query)               977.9            748.0
+    filter_by, cached (µs/query)    1516.5           1054.9
+    distinct statements                727               32
+
+"IN (...)" was the previous implementation, with "=" for single values and
+"IN (...)" for lists.
+"""
+
+import time
+from datetime import datetime
+from random import Random
+from uuid import uuid4
+
+from pydo.extensions import db
+from pydo.models import TASK_STATUSES, Task
+
+from benchmarks.common import benchmark_session
+
+COMBINATIONS_COUNT = 2000
+
+
+def get_filter_combinations():
+    random = Random(42)
+    combinations = []
+    for _ in range(COMBINATIONS_COUNT):
+        filters = {}
+        if random.random() < 0.8:
+            filters['user_uuids'] = [uuid4() for _ in range(random.randint(1, 10))]
+        if random.random() < 0.3:
+            filters['uuids'] = [uuid4() for _ in range(random.randint(1, 20))]
+        if random.random() < 0.6:
+            filters['status'] = random.sample(TASK_STATUSES, random.randint(1, 3))
+        if random.random() < 0.4:
+            filters['start_due_date'] = datetime(2025, 1, random.randint(1, 31))
+        if random.random() < 0.4:
+            filters['end_due_date'] = datetime(2025, 2, random.randint(1, 28))
+        combinations.append(filters)
+    return combinations
+
+
+def best_time(function, repeat: int = 3) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run():
+    combinations = get_filter_combinations()
+
+    with benchmark_session():
+        dialect = db.engine.dialect
+
+        def build_queries():
+            return [
+                Task.select_for_listing(
+                    Task.build_filter_query(**filters), read_only=True
+                )
+                for filters in combinations
+            ]
+
+        def compile_queries():
+            return [
+                query.statement.compile(
+                    dialect=dialect, compile_kwargs={'render_postcompile': True}
+                )
+                for query in queries
+            ]
+
+        def run_filter_by():
+            for filters in combinations:
+                Task.filter_by(read_only=True, **filters)
+
+        build_time = best_time(build_queries)
+        queries = build_queries()
+        compile_time = best_time(compile_queries)
+        compiled_statements = compile_queries()
+        filter_by_time = best_time(run_filter_by)
+
+    distinct_statements = {str(statement) for statement in compiled_statements}
+
+    print(f'{"build (µs/query)":<30} {build_time * 1e6 / COMBINATIONS_COUNT:>8.1f}')
+    print(f'{"compile (µs/query)":<30} {compile_time * 1e6 / COMBINATIONS_COUNT:>8.1f}')
+    print(
+        f'{"filter_by, cached (µs/query)":<30} '
+        f'{filter_by_time * 1e6 / COMBINATIONS_COUNT:>8.1f}'
+    )
+    print(f'{"distinct statements":<30} {len(distinct_statements):>8}')
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,59 @@
+"""
+Compare listing tasks through Task instances against the read-only rows
+returned by "Task.filter_by(read_only=True)".
+
+Each case filters all tasks and formats them with "format_list_of_tasks",
+which is what GET /tasks does.
+
+Usage (from the project root):
+
+    $ python -m benchmarks.task_listing
+
+Results on a development machine (PostgreSQL 16, python 3.11):
+
+        rows       mode   µs/row  peak bytes/row
+       10000        orm     49.1            2106
+       10000  read_only     30.2            1318
+      100000        orm     53.7            2115
+      100000  read_only     36.1            1296
+"""
+
+from pydo.commons import format_list_of_tasks
+from pydo.models import Task
+
+from benchmarks.common import (
+    STATUSES,
+    benchmark_session,
+    measure,
+    seed_tasks,
+    seed_users,
+)
+
+ROWS_COUNTS = [10_000, 100_000]
+
+
+def list_tasks(read_only: bool):
+    # filtering by every status matches all tasks
+    tasks = Task.filter_by(status=STATUSES, read_only=read_only)
+    return format_list_of_tasks(tasks=tasks)
+
+
+def run():
+    print(f'{"rows":>8} {"mode":>10} {"µs/row":>8} {"peak bytes/row":>15}')
+    for rows_count in ROWS_COUNTS:
+        with benchmark_session():
+            users = seed_users(count=10)
+            seed_tasks(count=rows_count, users=users)
+
+            for mode, read_only in (('orm', False), ('read_only', True)):
+                result = measure(lambda: list_tasks(read_only=read_only))
+                microseconds_per_row = result['seconds'] * 1_000_000 / rows_count
+                bytes_per_row = result['peak_memory'] / rows_count
+                print(
+                    f'{rows_count:>8} {mode:>10} '
+                    f'{microseconds_per_row:>8.1f} {bytes_per_row:>15.0f}'
+                )
+
+
+if __name__ == '__main__':
+    run()
@@ -1,6 +1,7 @@
 # https://pythonspeed.com/articles/gunicorn-in-docker/
 
 import multiprocessing
+import os
 
 # http://docs.gunicorn.org/en/latest/design.html#how-many-workers
 cpus = multiprocessing.cpu_count()
@@ -188,6 +189,11 @@ proc_name = None
 #
 #       A callable that accepts the same arguments as after_fork
 #
+#   post_worker_init - Called just after a worker has initialized
+#       the application (before it starts its threads).
+#
+#       A callable that takes a worker instance as argument.
+#
 #   pre_exec - Called just prior to forking off a secondary
 #       master process during things like config reloading.
 #
@@ -195,10 +201,23 @@ proc_name = None
 #
 
 
+def on_starting(server):
+    # read by the app (before the workers load it), to share the tasks cache
+    # among the workers (see TASKS_CACHE_BACKEND on pydo/settings.py)
+    os.environ['WEB_WORKERS'] = str(server.cfg.workers)
+
+
 def post_fork(server, worker):
     server.log.info('Worker spawned (pid: %s)', worker.pid)
 
 
+def post_worker_init(worker):
+    # fork the password hashing processes while the worker has a single thread
+    from pydo.extensions import password_hasher
+
+    password_hasher.start()
+
+
 def pre_fork(server, worker):
     pass
 
@@ -0,0 +1,39 @@
+"""idempotency keys
+
+Revision ID: 5a0e14b200b6
+Revises: f3c8d1a6b925
+Create Date: 2026-10-18 20:52:05.459285
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5a0e14b200b6'
+down_revision = 'f3c8d1a6b925'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'idempotency_keys',
+        sa.Column('digest', sa.LargeBinary(length=32), nullable=False),
+        sa.Column('request_digest', sa.LargeBinary(length=32), nullable=False),
+        sa.Column('status_code', sa.SmallInteger(), nullable=True),
+        sa.Column('headers', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('body', sa.LargeBinary(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('digest'),
+    )
+    op.create_index(
+        'ix_idempotency_keys_expires_at', 'idempotency_keys', ['expires_at']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_idempotency_keys_expires_at', table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
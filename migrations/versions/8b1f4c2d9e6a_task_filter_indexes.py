@@ -0,0 +1,73 @@
+"""task filter indexes
+
+Revision ID: 8b1f4c2d9e6a
+Revises: 3d20fa9570ab
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b1f4c2d9e6a'
+down_revision = '3d20fa9570ab'
+branch_labels = None
+depends_on = None
+
+
+# NOTE: "CREATE INDEX CONCURRENTLY" cannot run inside a transaction,
+#       so the indexes are created on an autocommit block. This way
+#       the migration does not lock the task table for writes while
+#       the indexes are being built.
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_task_user_uuid_status_due_date',
+            'task',
+            ['user_uuid', 'status', 'due_date'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_task_open_user_uuid_due_date',
+            'task',
+            ['user_uuid', 'due_date'],
+            unique=False,
+            postgresql_where=sa.text("status != 'completed'"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_task_due_date_uuid',
+            'task',
+            ['due_date', 'uuid'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_task_due_date_uuid',
+            table_name='task',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            'ix_task_open_user_uuid_due_date',
+            table_name='task',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            'ix_task_user_uuid_status_due_date',
+            table_name='task',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
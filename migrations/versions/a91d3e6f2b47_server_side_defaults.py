@@ -0,0 +1,38 @@
+"""server side defaults
+
+Revision ID: a91d3e6f2b47
+Revises: e5a2b8c71f03
+Create Date: 2026-10-18 14:02:31.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a91d3e6f2b47'
+down_revision = 'e5a2b8c71f03'
+branch_labels = None
+depends_on = None
+
+
+# NOTE: only the columns' defaults change (on the catalog), so the tables are not
+#       rewritten. The writes read the defaults back with "INSERT ... RETURNING".
+
+UTC_NOW = "timezone('utc', clock_timestamp())"
+
+
+def upgrade():
+    for table in ('user', 'task'):
+        op.alter_column(table, 'uuid', server_default=sa.text('gen_random_uuid()'))
+        op.alter_column(table, 'created_at', server_default=sa.text(UTC_NOW))
+        op.alter_column(table, 'last_updated_at', server_default=sa.text(UTC_NOW))
+    op.alter_column('task', 'status', server_default='pending')
+
+
+def downgrade():
+    op.alter_column('task', 'status', server_default=None)
+    for table in ('user', 'task'):
+        op.alter_column(table, 'last_updated_at', server_default=None)
+        op.alter_column(table, 'created_at', server_default=None)
+        op.alter_column(table, 'uuid', server_default=None)
@@ -0,0 +1,49 @@
+"""revoked tokens
+
+Revision ID: b4d2ccb3d8e1
+Revises: 5a0e14b200b6
+Create Date: 2026-10-18 21:03:09.541639
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d2ccb3d8e1'
+down_revision = '5a0e14b200b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'revoked_tokens',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('jti', sa.String(length=36), nullable=True),
+        sa.Column('user_uuid', sa.UUID(), nullable=False),
+        sa.Column(
+            'revoked_at',
+            sa.DateTime(),
+            server_default=sa.text("timezone('utc', clock_timestamp())"),
+            nullable=False,
+        ),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_uuid'], ['user.uuid']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('jti'),
+    )
+    op.create_index('ix_revoked_tokens_expires_at', 'revoked_tokens', ['expires_at'])
+    op.create_index(
+        'ix_revoked_tokens_user_uuid',
+        'revoked_tokens',
+        ['user_uuid'],
+        postgresql_where=sa.text('jti IS NULL'),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_revoked_tokens_user_uuid', table_name='revoked_tokens')
+    op.drop_index('ix_revoked_tokens_expires_at', table_name='revoked_tokens')
+    op.drop_table('revoked_tokens')
@@ -0,0 +1,37 @@
+"""task counters
+
+Revision ID: c47e9a13d5b2
+Revises: 8b1f4c2d9e6a
+Create Date: 2026-10-18 11:02:17.906514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47e9a13d5b2'
+down_revision = '8b1f4c2d9e6a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('task_counters',
+    sa.Column('user_uuid', sa.UUID(), nullable=False),
+    sa.Column('status', postgresql.ENUM('pending', 'in_progress', 'completed', name='task_status_enum', create_type=False), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_uuid'], ['user.uuid'], ),
+    sa.PrimaryKeyConstraint('user_uuid', 'status')
+    )
+
+    # initialize the counters from the existing tasks
+    op.execute(
+        'INSERT INTO task_counters (user_uuid, status, count) '
+        'SELECT user_uuid, status, count(*) FROM task GROUP BY user_uuid, status'
+    )
+
+
+def downgrade():
+    op.drop_table('task_counters')
@@ -0,0 +1,33 @@
+"""token generations
+
+Revision ID: d330692b9417
+Revises: b4d2ccb3d8e1
+Create Date: 2026-10-18 21:21:21.070703
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd330692b9417'
+down_revision = 'b4d2ccb3d8e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'user',
+        sa.Column('token_generation', sa.Integer(), server_default='0', nullable=False),
+    )
+    op.add_column(
+        'revoked_tokens',
+        sa.Column('token_generation', sa.Integer(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_column('revoked_tokens', 'token_generation')
+    op.drop_column('user', 'token_generation')
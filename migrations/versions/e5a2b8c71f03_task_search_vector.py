@@ -0,0 +1,58 @@
+"""task search vector
+
+Revision ID: e5a2b8c71f03
+Revises: c47e9a13d5b2
+Create Date: 2026-10-18 11:48:05.224871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a2b8c71f03'
+down_revision = 'c47e9a13d5b2'
+branch_labels = None
+depends_on = None
+
+
+# NOTE: adding a stored generated column rewrites the task table (holding a lock
+#       while doing it), so on large tables this should run on a maintenance window.
+#       The GIN index is then created concurrently, on an autocommit block.
+
+
+def upgrade():
+    op.add_column('task', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+        nullable=True,
+    ))
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_task_search_vector',
+            'task',
+            ['search_vector'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_task_search_vector',
+            table_name='task',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+    op.drop_column('task', 'search_vector')
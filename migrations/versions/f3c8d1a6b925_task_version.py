@@ -0,0 +1,33 @@
+"""task version
+
+Revision ID: f3c8d1a6b925
+Revises: a91d3e6f2b47
+Create Date: 2026-10-18 16:41:07.284913
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c8d1a6b925'
+down_revision = 'a91d3e6f2b47'
+branch_labels = None
+depends_on = None
+
+
+# NOTE: a column with a constant default is added without rewriting the table
+#       (the existing tasks read it from the catalog), so it is fast and does
+#       not hold the lock for long.
+
+
+def upgrade():
+    op.add_column(
+        'task',
+        sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_column('task', 'version')
@@ -1,23 +1,56 @@
+import functools
+import hashlib
 import logging
-from datetime import datetime, timedelta
+import os
+from datetime import datetime, timedelta, timezone
 from random import randint
+from typing import Dict, Union
+from uuid import UUID
 
 import flask
-from flask import Blueprint, request, jsonify
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    jsonify,
+    request,
+    stream_with_context,
+)
 from flask_jwt_extended import (
     create_access_token,
     create_refresh_token,
+    current_user,
     jwt_required,
+    get_jwt,
     get_jwt_identity,
 )
-from pydo.commons import format_list_of_tasks, paginate_query
-from pydo.exceptions import APIError
-from pydo.models import User, Task
-from pydo.settings import VERSION
+from pydo.commons import (
+    build_etag,
+    decode_cursor,
+    encode_cursor,
+    format_list_of_tasks,
+    format_task,
+    paginate_query,
+)
+from pydo.exceptions import APIError, PasswordHasherBusyError, VersionMismatchError
+from pydo.extensions import jwt_decode_cache, password_hasher, tasks_cache
+from pydo.models import IdempotencyKey, RevokedToken, User, Task
+from pydo.settings import (
+    BULK_MAX_TASKS,
+    EXPORT_CHUNK_SIZE,
+    IDEMPOTENCY_KEY_LOCK_TIMEOUT,
+    IDEMPOTENCY_KEY_MAX_LENGTH,
+    IDEMPOTENCY_KEY_TTL,
+    ITEMS_PER_PAGE,
+    STREAM_BATCH_SIZE,
+    VERSION,
+)
 from pydo.tasks import compute, generate_random_string
 
 api_blueprint = Blueprint('api', __name__)
 
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,7 +61,128 @@ def handle_api_error(error):
     return response
 
 
+@api_blueprint.errorhandler(PasswordHasherBusyError)
+def handle_password_hasher_busy_error(error):
+    response = jsonify({'message': 'Too many requests, try again later'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+
+# headers of the responses that are replayed to retries (see "idempotent")
+IDEMPOTENT_RESPONSE_HEADERS = ('Content-Type', 'ETag', 'Location')
+
+
+def idempotent(view):
+    """
+    Make a view idempotent for the requests sent with an "Idempotency-Key"
+    header: the first response to each key (of the endpoint and the user) is
+    recorded (see "IdempotencyKey"), and replayed to the retries of the request,
+    so the view does not run again (e.g. creating duplicated tasks or messages).
+
+    Responses with server errors (5xx) are not recorded, so those requests can
+    be retried. A retry sent while the request is still running gets a 409,
+    and a different request sent with the same key gets a 422.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return view(*args, **kwargs)
+        if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            raise APIError(
+                status_code=400,
+                payload={
+                    'message': 'Idempotency-Key must have 1 to '
+                    f'{IDEMPOTENCY_KEY_MAX_LENGTH} characters'
+                },
+            )
+
+        digest = hash_parts(request.method, request.path, get_request_identity(), key)
+        request_digest = hash_parts(request.query_string, request.get_data())
+        existing_key = IdempotencyKey.reserve(
+            digest=digest,
+            request_digest=request_digest,
+            lock_timeout=IDEMPOTENCY_KEY_LOCK_TIMEOUT,
+        )
+        if existing_key is not None:
+            return replay_response(
+                idempotency_key=existing_key, request_digest=request_digest
+            )
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except APIError as error:
+            response = handle_api_error(error)
+        except Exception:
+            IdempotencyKey.release(digest=digest)
+            raise
+
+        if response.status_code >= 500:
+            IdempotencyKey.release(digest=digest)
+            return response
+
+        IdempotencyKey.complete(
+            digest=digest,
+            status_code=response.status_code,
+            headers={
+                name: response.headers[name]
+                for name in IDEMPOTENT_RESPONSE_HEADERS
+                if name in response.headers
+            },
+            body=response.get_data(),
+            ttl=IDEMPOTENCY_KEY_TTL,
+        )
+        return response
+
+    return wrapper
+
+
+def get_request_identity() -> str:
+    """
+    Get the identity of the user of the request, or '' on public endpoints.
+    """
+    try:
+        return get_jwt_identity() or ''
+    except RuntimeError:  # not a "jwt_required" endpoint
+        return ''
+
+
+def hash_parts(*parts) -> bytes:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.digest()
+
+
+def replay_response(idempotency_key: IdempotencyKey, request_digest: bytes) -> Response:
+    if idempotency_key.status_code is None:
+        response = jsonify(
+            {'message': 'A request with this Idempotency-Key is still running'}
+        )
+        response.status_code = 409
+        response.headers['Retry-After'] = '1'
+        return response
+
+    if idempotency_key.request_digest != request_digest:
+        raise APIError(
+            status_code=422,
+            payload={'message': 'Idempotency-Key was already used by another request'},
+        )
+
+    response = Response(
+        idempotency_key.body,
+        status=idempotency_key.status_code,
+        headers=idempotency_key.headers,
+    )
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
 @api_blueprint.route('/compute', methods=['GET'])
+@idempotent
 def call_compute_task():
     """
     Put a compute task on the queue.
@@ -41,6 +195,14 @@ def call_compute_task():
     ---
     tags:
       - Celery background task
+    parameters:
+      - name: Idempotency-Key
+        in: header
+        description: >
+          unique key (e.g. an UUID) of the request; its retries with the same key
+          get the first response, instead of running it again
+        type: string
+        required: false
     responses:
       200:
         description: message was put on the queue.
@@ -57,6 +219,7 @@ def call_compute_task():
 
 
 @api_blueprint.route('/string', methods=['GET'])
+@idempotent
 def call_generate_random_string_task():
     """
     Put a generate random string task on the queue.
@@ -69,6 +232,14 @@ def call_generate_random_string_task():
     ---
     tags:
       - Celery background task
+    parameters:
+      - name: Idempotency-Key
+        in: header
+        description: >
+          unique key (e.g. an UUID) of the request; its retries with the same key
+          get the first response, instead of running it again
+        type: string
+        required: false
     responses:
       200:
         description: message was put on the queue.
@@ -137,6 +308,31 @@ def liveness():
     return jsonify(response_dict)
 
 
+@api_blueprint.route('/health-check/metrics', methods=['GET'])
+def metrics():
+    """
+    Metrics of the process (gunicorn worker) that handled the request.
+
+    For the password hashing pool (see pydo/passwords.py): how many operations
+    ran and were rejected (because too many were waiting), how long they waited
+    for the pool and how long the hashing took. For the cache of the verified
+    tokens (see "CachedJWTManager"): its size, hits and misses.
+    ---
+    tags:
+      - Healthcheck
+    responses:
+      200:
+        description: the metrics of the process
+    """
+    return jsonify(
+        {
+            'pid': os.getpid(),
+            'password_hasher': password_hasher.get_metrics(),
+            'jwt_decode_cache': jwt_decode_cache.get_metrics(),
+        }
+    )
+
+
 @api_blueprint.route('/welcome/<person>', methods=['GET'])
 def welcome(person: str):
     """
@@ -190,7 +386,11 @@ def login():
         )
 
         # long-live refresh token:
-        refresh_token = create_refresh_token(identity=str(user.uuid))
+        # the generation revokes it on password changes (see "RevokedToken")
+        refresh_token = create_refresh_token(
+            identity=str(user.uuid),
+            additional_claims={'token_generation': user.token_generation},
+        )
 
         return jsonify(
             {'access_token': access_token, 'refresh_token': refresh_token}
@@ -220,6 +420,29 @@ def token_refresh():
     return jsonify({'access_token': new_access_token}), 200
 
 
+@api_blueprint.route('/logout', methods=['POST'])
+@jwt_required(refresh=True)
+def logout():
+    """
+    Logout: revoke the JWT refresh token, so it cannot get new access tokens
+    ---
+    tags:
+      - JWT Auth
+    responses:
+      200:
+        description: the refresh token was revoked.
+    """
+    claims = get_jwt()
+    # naive UTC, as the datetimes stored on the database
+    expires_at = datetime.fromtimestamp(claims['exp'], tz=timezone.utc)
+    RevokedToken.revoke(
+        jti=claims['jti'],
+        user_uuid=get_jwt_identity(),
+        expires_at=expires_at.replace(tzinfo=None),
+    )
+    return jsonify({'msg': 'Logged out'}), 200
+
+
 @api_blueprint.route('/user', methods=['POST'])
 def create_user():
     """
@@ -260,11 +483,12 @@ def get_user():
       200:
         description: user info
     """
-    user_uuid = get_jwt_identity()
-
-    user = User.get_by(uuid=user_uuid)
     return jsonify(
-        {'uuid': str(user.uuid), 'username': user.username, 'email': user.email}
+        {
+            'uuid': str(current_user.uuid),
+            'username': current_user.username,
+            'email': current_user.email,
+        }
     ), 200
 
 
@@ -287,23 +511,25 @@ def update_user():
       200:
         description: updated user info
     """
-    user_uuid = get_jwt_identity()
-
     data = request.get_json()
-    user = User.get_by(uuid=user_uuid)
 
     email = data.get('email')
     password = data.get('password')
-    user.update(email=email, password=password)
+    current_user.update(email=email, password=password)
 
     password_value = 'SUCCESSFULLY CHANGED' if password else 'NOT CHANGED'
     return jsonify(
-        {'uuid': str(user.uuid), 'email': user.email, 'password': password_value}
+        {
+            'uuid': str(current_user.uuid),
+            'email': current_user.email,
+            'password': password_value,
+        }
     ), 200
 
 
 @api_blueprint.route('/task', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_task():
     """
     Create task
@@ -327,9 +553,20 @@ def create_task():
         description: this allows a user to create (and assign) a task for another user
         type: string
         required: false
+      - name: Idempotency-Key
+        in: header
+        description: >
+          unique key (e.g. an UUID) of the request; its retries with the same key
+          get the first response, instead of creating the task again
+        type: string
+        required: false
     responses:
       200:
         description: task info
+      409:
+        description: a request with the same Idempotency-Key is still running
+      422:
+        description: the Idempotency-Key was used by another request
     """
     data = request.get_json()
 
@@ -371,9 +608,125 @@ def create_task():
         'due_date': created_task_instance.due_date.isoformat(),
         'created_at': created_task_instance.created_at.isoformat(),
         'last_updated_at': created_task_instance.last_updated_at.isoformat(),
+        'version': created_task_instance.version,
         'user_uuid': str(created_task_instance.user_uuid),
     }
-    return jsonify(created_task_data), 201
+    response = jsonify(created_task_data)
+    response.set_etag(str(created_task_instance.version))
+    return response, 201
+
+
+@api_blueprint.route('/tasks/bulk', methods=['POST'])
+@jwt_required()
+def create_many_tasks():
+    """
+    Create many tasks
+
+    The tasks are validated, then the valid ones are created on a single
+    transaction. The results are returned on the same order as the payload.
+    ---
+    tags:
+      - Tasks
+    parameters:
+      - in: body
+        name: body
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              title:
+                type: string
+                required: true
+              description:
+                type: string
+                required: false
+              status:
+                type: string
+                enum: [pending, in_progress, completed]
+                required: false
+              due_date:
+                type: string
+                description: YYYY-MM-DD HH:MM
+                required: false
+              user_uuid:
+                type: string
+                description: to create (and assign) the task for another user
+                required: false
+          example:
+            - title: "Study for the test"
+              description: "Mathematics 101"
+              due_date: "2025-03-31 11:00"
+            - title: "Gym"
+              status: "in_progress"
+    responses:
+      201:
+        description: all the tasks were created
+      207:
+        description: some tasks were created (see the "errors" of the other ones)
+      400:
+        description: no task was created
+    """
+    data = request.get_json()
+    if not isinstance(data, list):
+        raise APIError(
+            status_code=400, payload={'message': 'the payload must be a list of tasks'}
+        )
+    if len(data) > BULK_MAX_TASKS:
+        raise APIError(
+            status_code=400,
+            payload={'message': f'at most {BULK_MAX_TASKS} tasks can be created'},
+        )
+
+    default_user_uuid = get_jwt_identity()
+    validated_tasks = [
+        Task.validate_data(data=item, default_user_uuid=default_user_uuid)
+        for item in data
+    ]
+
+    existing_user_uuids = User.get_existing_uuids(
+        uuids={
+            task_data['user_uuid']
+            for task_data, errors in validated_tasks
+            if not errors
+        }
+    )
+    for task_data, errors in validated_tasks:
+        if not errors and task_data['user_uuid'] not in existing_user_uuids:
+            errors.append('user_uuid: user not found')
+
+    created_tasks = iter(
+        Task.create_many(
+            tasks_data=[
+                task_data for task_data, errors in validated_tasks if not errors
+            ]
+        )
+    )
+
+    results = []
+    for index, (_, errors) in enumerate(validated_tasks):
+        if errors:
+            results.append({'index': index, 'created': False, 'errors': errors})
+        else:
+            results.append(
+                {'index': index, 'created': True, 'task': next(created_tasks)}
+            )
+
+    created_count = sum(1 for result in results if result['created'])
+    if created_count == len(results):
+        status_code = 201
+    elif created_count:
+        status_code = 207
+    else:
+        status_code = 400
+
+    return jsonify(
+        {
+            'created': created_count,
+            'failed': len(results) - created_count,
+            'results': results,
+        }
+    ), status_code
 
 
 @api_blueprint.route('/task', methods=['PATCH'])
@@ -404,9 +757,20 @@ def update_task():
         description: this allows a user to reassign a task for another user
         type: string
         required: false
+      - name: If-Match
+        in: header
+        description: >
+          the version of the task (e.g. "3") the changes are based on; the task is
+          only updated if it is still on that version
+        type: string
+        required: false
     responses:
       200:
-        description: task info
+        description: task info (with the new version, also on the ETag header)
+      404:
+        description: task not found
+      412:
+        description: the task is on another version (it was changed by someone else)
     """
 
     """
@@ -440,8 +804,20 @@ def update_task():
 
     # TODO: validate status
 
-    task_instance = Task().filter_by(uuids=[task_uuid])[0]
-    task_instance.update(**updated_data)
+    try:
+        task_instance = Task.update_by_uuid(
+            uuid=task_uuid, version=get_if_match_version(), **updated_data
+        )
+    except VersionMismatchError as exc:
+        raise APIError(
+            status_code=412,
+            payload={
+                'message': 'task was changed, get it again and retry',
+                'version': exc.current_version,
+            },
+        )
+    if task_instance is None:
+        raise APIError(status_code=404, payload={'message': 'task not found'})
 
     updated_task_data = {
         'uuid': task_instance.uuid,
@@ -451,9 +827,143 @@ def update_task():
         'due_date': task_instance.due_date.isoformat(),
         'created_at': task_instance.created_at.isoformat(),
         'last_updated_at': task_instance.last_updated_at.isoformat(),
+        'version': task_instance.version,
         'user_uuid': str(task_instance.user_uuid),
     }
-    return jsonify(updated_task_data), 200
+    response = jsonify(updated_task_data)
+    response.set_etag(str(task_instance.version))
+    return response, 200
+
+
+def get_if_match_version() -> Union[None, int]:
+    """
+    Get the task version sent on the "If-Match" header (as its entity tag),
+    or None if there is no precondition ("If-Match: *" only requires the task
+    to exist, which is always checked).
+
+    Anything but a single version can never match, so it is reported as a 412.
+    """
+    if not request.if_match or request.if_match.star_tag:
+        return None
+
+    etags = request.if_match.as_set()
+    if len(etags) != 1 or not next(iter(etags)).isdigit():
+        raise APIError(
+            status_code=412,
+            payload={'message': 'If-Match must have a single task version'},
+        )
+    return int(next(iter(etags)))
+
+
+@api_blueprint.route('/tasks/bulk', methods=['PATCH'])
+@jwt_required()
+def update_many_tasks():
+    """
+    Update many tasks
+
+    Applies the same changes to all the tasks matching the filters (the same
+    ones of "GET /tasks", at least one is required), on a single statement.
+    Only the user's tasks can be updated.
+    ---
+    tags:
+      - Tasks
+    parameters:
+      - in: body
+        name: body
+        schema:
+          type: object
+          properties:
+            changes:
+              type: object
+              required: true
+              properties:
+                status:
+                  type: string
+                  enum: [pending, in_progress, completed]
+                due_date:
+                  type: string
+                  description: YYYY-MM-DD HH:MM
+                user_uuid:
+                  type: string
+                  description: reassign the tasks to another user
+            uuids:
+              type: array
+              items:
+                type: string
+              required: false
+            user_uuids:
+              type: array
+              items:
+                type: string
+              required: false
+            status:
+              type: array
+              items:
+                type: string
+              required: false
+            start_due_date:
+              type: string
+              required: false
+            end_due_date:
+              type: string
+              required: false
+            search:
+              type: string
+              required: false
+          example:
+            uuids: ["T78F", "G32P"]
+            changes:
+              status: "completed"
+    responses:
+      200:
+        description: the number of updated tasks, and their uuids
+      400:
+        description: invalid changes or filters
+      403:
+        description: the filters reach tasks of other users
+    """
+    data = request.get_json()
+    user_uuid = UUID(get_jwt_identity())
+
+    try:
+        filters = get_task_filters(data=data)
+        # checked before scoping the filters to the user's tasks
+        if not any(filters.values()):
+            raise ValueError('At least one filter is required.')
+        filters['user_uuids'] = filters['user_uuids'] or [user_uuid]
+        owners = {UUID(str(uuid)) for uuid in filters['user_uuids']}
+        owners |= Task.get_owners(uuids=filters['uuids'])
+        if owners != {user_uuid}:
+            raise APIError(
+                status_code=403,
+                payload={'message': 'only your own tasks can be updated'},
+            )
+        changes = get_task_changes(data=data.get('changes') or {})
+        updated_tasks = Task.update_many(changes=changes, **filters)
+    except ValueError as exc:
+        raise APIError(status_code=400, payload={'message': str(exc)})
+
+    return jsonify(
+        {
+            'updated': len(updated_tasks),
+            'uuids': [task.uuid for task in updated_tasks],
+        }
+    ), 200
+
+
+def get_task_changes(data: Dict) -> Dict:
+    """
+    Get the changes of "Task.update_many" from a request payload.
+    """
+    changes = dict(data)
+    if 'due_date' in changes:
+        changes['due_date'] = datetime.strptime(changes['due_date'], '%Y-%m-%d %H:%M')
+    if 'user_uuid' in changes:
+        user_uuid = UUID(str(changes['user_uuid']))
+        if not User.get_existing_uuids(uuids=[user_uuid]):
+            raise ValueError(f'User not found: {user_uuid}')
+        changes['user_uuid'] = user_uuid
+    return changes
 
 
 @api_blueprint.route('/task', methods=['DELETE'])
@@ -475,12 +985,14 @@ def delete_task():
         description: not deleted (non-existing or error during deletion)
     """
     user_uuid = get_jwt_identity()
-    user = User.get_by(uuid=user_uuid)
 
     data = request.get_json()
     task_uuid = data.get('uuid')
 
-    deleted = Task.delete(user_uuid=user_uuid, uuid=task_uuid)
+    try:
+        deleted = Task.delete(user_uuid=user_uuid, uuid=task_uuid)
+    except ValueError:
+        deleted = False
 
     if deleted:
         return '', 204
@@ -490,6 +1002,66 @@ def delete_task():
     ), 400
 
 
+@api_blueprint.route('/tasks', methods=['DELETE'])
+@jwt_required()
+def delete_many_tasks():
+    """
+    Delete many tasks
+
+    Deletes the user's tasks with the given uuids, on a single statement.
+    ---
+    tags:
+      - Tasks
+    parameters:
+      - in: body
+        name: body
+        schema:
+          type: object
+          properties:
+            uuids:
+              type: array
+              items:
+                type: string
+              required: true
+          example:
+            uuids: ["T78F", "G32P"]
+    responses:
+      200:
+        description: the uuids that were deleted, and the ones not found
+      400:
+        description: invalid uuids
+    """
+    user_uuid = get_jwt_identity()
+
+    data = request.get_json()
+    task_uuids = data.get('uuids')
+    if not task_uuids or not isinstance(task_uuids, list):
+        raise APIError(
+            status_code=400, payload={'message': 'a list of uuids is required'}
+        )
+    if len(task_uuids) > BULK_MAX_TASKS:
+        raise APIError(
+            status_code=400,
+            payload={'message': f'at most {BULK_MAX_TASKS} tasks can be deleted'},
+        )
+
+    try:
+        deleted_uuids = Task.delete_many(user_uuid=user_uuid, uuids=task_uuids)
+    except ValueError as exc:
+        raise APIError(status_code=400, payload={'message': str(exc)})
+
+    deleted = {str(uuid) for uuid in deleted_uuids}
+    return jsonify(
+        {
+            'deleted': len(deleted),
+            'uuids': sorted(deleted),
+            'not_found': [
+                uuid for uuid in task_uuids if str(UUID(str(uuid))) not in deleted
+            ],
+        }
+    ), 200
+
+
 @api_blueprint.route('/task', methods=['GET'])
 @jwt_required()
 def get_one_task():
@@ -504,14 +1076,18 @@ def get_one_task():
         required: true
     responses:
       200:
-        description: success
+        description: success (with the task version on the ETag header)
     """
     user_uuid = get_jwt_identity()
-    user = User.get_by(uuid=user_uuid)
 
     data = request.get_json()
     task_uuid = data.get('uuid')
 
+    # the same entity tag of "POST /task" and "PATCH /task" (see "get_if_match_version")
+    version = Task.get_version(uuid=task_uuid, user_uuid=user_uuid)
+    if version is not None and request.if_none_match.contains(str(version)):
+        return not_modified(etag=str(version))
+
     task_instance = Task().filter_by(uuids=[task_uuid], user_uuids=[user_uuid])[0]
 
     task_data = {
@@ -522,8 +1098,11 @@ def get_one_task():
         'due_date': task_instance.due_date.isoformat(),
         'created_at': task_instance.created_at.isoformat(),
         'last_updated_at': task_instance.last_updated_at.isoformat(),
+        'version': task_instance.version,
     }
-    return jsonify(task_data), 200
+    response = jsonify(task_data)
+    response.set_etag(str(task_instance.version))
+    return response, 200
 
 
 @api_blueprint.route('/tasks', methods=['GET'])
@@ -532,6 +1111,9 @@ def get_many_tasks():
     """
     Get many tasks
 
+    When "page_number" and "cursor" are not informed, the response can be streamed as
+    newline delimited JSON (one task per line), by sending the
+    "Accept: application/x-ndjson" header or the "stream=1" query string.
     ---
     tags:
       - Tasks
@@ -545,6 +1127,13 @@ def get_many_tasks():
               type: int
               description: this indicates we must paginate to return the records on a given page
               required: false
+            cursor:
+              type: string
+              description: >
+                use keyset pagination, ordered by (due_date, uuid). Send an empty
+                string to get the first page, then the "next_cursor" of the previous
+                response to get the following ones.
+              required: false
             user_uuids:
               type: array
               items:
@@ -574,6 +1163,12 @@ def get_many_tasks():
               format: date
               description: Filter tasks with due date on or before this date (YYYY-MM-DD HH:MM)
               required: false
+            search:
+              type: string
+              description: >
+                Full-text search on the tasks' title and description. Unless paginating
+                with a cursor, the tasks are ordered from the most to the least relevant.
+              required: false
           example:
             user_uuids: ["U123ABC", "U456DEF"]
             uuids: ["T78F", "G32P"]
@@ -584,13 +1179,216 @@ def get_many_tasks():
       200:
         description: success
     """
-    user_uuid = get_jwt_identity()
-    user = User.get_by(uuid=user_uuid)
+    data = request.get_json()
+
+    filters = get_task_filters(data=data)
+
+    is_streamed = (
+        ('cursor' not in data)
+        and (not data.get('page_number'))
+        and is_stream_requested()
+    )
+
+    cache_key = None
+    if tasks_cache.enabled and not is_streamed:
+        cache_key = get_tasks_cache_key(data=data, filters=filters)
+        cached_response = get_cached_tasks_response(cache_key=cache_key)
+        if cached_response:
+            return cached_response
+
+    etag = get_tasks_etag(filters=filters)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag=etag)
+
+    if is_streamed:
+        response = stream_tasks(filters=filters)
+        response.set_etag(etag)
+        return response
+
+    if 'cursor' in data:
+        response = jsonify(get_tasks_page(cursor=data['cursor'], filters=filters))
+        return cache_tasks_response(response=response, etag=etag, cache_key=cache_key)
+
+    filtered_tasks_instances = Task.filter_by(read_only=True, **filters)
+
+    """
+    NOTE: "format_list_of_tasks" could be handled with a serializer (e.g. pydantic or marshmallow),
+          and "paginate_query" could be handled directly on the database query above to improve
+          performance. But due to:
+              - the simplicity of the current requirements;
+              - the time constraints of this initial implementation
+          , both will be done on future versions.
+    """
+    filtered_tasks = format_list_of_tasks(tasks=filtered_tasks_instances)
+
+    page_number = data.get('page_number')
+    if not page_number:
+        result_tasks = filtered_tasks
+    else:
+        paginated_tasks = paginate_query(
+            resultset=filtered_tasks,
+            page_number=page_number,
+            items_per_page=ITEMS_PER_PAGE,
+        )
+        result_tasks = paginated_tasks
+
+    response = jsonify(result_tasks)
+    return cache_tasks_response(response=response, etag=etag, cache_key=cache_key)
+
+
+@api_blueprint.route('/tasks/export', methods=['GET'])
+@jwt_required()
+def export_tasks():
+    """
+    Export tasks
 
+    Streams all the filtered tasks (by default, the ones of the current user),
+    ordered by due date, as CSV or newline delimited JSON. The rows are sent
+    as they are read from the database (with "COPY ... TO STDOUT").
+    ---
+    tags:
+      - Tasks
+    parameters:
+      - name: format
+        in: query
+        type: string
+        enum: [csv, ndjson]
+        required: false
+        default: csv
+      - in: body
+        name: body
+        schema:
+          type: object
+          properties:
+            user_uuids:
+              type: array
+              items:
+                type: string
+              required: false
+            uuids:
+              type: array
+              items:
+                type: string
+              required: false
+            status:
+              type: array
+              items:
+                type: string
+                enum: [pending, completed, in_progress]
+              required: false
+            start_due_date:
+              type: string
+              required: false
+            end_due_date:
+              type: string
+              required: false
+            search:
+              type: string
+              required: false
+    responses:
+      200:
+        description: the tasks, on the requested format
+      400:
+        description: invalid format or filters
+    """
+    file_format = request.args.get('format', 'csv')
+    data = request.get_json(silent=True) or {}
+
+    try:
+        filters = get_task_filters(data=data)
+        filters['user_uuids'] = filters['user_uuids'] or [get_jwt_identity()]
+        chunks = Task.iterate_export(
+            file_format=file_format, chunk_size=EXPORT_CHUNK_SIZE, **filters
+        )
+    except ValueError as exc:
+        raise APIError(status_code=400, payload={'message': str(exc)})
+
+    mimetype = 'text/csv' if file_format == 'csv' else NDJSON_MIMETYPE
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename=tasks.{file_format}'
+    )
+    return response
+
+
+@api_blueprint.route('/tasks/stats', methods=['GET'])
+@jwt_required()
+def get_tasks_stats():
+    """
+    Get tasks counts by status
+
+    Accepts the same filters as "GET /tasks". The counting is done on the
+    database, so no task is transferred or serialized.
+    ---
+    tags:
+      - Tasks
+    parameters:
+      - in: body
+        name: body
+        schema:
+          type: object
+          properties:
+            group_by_user:
+              type: boolean
+              description: also return the counts of each user
+              required: false
+            user_uuids:
+              type: array
+              items:
+                type: string
+              required: false
+            uuids:
+              type: array
+              items:
+                type: string
+              required: false
+            status:
+              type: array
+              items:
+                type: string
+                enum: [pending, completed, in_progress]
+              required: false
+            start_due_date:
+              type: string
+              required: false
+            end_due_date:
+              type: string
+              required: false
+            search:
+              type: string
+              required: false
+          example:
+            group_by_user: true
+            status: ["pending", "in_progress"]
+    responses:
+      200:
+        description: the counts by status (and by user, when requested)
+    """
     data = request.get_json()
 
+    filters = get_task_filters(data=data)
+    group_by_user = bool(data.get('group_by_user'))
+
+    stats = Task.count_by_status(group_by_user=group_by_user, **filters)
+
+    return jsonify(stats), 200
+
+
+def get_task_filters(data: Dict) -> Dict:
+    """
+    Get the filters of "Task.filter_by" from a request payload.
+
+    The user uuids are normalized (e.g. lowercased), since they are also the
+    namespaces of the cached responses that the task changes invalidate (see
+    "TasksCache.get_versions").
+    """
     task_uuids = data.get('uuids', [])
-    user_uuids = data.get('user_uuids', [])
+    try:
+        user_uuids = [str(UUID(str(value))) for value in data.get('user_uuids', [])]
+    except ValueError:
+        raise APIError(
+            status_code=400, payload={'message': 'user_uuids must be valid uuids'}
+        )
     status = data.get('status', [])
     start_due_date_str = data.get('start_due_date', None)
     end_due_date_str = data.get('end_due_date', None)
@@ -606,31 +1404,134 @@ def get_many_tasks():
         else None
     )
 
-    filtered_tasks_instances = Task.filter_by(
-        user_uuids=user_uuids,
-        uuids=task_uuids,
-        status=status,
-        start_due_date=start_due_date,
-        end_due_date=end_due_date,
+    return {
+        'user_uuids': user_uuids,
+        'uuids': task_uuids,
+        'status': status,
+        'start_due_date': start_due_date,
+        'end_due_date': end_due_date,
+        'search': data.get('search', ''),
+    }
+
+
+def get_tasks_etag(filters: Dict) -> str:
+    """
+    Get a strong ETag for the tasks a request reads.
+
+    It is derived from how many tasks match the filters and when the last
+    of them was updated (computed on the database, without loading them),
+    plus the user and the request (payload, query string and accepted types),
+    since those change how the tasks are filtered and shaped on the response.
+    """
+    count, last_updated_at = Task.get_fingerprint(**filters)
+    return build_etag(
+        get_jwt_identity(),
+        request.get_data(),
+        request.query_string,
+        request.headers.get('Accept', ''),
+        count,
+        last_updated_at,
     )
 
+
+def get_tasks_cache_key(data: Dict, filters: Dict) -> str:
     """
-    NOTE: "format_list_of_tasks" could be handled with a serializer (e.g. pydantic or marshmallow),
-          and "paginate_query" could be handled directly on the database query above to improve
-          performance. But due to:
-              - the simplicity of the current requirements;
-              - the time constraints of this initial implementation
-          , both will be done on future versions.
+    Get the key of the cached response to a (not streamed) "GET /tasks" request.
+
+    Besides the user and the (normalized) request, it has the versions of the
+    tasks' owners, which are bumped when their tasks change.
     """
-    filtered_tasks = format_list_of_tasks(tasks=filtered_tasks_instances)
+    normalized_filters = sorted(
+        (name, sorted(map(str, value)) if isinstance(value, list) else value)
+        for name, value in filters.items()
+    )
+    return build_etag(
+        get_jwt_identity(),
+        normalized_filters,
+        data.get('page_number'),
+        data.get('cursor'),
+        tasks_cache.get_versions(user_uuids=filters['user_uuids']),
+    )
 
-    page_number = data.get('page_number')
-    if not page_number:
-        result_tasks = filtered_tasks
-    else:
-        paginated_tasks = paginate_query(
-            resultset=filtered_tasks, page_number=page_number
-        )
-        result_tasks = paginated_tasks
 
-    return jsonify(result_tasks), 200
+def get_cached_tasks_response(cache_key: str) -> Union[None, Response]:
+    cached = tasks_cache.get(key=cache_key)
+    if not cached:
+        return None
+
+    etag, body = cached
+    if request.if_none_match.contains(etag):
+        return not_modified(etag=etag)
+
+    response = current_app.response_class(body, mimetype=current_app.json.mimetype)
+    response.set_etag(etag)
+    return response
+
+
+def cache_tasks_response(
+    response: Response, etag: str, cache_key: Union[None, str]
+) -> Response:
+    response.set_etag(etag)
+    if cache_key:
+        tasks_cache.set(key=cache_key, etag=etag, body=response.get_data())
+    return response
+
+
+def not_modified(etag: str) -> Response:
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+
+def get_tasks_page(cursor: str, filters: Dict) -> Dict:
+    """
+    Get a page of tasks through keyset pagination.
+
+    One extra task is fetched to know if there is a next page,
+    without having to count all the filtered tasks.
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as exc:
+        raise APIError(status_code=400, payload={'message': str(exc)})
+
+    tasks_instances = Task.filter_page(
+        limit=ITEMS_PER_PAGE + 1, after=after, read_only=True, **filters
+    )
+
+    has_next = len(tasks_instances) > ITEMS_PER_PAGE
+    tasks_instances = tasks_instances[:ITEMS_PER_PAGE]
+
+    next_cursor = None
+    if has_next:
+        last_task = tasks_instances[-1]
+        next_cursor = encode_cursor(due_date=last_task.due_date, uuid=last_task.uuid)
+
+    return {
+        'records': format_list_of_tasks(tasks=tasks_instances),
+        'next_cursor': next_cursor,
+        'has_next': has_next,
+    }
+
+
+def is_stream_requested() -> bool:
+    return (
+        request.args.get('stream') == '1'
+        or request.accept_mimetypes.best == NDJSON_MIMETYPE
+    )
+
+
+def stream_tasks(filters: Dict) -> Response:
+    """
+    Stream the filtered tasks as newline delimited JSON (one task per line).
+
+    The tasks are read through a server-side cursor and serialized one at
+    a time, so the memory used does not grow with the number of tasks.
+    """
+    tasks = Task.iterate_by(batch_size=STREAM_BATCH_SIZE, read_only=True, **filters)
+
+    def generate():
+        for task in tasks:
+            yield current_app.json.dumps(format_task(task=task)) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
@@ -0,0 +1,383 @@
+"""
+Read-through cache of the (already serialized) task listing responses.
+
+Entries are keyed by the user, the request (filters and how the response is
+shaped) and the versions of the task owners involved. "Task.create",
+"Task.update" and "Task.delete" bump the versions of the users whose tasks
+changed (see "TasksCache.invalidate"), so entries with older versions are
+never read again, and are eventually evicted (LRU, TTL and memory cap).
+
+There are two backends:
+
+- "in_process": a dict on each process. Fast, but a change handled by a
+  gunicorn worker only invalidates the cache of that worker, so the other
+  workers may serve stale responses until their entries expire (TTL).
+
+- "shared_memory": a SQLite database on /dev/shm (a memory backed filesystem),
+  shared by all the gunicorn workers of the host, so invalidations are seen
+  by all of them.
+
+By default ("auto"), "shared_memory" is used when the API is served by more
+than one process, and "in_process" otherwise.
+
+The versions also invalidate the users' identities, cached on each process
+(see "User.get_cached"): "User.update" bumps the version of the user, so the
+other processes stop using the identity they cached.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# version bumped on every change, for entries that are not filtered by user
+ALL_USERS = '*'
+# prefix of the versions of the users' identities (see "TasksCache.invalidate_user")
+USER_IDENTITY = 'user:'
+
+
+class CacheBackend:
+    def get(self, key: str) -> Union[None, bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes):
+        raise NotImplementedError
+
+    def get_versions(self, namespaces: List[str]) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def bump_versions(self, namespaces: List[str]):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class InProcessCacheBackend(CacheBackend):
+    def __init__(self, ttl: float, max_bytes: int):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key: (value, expires_at)
+        self.total_bytes = 0
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Union[None, bytes]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                self._delete(key)
+                return None
+
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self._delete(key)
+
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.total_bytes += len(value)
+
+            while self.total_bytes > self.max_bytes:
+                oldest_key = next(iter(self.entries))
+                self._delete(oldest_key)
+
+    def _delete(self, key: str):
+        value, _ = self.entries.pop(key)
+        self.total_bytes -= len(value)
+
+    def get_versions(self, namespaces: List[str]) -> Dict[str, int]:
+        return {namespace: self.versions.get(namespace, 0) for namespace in namespaces}
+
+    def bump_versions(self, namespaces: List[str]):
+        with self.lock:
+            for namespace in namespaces:
+                self.versions[namespace] = self.versions.get(namespace, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+            self.versions.clear()
+
+
+class SharedMemoryCacheBackend(CacheBackend):
+    """
+    Stores the entries on a SQLite database, which is shared by the processes
+    using the same path. Each thread of each process has its own connection.
+    """
+
+    def __init__(self, ttl: float, max_bytes: int, path: str):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.path = path
+        self.local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # connections must not be shared with forked processes (e.g. gunicorn workers)
+        if getattr(self.local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, '
+                'expires_at REAL NOT NULL, last_used_at REAL NOT NULL)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS entries_last_used_at '
+                'ON entries (last_used_at)'
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS versions ('
+                'namespace TEXT PRIMARY KEY, version INTEGER NOT NULL)'
+            )
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return self.local.connection
+
+    def get(self, key: str) -> Union[None, bytes]:
+        now = time.time()
+        row = self.connection.execute(
+            'UPDATE entries SET last_used_at = ? '
+            'WHERE key = ? AND expires_at >= ? RETURNING value',
+            (now, key, now),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+
+        now = time.time()
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(
+                'INSERT OR REPLACE INTO entries '
+                '(key, value, size, expires_at, last_used_at) VALUES (?, ?, ?, ?, ?)',
+                (key, value, len(value), now + self.ttl, now),
+            )
+            connection.execute('DELETE FROM entries WHERE expires_at < ?', (now,))
+            self._evict_over_max_bytes(connection=connection)
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def _evict_over_max_bytes(self, connection: sqlite3.Connection):
+        (total_bytes,) = connection.execute(
+            'SELECT coalesce(sum(size), 0) FROM entries'
+        ).fetchone()
+        if total_bytes <= self.max_bytes:
+            return
+
+        least_recently_used = connection.execute(
+            'SELECT key, size FROM entries ORDER BY last_used_at'
+        )
+        keys_to_delete = []
+        for key, size in least_recently_used:
+            if total_bytes <= self.max_bytes:
+                break
+            keys_to_delete.append((key,))
+            total_bytes -= size
+        connection.executemany('DELETE FROM entries WHERE key = ?', keys_to_delete)
+
+    def get_versions(self, namespaces: List[str]) -> Dict[str, int]:
+        placeholders = ', '.join('?' for _ in namespaces)
+        rows = self.connection.execute(
+            f'SELECT namespace, version FROM versions '
+            f'WHERE namespace IN ({placeholders})',
+            namespaces,
+        ).fetchall()
+        versions = dict.fromkeys(namespaces, 0)
+        versions.update(rows)
+        return versions
+
+    def bump_versions(self, namespaces: List[str]):
+        self.connection.executemany(
+            'INSERT INTO versions (namespace, version) VALUES (?, 1) '
+            'ON CONFLICT (namespace) DO UPDATE SET version = version + 1',
+            [(namespace,) for namespace in namespaces],
+        )
+
+    def clear(self):
+        self.connection.execute('DELETE FROM entries')
+        self.connection.execute('DELETE FROM versions')
+
+
+class TasksCache:
+    """
+    The cache of the task listing responses, configured by "init_app"
+    (see "init_cache" on extensions.py). Until then (or if disabled
+    on the settings), it does nothing.
+    """
+
+    def __init__(self):
+        self.backend = None
+
+    def init_app(
+        self,
+        backend_name: str,
+        ttl: float,
+        max_bytes: int,
+        path: str,
+        processes: int = 1,
+    ):
+        if backend_name == 'auto':
+            # the processes must share the cache to see each other's changes
+            backend_name = 'shared_memory' if processes > 1 else 'in_process'
+
+        if backend_name == 'in_process':
+            self.backend = InProcessCacheBackend(ttl=ttl, max_bytes=max_bytes)
+        elif backend_name == 'shared_memory':
+            self.backend = SharedMemoryCacheBackend(
+                ttl=ttl, max_bytes=max_bytes, path=path
+            )
+        elif backend_name == 'disabled':
+            self.backend = None
+        else:
+            raise ValueError(f'Invalid tasks cache backend: {backend_name}')
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def get_versions(self, user_uuids: Iterable[str]) -> List[Tuple[str, int]]:
+        """
+        Get the versions that the tasks of the given users (or of all users,
+        when no user is given) are on.
+        """
+        namespaces = sorted({str(user_uuid) for user_uuid in user_uuids}) or [ALL_USERS]
+        versions = self.backend.get_versions(namespaces)
+        return [(namespace, versions[namespace]) for namespace in namespaces]
+
+    def get(self, key: str) -> Union[None, Tuple[str, bytes]]:
+        """
+        Get the (etag, response body) cached for key.
+        """
+        if not self.enabled:
+            return None
+
+        value = self.backend.get(key)
+        if value is None:
+            return None
+
+        etag, body = value.split(b' ', 1)
+        return etag.decode('ascii'), body
+
+    def set(self, key: str, etag: str, body: bytes):
+        if not self.enabled:
+            return
+
+        self.backend.set(key, etag.encode('ascii') + b' ' + body)
+
+    def invalidate(self, user_uuids: Iterable[str]):
+        """
+        Invalidate the cached responses with tasks of the given users.
+
+        It must be called after the changes are committed, otherwise a
+        concurrent request could cache the data from before the changes
+        with the new versions.
+        """
+        if not self.enabled:
+            return
+
+        namespaces = {str(user_uuid) for user_uuid in user_uuids}
+        namespaces.add(ALL_USERS)
+        self.backend.bump_versions(sorted(namespaces))
+
+    def get_user_version(self, user_uuid: str) -> Union[None, int]:
+        """
+        Get the version of the user's identity, or None when the cache is
+        disabled (so there is no version shared by the processes).
+        """
+        if not self.enabled:
+            return None
+
+        namespace = f'{USER_IDENTITY}{user_uuid}'
+        return self.backend.get_versions([namespace])[namespace]
+
+    def invalidate_user(self, user_uuid: str):
+        """
+        Invalidate the identity of the user cached by the processes. Like
+        "invalidate", it must be called after the changes are committed.
+        """
+        if not self.enabled:
+            return
+
+        self.backend.bump_versions([f'{USER_IDENTITY}{user_uuid}'])
+
+
+class TTLCache:
+    """
+    A small LRU cache, of up to "max_size" items, each kept for "ttl" seconds
+    (unless another ttl is given when it is set). It is local to the process
+    (e.g. for the users' identities, see "User.get_cached"), and counts its
+    hits and misses.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.items = OrderedDict()  # key: (value, expires_at)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self.items[key]
+                self.misses += 1
+                return None
+
+            self.items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value, ttl: float = None):
+        if self.max_size <= 0:
+            return
+
+        ttl = self.ttl if ttl is None else ttl
+        with self.lock:
+            self.items.pop(key, None)
+            self.items[key] = (value, time.monotonic() + ttl)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+    def delete(self, key: str):
+        with self.lock:
+            self.items.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_metrics(self) -> Dict:
+        with self.lock:
+            return {'size': len(self.items), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,263 @@
+"""
+Flask CLI commands, available through e.g. "flask tasks --help".
+"""
+
+import csv
+import json
+import time
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterator, List, TextIO
+
+import click
+from flask.cli import AppGroup
+
+from pydo.models import Task, TaskCounter, User
+
+tasks_cli = AppGroup('tasks', help='Manage tasks.')
+
+
+@tasks_cli.command('reconcile-counters')
+def reconcile_counters():
+    """
+    Recompute the task counters from the tasks, reporting (and fixing) any drift.
+    """
+    drifts = TaskCounter.reconcile()
+
+    for drift in drifts:
+        click.echo(
+            f'user_uuid={drift["user_uuid"]} status={drift["status"]}: '
+            f'expected {drift["expected"]}, found {drift["found"]}'
+        )
+    click.echo(f'{len(drifts)} drifted counter(s) fixed.')
+
+
+FILE_FORMATS = ('csv', 'ndjson')
+
+
+@tasks_cli.command('import')
+@click.argument('file', type=click.File('r', encoding='utf-8'))
+@click.option(
+    '--format',
+    'file_format',
+    type=click.Choice(FILE_FORMATS),
+    help='Format of the file (by default, guessed from its extension).',
+)
+@click.option(
+    '--chunk-size',
+    type=click.IntRange(min=1),
+    default=10_000,
+    show_default=True,
+    help='Number of tasks loaded (and committed) at a time.',
+)
+def import_tasks(file: TextIO, file_format: str, chunk_size: int):
+    """
+    Import tasks from a CSV (with a header) or NDJSON file ("-" for stdin).
+
+    Each task has the fields: username (or user_uuid), title, description,
+    status and due_date (ISO 8601, e.g. "2025-03-31 11:00"). Invalid tasks
+    are reported and skipped. The file is read and loaded (with COPY) in
+    chunks, so the memory used does not grow with its size.
+    """
+    file_format = file_format or guess_import_format(filename=file.name)
+    usernames = UsernameLookup()
+
+    imported_count = 0
+    skipped_count = 0
+    start = time.perf_counter()
+
+    for chunk in read_chunks(
+        rows=read_rows(file=file, file_format=file_format), size=chunk_size
+    ):
+        usernames.resolve(
+            usernames=[row.get('username') for _, row in chunk if isinstance(row, dict)]
+        )
+        validated_rows = [
+            (line_number, *validate_import_row(row=row, usernames=usernames))
+            for line_number, row in chunk
+        ]
+        existing_user_uuids = User.get_existing_uuids(
+            uuids={
+                task_data['user_uuid']
+                for _, task_data, errors in validated_rows
+                if not errors
+            }
+        )
+
+        tasks_data = []
+        for line_number, task_data, errors in validated_rows:
+            if not errors and task_data['user_uuid'] not in existing_user_uuids:
+                errors.append('user_uuid: user not found')
+            if errors:
+                skipped_count += 1
+                click.echo(f'line {line_number}: {"; ".join(errors)}', err=True)
+            else:
+                tasks_data.append(task_data)
+
+        Task.create_many(tasks_data=tasks_data, copy_threshold=0)
+        imported_count += len(tasks_data)
+
+        elapsed = time.perf_counter() - start
+        click.echo(
+            f'{imported_count} task(s) imported ({imported_count / elapsed:,.0f} rows/s)'
+        )
+
+    elapsed = time.perf_counter() - start
+    click.echo(
+        f'Done: {imported_count} task(s) imported, {skipped_count} skipped, '
+        f'in {elapsed:.1f}s ({imported_count / elapsed:,.0f} rows/s).'
+    )
+
+
+def guess_import_format(filename: str) -> str:
+    if filename.endswith('.csv'):
+        return 'csv'
+    if filename.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    raise click.UsageError('Could not guess the format of the file, use --format.')
+
+
+def read_rows(file: TextIO, file_format: str) -> Iterator[tuple]:
+    """
+    Read the file one row at a time, yielding (line number, row as dict).
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row
+
+
+def read_chunks(rows: Iterator, size: int) -> Iterator[List]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class UsernameLookup:
+    """
+    Cache of the users' uuids by username, filled with one query
+    for all the usernames (not cached yet) of each chunk.
+    """
+
+    def __init__(self):
+        self.uuids = {}
+
+    def resolve(self, usernames: List[str]):
+        missing = {username for username in usernames if username} - set(self.uuids)
+        if not missing:
+            return
+
+        self.uuids.update(dict.fromkeys(missing))
+        self.uuids.update(User.get_uuids_by_usernames(usernames=missing))
+
+    def get(self, username: str):
+        return self.uuids.get(username)
+
+
+def validate_import_row(row: Dict, usernames: UsernameLookup) -> tuple:
+    """
+    Validate a row of the file, the same way as the tasks of "POST /tasks/bulk"
+    (see "Task.validate_data"), returning the arguments of "Task.create" and
+    the errors found.
+    """
+    if not isinstance(row, dict):
+        return {}, ['invalid JSON object']
+
+    row = {name: value for name, value in row.items() if value not in ('', None)}
+
+    # dates are validated here, since they can be on any ISO 8601 format
+    due_date = None
+    if 'due_date' in row:
+        try:
+            due_date = datetime.fromisoformat(str(row.pop('due_date')))
+        except ValueError:
+            return {}, ['due_date: must be on the ISO 8601 format']
+
+    username = row.pop('username', None)
+    if username and 'user_uuid' not in row:
+        row['user_uuid'] = usernames.get(username)
+        if row['user_uuid'] is None:
+            return {}, [f'username: user not found: {username}']
+
+    if not row.get('user_uuid'):
+        return {}, ['username or user_uuid: required']
+
+    task_data, errors = Task.validate_data(data=row, default_user_uuid=None)
+    task_data['due_date'] = due_date
+    return task_data, errors
+
+
+@tasks_cli.command('export')
+@click.argument('output', type=click.File('wb'), default='-')
+@click.option(
+    '--format',
+    'file_format',
+    type=click.Choice(FILE_FORMATS),
+    default='csv',
+    show_default=True,
+)
+@click.option('--username', 'usernames', multiple=True, help='Owner of the tasks.')
+@click.option('--status', multiple=True, help='Status of the tasks.')
+@click.option(
+    '--start-due-date',
+    type=click.DateTime(),
+    help='Export the tasks due on or after this date.',
+)
+@click.option(
+    '--end-due-date',
+    type=click.DateTime(),
+    help='Export the tasks due on or before this date.',
+)
+@click.option('--search', default='', help='Full-text search on the tasks.')
+def export_tasks(
+    output: BinaryIO,
+    file_format: str,
+    usernames: List[str],
+    status: List[str],
+    start_due_date: datetime,
+    end_due_date: datetime,
+    search: str,
+):
+    """
+    Export the tasks to a CSV or NDJSON file (by default, to stdout).
+
+    The tasks are written as they are read from the database (with
+    "COPY ... TO STDOUT"), so the memory used does not grow with their number.
+    """
+    user_uuids = []
+    if usernames:
+        uuids_by_username = User.get_uuids_by_usernames(usernames=usernames)
+        missing_usernames = set(usernames) - set(uuids_by_username)
+        if missing_usernames:
+            raise click.BadParameter(
+                f'users not found: {", ".join(sorted(missing_usernames))}',
+                param_hint='--username',
+            )
+        user_uuids = list(uuids_by_username.values())
+
+    try:
+        Task.export(
+            file=output,
+            file_format=file_format,
+            user_uuids=user_uuids,
+            status=list(status),
+            start_due_date=start_due_date,
+            end_due_date=end_due_date,
+            search=search,
+        )
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint='--status')
@@ -1,8 +1,15 @@
+import base64
+import hashlib
+import json
 import os
+import queue
 import re
+import threading
+from datetime import datetime
 from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict
+from typing import Callable, Dict, Iterator, List, Tuple, Union
+from uuid import UUID
 
 from sqlalchemy.orm import Query
 from sqlalchemy.dialects import postgresql
@@ -27,8 +34,14 @@ def get_query_raw_sql(query: Query) -> str:
         params = compiled.params
         raw_query = f'{str(compiled)} [params: {params}]'
 
-    raw_query = re.sub(r'\s+', ' ', raw_query).strip()
-    return raw_query
+    return normalize_sql(statement=raw_query)
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    Collapse the whitespace of a SQL statement, so it fits on a single line.
+    """
+    return re.sub(r'\s+', ' ', statement).strip()
 
 
 def get_version_file_path() -> str:
@@ -56,6 +69,9 @@ def format_list_of_tasks(tasks: List['Task']) -> List[Dict]:  # noqa
     """
     Given tasks, iterate through each one and format it as a python dict.
 
+    The tasks can be either Task instances or the read-only rows returned by
+    "Task.filter_by(read_only=True)", since both have the same attributes.
+
     This is mainly intended to be used by the API.
     """
     # NOTE: imported here to avoid a circular dependency.
@@ -65,28 +81,35 @@ def format_list_of_tasks(tasks: List['Task']) -> List[Dict]:  # noqa
 
     formatted_tasks = []
     for task in tasks:
-        formatted_task = {
-            'uuid': str(task.uuid),
-            'title': task.title,
-            'description': task.description,
-            'status': task.status,
-            'due_date': task.due_date.isoformat(),
-            'created_at': task.created_at.isoformat(),
-            'last_updated_at': task.last_updated_at.isoformat(),
-            'user_uuid': task.user_uuid,
-            'user_name': task.user.username,
-        }
-        formatted_tasks.append(formatted_task)
+        formatted_tasks.append(format_task(task=task))
     return formatted_tasks
 
 
-def paginate_query(resultset: List, page_number: int) -> Dict:
+def format_task(task: 'Task') -> Dict:  # noqa
     """
-    Simple implementation to paginate a list of records.
+    Format a single task (see "format_list_of_tasks") as a python dict.
     """
+    # NOTE: UUIDs and datetimes are converted by the app's JSON provider
+    #       (see "init_json"), which is faster than converting them here.
+    return {
+        'uuid': task.uuid,
+        'title': task.title,
+        'description': task.description,
+        'status': task.status,
+        'due_date': task.due_date,
+        'created_at': task.created_at,
+        'last_updated_at': task.last_updated_at,
+        'version': task.version,
+        'user_uuid': task.user_uuid,
+        'user_name': task.user_name,
+    }
 
-    # NOTE: change this to be set on the app settings (+ env file)
-    ITEMS_PER_PAGE = 5
+
+def paginate_query(resultset: List, page_number: int, items_per_page: int) -> Dict:
+    """
+    Simple implementation to paginate a list of records.
+    """
+    ITEMS_PER_PAGE = items_per_page
 
     total_pages = (len(resultset) + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE
 
@@ -110,3 +133,112 @@ def paginate_query(resultset: List, page_number: int) -> Dict:
     }
 
     return result
+
+
+def encode_cursor(due_date: Union[None, datetime], uuid: str) -> str:
+    """
+    Encode the position of a task as an opaque cursor, to be used by
+    keyset pagination (see "Task.filter_page").
+    """
+    position = [due_date.isoformat() if due_date else None, str(uuid)]
+    raw_cursor = json.dumps(position, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw_cursor).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[Union[None, datetime], str]:
+    """
+    Decode a cursor generated by "encode_cursor" back to (due_date, uuid).
+
+    Raises ValueError if the cursor is not valid.
+    """
+    try:
+        raw_cursor = base64.urlsafe_b64decode(cursor.encode('ascii'))
+        due_date, uuid = json.loads(raw_cursor)
+        due_date = datetime.fromisoformat(due_date) if due_date else None
+        return due_date, str(UUID(uuid))
+    except Exception as exc:
+        raise ValueError(f'Invalid cursor: {cursor}') from exc
+
+
+def build_etag(*parts) -> str:
+    """
+    Build an (unquoted) ETag value hashing the given parts.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = str(part).encode('utf-8')
+        digest.update(part)
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def iterate_copy_to(
+    copy: Callable[[object], None], cancel: Callable[[], None], chunk_size: int
+) -> Iterator[bytes]:
+    """
+    Iterate over the output of a "COPY ... TO STDOUT", in chunks of about
+    chunk_size bytes.
+
+    copy(file) runs the COPY writing its output to file (e.g. psycopg2's
+    "copy_expert"). It runs on another thread, which waits (through a bounded
+    queue) while the chunks are not consumed, so the memory used does not grow
+    with the size of the output. If the iteration is stopped before the end
+    (e.g. the client disconnected), the COPY is cancelled with cancel().
+    """
+    chunks = queue.Queue(maxsize=4)
+    end_of_copy = object()
+    stopped = threading.Event()
+    errors = []
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    class ChunkWriter:
+        def __init__(self):
+            self.parts = []
+            self.size = 0
+
+        def write(self, data: bytes):
+            self.parts.append(data)
+            self.size += len(data)
+            if self.size >= chunk_size:
+                self.flush()
+
+        def flush(self):
+            if self.parts:
+                put(b''.join(self.parts))
+                self.parts = []
+                self.size = 0
+
+    def run():
+        try:
+            writer = ChunkWriter()
+            copy(writer)
+            writer.flush()
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            put(end_of_copy)
+
+    thread = threading.Thread(target=run, name='copy-to', daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is end_of_copy:
+                break
+            yield chunk
+        thread.join()
+        if errors:
+            raise errors[0]
+    finally:
+        if thread.is_alive():
+            stopped.set()
+            cancel()
+            thread.join()
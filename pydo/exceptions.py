@@ -3,3 +3,21 @@ class APIError(Exception):
         super().__init__(self)
         self.status_code = status_code
         self.payload = payload
+
+
+class VersionMismatchError(Exception):
+    """
+    Raised when updating a task that is not on the expected version anymore
+    (it was changed by someone else), see "Task.update_by_uuid".
+    """
+
+    def __init__(self, current_version: int):
+        super().__init__(f'the task is on version {current_version}')
+        self.current_version = current_version
+
+
+class PasswordHasherBusyError(Exception):
+    """
+    Raised when too many passwords are waiting to be hashed or checked
+    (see "PasswordHasher.run").
+    """
@@ -4,17 +4,74 @@ from the official flask docs for app factories:
 https://flask.palletsprojects.com/en/1.1.x/patterns/appfactories/#factories-extensions
 """
 
+import hashlib
+import time
+from datetime import date
+from uuid import UUID
+
 from celery import Celery
 from flasgger import Swagger
-from flask_bcrypt import Bcrypt
+from flask import Flask, Response
+from flask.json.provider import DefaultJSONProvider
 from flask_jwt_extended import JWTManager
+from flask_jwt_extended.config import config as jwt_config
+from flask_jwt_extended.exceptions import UserLookupError
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
+from werkzeug.local import LocalProxy
 from pydo import settings
+from pydo.cache import TasksCache, TTLCache
+from pydo.passwords import PasswordHasher
+from pydo.revocation import RevocationFilter
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class CachedJWTManager(JWTManager):
+    """
+    flask_jwt_extended's JWTManager, but keeping the claims of the verified
+    tokens on a per-process LRU cache ("jwt_decode_cache"), keyed by a digest
+    of the token, until they expire. So a client sending the same token on many
+    requests only has its signature verified (and claims validated) once.
+
+    Only the decoding is cached: the checks done after it on each request
+    (token type, freshness, revocation...) still run.
+    """
+
+    def _decode_jwt_from_config(
+        self, encoded_token: str, csrf_value=None, allow_expired: bool = False
+    ) -> dict:
+        if allow_expired:
+            return super()._decode_jwt_from_config(
+                encoded_token, csrf_value, allow_expired
+            )
+
+        digest = hashlib.sha256(encoded_token.encode('utf-8'))
+        if csrf_value is not None:
+            digest.update(b'\x00' + csrf_value.encode('utf-8'))
+        key = digest.hexdigest()
+
+        claims = jwt_decode_cache.get(key)
+        if claims is None:
+            claims = super()._decode_jwt_from_config(encoded_token, csrf_value)
+            ttl = claims.get('exp', 0) - time.time()
+            if ttl > 0:
+                jwt_decode_cache.set(key, claims, ttl=ttl)
+        # a copy, so that changes to the claims of a request are not cached
+        return dict(claims)
 
 
-bcrypt = Bcrypt()
-jwt = JWTManager()
+password_hasher = PasswordHasher()
+jwt_decode_cache = TTLCache(ttl=0, max_size=settings.JWT_DECODE_CACHE_MAX_SIZE)
+jwt = CachedJWTManager()
+revocation_filter = RevocationFilter()
+tasks_cache = TasksCache()
+users_cache = TTLCache(
+    ttl=settings.USERS_CACHE_TTL, max_size=settings.USERS_CACHE_MAX_SIZE
+)
 
 
 def init_swagger(app):
@@ -23,12 +80,140 @@ def init_swagger(app):
 
 def init_bcrypt(app):
     app.config['JWT_SECRET_KEY'] = settings.JWT_SECRET_KEY
-    bcrypt.init_app(app)
+    password_hasher.init_app(
+        rounds=settings.BCRYPT_ROUNDS,
+        workers=settings.PASSWORD_HASH_WORKERS,
+        max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+        queue_timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT,
+    )
 
 
 def init_jwt(app):
     app.config['JWT_SECRET_KEY'] = settings.JWT_SECRET_KEY
     jwt.init_app(app)
+    jwt.user_lookup_loader(lookup_current_user)
+    jwt.token_in_blocklist_loader(is_token_revoked)
+
+    # imported here because the models import this module
+    from pydo.models import RevokedToken
+
+    revocation_filter.init_app(
+        capacity=settings.REVOCATION_FILTER_CAPACITY,
+        false_positive_rate=settings.REVOCATION_FILTER_FALSE_POSITIVE_RATE,
+        poll_interval=settings.REVOCATION_POLL_INTERVAL,
+        rebuild_interval=settings.REVOCATION_FILTER_REBUILD_INTERVAL,
+        poll_overlap=settings.REVOCATION_POLL_OVERLAP,
+        load_revocations=RevokedToken.get_keys_since,
+    )
+
+
+def is_token_revoked(jwt_header: dict, jwt_data: dict) -> bool:
+    """
+    The blocklist check of flask_jwt_extended: only refresh tokens are revoked
+    (access tokens are short lived), checked on the process' Bloom filter, and
+    on the database only when the filter says they may be revoked.
+    """
+    if jwt_data['type'] != 'refresh':
+        return False
+
+    from pydo.models import RevokedToken
+
+    jti = jwt_data['jti']
+    user_uuid = jwt_data[jwt_config.identity_claim_key]
+    keys = RevokedToken.get_keys(jti=jti, user_uuid=user_uuid)
+    if not revocation_filter.might_contain(keys=keys):
+        return False
+    # NOTE: tokens issued before the generations were sent are of the first one
+    return RevokedToken.is_revoked(
+        jti=jti,
+        user_uuid=user_uuid,
+        token_generation=jwt_data.get('token_generation', 0),
+    )
+
+
+def lookup_current_user(jwt_header: dict, jwt_data: dict) -> LocalProxy:
+    """
+    The "current_user" of flask_jwt_extended, loaded lazily: flask_jwt_extended
+    calls this on every request with a valid token, but the user is only loaded
+    (once per request) when "current_user" is actually used.
+    """
+    # imported here because the models import this module
+    from pydo.models import User
+
+    user_uuid = jwt_data[jwt_config.identity_claim_key]
+    loaded_user = []
+
+    def load_user() -> User:
+        if not loaded_user:
+            user = User.get_cached(uuid=user_uuid)
+            if user is None:
+                raise UserLookupError(
+                    f'user_lookup returned None for {user_uuid}', jwt_header, jwt_data
+                )
+            loaded_user.append(user)
+        return loaded_user[0]
+
+    return LocalProxy(load_user)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    Flask's JSON provider, but serializing dates and datetimes on ISO 8601
+    (instead of Flask's default HTTP date format), the same as FastJSONProvider.
+    """
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, date):
+            return o.isoformat()
+        if isinstance(o, UUID):
+            return str(o)
+        return DefaultJSONProvider.default(o)
+
+
+class FastJSONProvider(JSONProvider):
+    """
+    JSON provider using orjson, which serializes natively (without python loops)
+    the most common types on the API responses: dicts, lists, strings, datetimes
+    (on ISO 8601) and UUIDs.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        return self.dump_bytes(obj).decode('utf-8')
+
+    def dump_bytes(self, obj) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            self.dump_bytes(obj) + b'\n', mimetype=self.mimetype
+        )
+
+
+def init_json(app: Flask):
+    """
+    Use the fast JSON provider when orjson is installed, otherwise fall back
+    to the (stdlib json based) Flask provider.
+    """
+    provider_class = FastJSONProvider if orjson else JSONProvider
+    app.json = provider_class(app)
+
+
+def init_cache(app):
+    tasks_cache.init_app(
+        backend_name=settings.TASKS_CACHE_BACKEND,
+        ttl=settings.TASKS_CACHE_TTL,
+        max_bytes=settings.TASKS_CACHE_MAX_BYTES,
+        path=settings.TASKS_CACHE_PATH,
+        processes=settings.WEB_WORKERS,
+    )
 
 
 def init_celery(app):
@@ -49,6 +234,17 @@ def init_celery(app):
         'task_create_missing_queues': True,
         'task_routes': settings.TASKS_QUEUES,
         'accept_content': ['pickle', 'json'],
+        # run by "celery beat" (see "runbeat" on the Makefile)
+        'beat_schedule': {
+            'sweep-idempotency-keys': {
+                'task': 'pydo.tasks.sweep_idempotency_keys',
+                'schedule': settings.IDEMPOTENCY_SWEEP_INTERVAL,
+            },
+            'sweep-revoked-tokens': {
+                'task': 'pydo.tasks.sweep_revoked_tokens',
+                'schedule': settings.REVOKED_TOKENS_SWEEP_INTERVAL,
+            },
+        },
     }
 
     if settings.IS_DEV_APP:
@@ -90,6 +286,6 @@ def init_db(app):
     db.init_app(app)
 
     # models must be imported here so that the migrations app detect them
-    from pydo.models import User, Task  # noqa
+    from pydo.models import User, Task, TaskCounter, IdempotencyKey, RevokedToken  # noqa
 
     migrate.init_app(app, db)
@@ -1,7 +1,16 @@
 import os
 
 from flask import Flask
-from pydo.extensions import init_celery, init_db, init_swagger, init_bcrypt, init_jwt
+from pydo.extensions import (
+    init_bcrypt,
+    init_cache,
+    init_celery,
+    init_db,
+    init_json,
+    init_jwt,
+    init_swagger,
+)
+from pydo.tracing import init_sql_tracing
 
 PKG_NAME = os.path.dirname(os.path.realpath(__file__)).split('/')[-1]
 
@@ -10,10 +19,16 @@ PKG_NAME = os.path.dirname(os.path.realpath(__file__)).split('/')[-1]
 def create_app():
     app = Flask(PKG_NAME)
 
+    init_json(app)
+
     init_swagger(app)
 
     init_db(app)
 
+    init_sql_tracing(app)
+
+    init_cache(app)
+
     init_celery(app)
 
     init_bcrypt(app)
@@ -23,4 +38,8 @@ def create_app():
     from pydo.api import api_blueprint
 
     app.register_blueprint(api_blueprint)
+
+    from pydo.commands import tasks_cli
+
+    app.cli.add_command(tasks_cli)
     return app
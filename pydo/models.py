@@ -1,12 +1,53 @@
-from datetime import datetime
-from typing import List, Union
+import io
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Set, Tuple, Union
+from uuid import UUID as PythonUUID
 from uuid import uuid4
 
-from sqlalchemy import Enum
-from sqlalchemy.dialects.postgresql import UUID
+from flask_jwt_extended.config import config as jwt_config
+from sqlalchemy import (
+    Column,
+    Enum,
+    Row,
+    and_,
+    any_,
+    delete,
+    exists,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    text,
+    tuple_,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import (
+    ARRAY,
+    JSONB,
+    TSVECTOR,
+    UUID,
+    Insert,
+    insert as pg_insert,
+)
+from sqlalchemy.orm import Query, deferred, joinedload, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.sql.selectable import CTE
 
-from pydo.commons import get_query_raw_sql
-from pydo.extensions import db, bcrypt
+from pydo import settings
+from pydo.commons import iterate_copy_to
+from pydo.exceptions import VersionMismatchError
+from pydo.extensions import (
+    db,
+    password_hasher,
+    revocation_filter,
+    tasks_cache,
+    users_cache,
+)
 
 """
 Available datatypes:
@@ -14,13 +55,120 @@ https://docs.sqlalchemy.org/en/13/core/type_basics.html
 """
 
 
+def any_of(column: Column, values: List) -> ColumnElement:
+    """
+    Filter column by a list of values, as "column = ANY(:values::type[])".
+
+    The whole list is bound as a single array parameter, so the statement is
+    the same no matter how many values the list has.
+    """
+    return column == any_(literal(list(values), ARRAY(column.type)))
+
+
+def to_copy_text(value) -> str:
+    """
+    Format a value for "COPY ... FROM STDIN" (on its default text format).
+    """
+    if value is None:
+        return '\\N'
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+# current UTC time on the database (the same as "datetime.utcnow()" on python),
+# used as default of the timestamp columns
+UTC_NOW = "timezone('utc', clock_timestamp())"
+
+
+def utc_now() -> ColumnElement:
+    return func.timezone('utc', func.clock_timestamp())
+
+
+def returning_columns(model: db.Model) -> List[Column]:
+    """
+    The columns of the model read back by "INSERT/UPDATE ... RETURNING"
+    (all but the ones generated by the database, e.g. "Task.search_vector").
+    """
+    return [column for column in model.__table__.columns if column.computed is None]
+
+
+def attach(model: db.Model, values: Dict) -> db.Model:
+    """
+    Get an instance of the model with the given column values (e.g. returned
+    by "INSERT/UPDATE ... RETURNING" or from a cache), attached to the session
+    as if it was loaded from the database, without querying it again.
+
+    If the instance is already on the session, it is updated with the values.
+    """
+    instance = model(**values)
+    make_transient_to_detached(instance)
+    return db.session.merge(instance, load=False)
+
+
+def refresh_from(instance: db.Model, updated: db.Model):
+    """
+    Refresh the instance with the column values of updated (an instance of the
+    same row, see "attach"), when they are not the same (e.g. when the instance
+    is not on the session).
+    """
+    if updated is instance:
+        return
+
+    for column in returning_columns(type(instance)):
+        set_committed_value(instance, column.key, getattr(updated, column.key))
+
+
+def delete_expired(model: db.Model, batch_size: int) -> int:
+    """
+    Delete the rows of the model whose "expires_at" passed, batch_size at a time
+    (each on its own short transaction, skipping the locked rows), returning how
+    many were deleted.
+    """
+    table = model.__table__
+    (primary_key,) = table.primary_key.columns
+    expired = (
+        select(primary_key)
+        .where(table.c.expires_at < utc_now())
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    statement = delete(table).where(primary_key.in_(expired.scalar_subquery()))
+
+    deleted = 0
+    while True:
+        result = db.session.execute(statement)
+        db.session.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+
+TASK_STATUSES = ['pending', 'in_progress', 'completed']
+task_status_enum = Enum(*TASK_STATUSES, name='task_status_enum')
+
+# text search configuration (language) used to search tasks
+TASK_SEARCH_CONFIG = 'english'
+
+
 class User(db.Model):
-    uuid = db.Column(UUID(as_uuid=True), default=uuid4, primary_key=True)
+    # NOTE: the defaults are set by the database, and read back with
+    #       "INSERT ... RETURNING" (see "register")
+    uuid = db.Column(
+        UUID(as_uuid=True), server_default=text('gen_random_uuid()'), primary_key=True
+    )
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    last_updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=text(UTC_NOW))
+    last_updated_at = db.Column(db.DateTime, server_default=text(UTC_NOW))
+    # NOTE: sent on the refresh tokens (see "login"), and bumped when they are
+    #       revoked (see "update"), so the ones of older generations are revoked
+    token_generation = db.Column(db.Integer, server_default=text('0'), nullable=False)
 
     # NOTE: using backref here because it will automatically create the reverse side so on the Task model
     #       so I can get e.g. "task_instance.user.email".
@@ -29,35 +177,138 @@ class User(db.Model):
     tasks = db.relationship('Task', backref='user', lazy=True)
 
     def hash(self, password: str) -> object:
-        return bcrypt.generate_password_hash(password).decode('utf-8')
+        return password_hasher.hash(password)
 
     def check_password(self, password: str) -> bool:
-        return bcrypt.check_password_hash(self.password_hash, password)
+        """
+        Check the password (see "PasswordHasher"). When it is valid, but its
+        hash was made with another cost factor (BCRYPT_ROUNDS changed), the
+        password is hashed again with the current one.
+        """
+        is_valid = password_hasher.check(self.password_hash, password)
+        if is_valid and password_hasher.needs_rehash(self.password_hash):
+            self.rehash_password(password=password)
+        return is_valid
+
+    def rehash_password(self, password: str):
+        table = User.__table__
+        password_hash = self.hash(password)
+        db.session.execute(
+            update(table)
+            .where(table.c.uuid == self.uuid)
+            .values(password_hash=password_hash)
+        )
+        db.session.commit()
+        User.invalidate_cached(uuid=self.uuid)
+        set_committed_value(self, 'password_hash', password_hash)
 
     def register(self, username: str, email: str, password: str) -> 'User':
+        """
+        Create the user with a single "INSERT ... RETURNING" statement.
+        """
         # TODO: handle existing user
-        new_user = User(
-            username=username, email=email, password_hash=self.hash(password)
+        statement = (
+            insert(User.__table__)
+            .values(username=username, email=email, password_hash=self.hash(password))
+            .returning(*returning_columns(User))
         )
-        db.session.add(new_user)
+        values = db.session.execute(statement).one()._mapping
         db.session.commit()
-        db.session.refresh(new_user)
-        return new_user
+        return attach(User, values)
 
     def update(self, email: str = '', password: str = ''):
+        """
+        Update the user with a single "UPDATE ... RETURNING" statement,
+        refreshing this instance with the returned values. Changing the password
+        revokes the user's refresh tokens (see "RevokedToken").
+        """
         if (not email) and (not password):
             return self
 
+        changes = {}
+
         if email:
-            self.email = email
+            changes['email'] = email
 
+        table = User.__table__
         if password:
-            self.password_hash = self.hash(password)
+            changes['password_hash'] = self.hash(password)
+            changes['token_generation'] = table.c.token_generation + 1
 
-        self.last_updated_at = datetime.utcnow()
-        db.session.add(self)
+        statement = (
+            update(table)
+            .where(table.c.uuid == self.uuid)
+            .values(**changes, last_updated_at=utc_now())
+            .returning(*returning_columns(User))
+        )
+        if password:
+            # changing the password revokes the user's refresh tokens
+            updated = statement.cte('updated')
+            revoke_tokens = RevokedToken.build_revoke_user(updated=updated)
+            statement = select(updated).add_cte(revoke_tokens.cte('revoke_tokens'))
+        values = db.session.execute(statement).one()._mapping
         db.session.commit()
-        db.session.refresh(self)
+        User.invalidate_cached(uuid=values['uuid'])
+        if password:
+            revocation_filter.add(keys=[f'user:{values["uuid"]}'])
+        refresh_from(instance=self, updated=attach(User, values))
+
+    @staticmethod
+    def get_cached(uuid: str) -> Union[None, 'User']:
+        """
+        Get a user by uuid, from the identity cache ("users_cache") when possible,
+        so without querying the database.
+
+        The cache keeps the user's column values, which are attached to the
+        current session as if they were loaded from the database (so the user
+        can be changed and saved as usual).
+
+        The cache is local to the process, so its entries are only used while
+        the user's version on the tasks cache (shared by the processes) is the
+        one they were cached with. When the tasks cache is disabled, the user is
+        always loaded from the database.
+        """
+        # the version is read before the user, so a concurrent update bumps it
+        version = tasks_cache.get_user_version(user_uuid=str(uuid))
+        cached = users_cache.get(str(uuid)) if version is not None else None
+        if cached is None or cached[1] != version:
+            user = User.get_by(uuid=uuid)
+            if user is not None and version is not None:
+                values = {
+                    column.key: getattr(user, column.key)
+                    for column in User.__table__.columns
+                }
+                users_cache.set(str(uuid), (values, version))
+            return user
+
+        values, _ = cached
+        return attach(User, values)
+
+    @staticmethod
+    def invalidate_cached(uuid: PythonUUID):
+        """
+        Invalidate the user cached by "get_cached", on all the processes.
+        """
+        users_cache.delete(str(uuid))
+        tasks_cache.invalidate_user(user_uuid=str(uuid))
+
+    @staticmethod
+    def get_existing_uuids(uuids: Iterable[PythonUUID]) -> Set[PythonUUID]:
+        """
+        Get which of the given uuids are of existing users, with a single query.
+        """
+        query = db.session.query(User.uuid).filter(any_of(User.uuid, uuids))
+        return {row.uuid for row in query}
+
+    @staticmethod
+    def get_uuids_by_usernames(usernames: Iterable[str]) -> Dict[str, PythonUUID]:
+        """
+        Get the uuids of the users with the given usernames, with a single query.
+        """
+        query = db.session.query(User.username, User.uuid).filter(
+            any_of(User.username, usernames)
+        )
+        return {row.username: row.uuid for row in query}
 
     @staticmethod
     def get_by(
@@ -73,22 +324,102 @@ class User(db.Model):
 
 
 class Task(db.Model):
-    uuid = db.Column(UUID(as_uuid=True), default=uuid4, primary_key=True)
+    # NOTE: indexes matched to the shapes of the queries built by "build_filter_query"
+    #       and "filter_page". They are created concurrently by the migrations,
+    #       so that adding them does not lock the table.
+    __table_args__ = (
+        db.Index(
+            'ix_task_user_uuid_status_due_date', 'user_uuid', 'status', 'due_date'
+        ),
+        db.Index(
+            'ix_task_open_user_uuid_due_date',
+            'user_uuid',
+            'due_date',
+            postgresql_where=text("status != 'completed'"),
+        ),
+        db.Index('ix_task_due_date_uuid', 'due_date', 'uuid'),
+        db.Index('ix_task_search_vector', 'search_vector', postgresql_using='gin'),
+    )
+
+    # NOTE: the defaults are set by the database, and read back with
+    #       "INSERT ... RETURNING" (see "create")
+    uuid = db.Column(
+        UUID(as_uuid=True), server_default=text('gen_random_uuid()'), primary_key=True
+    )
     title = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text, nullable=True)
     status = db.Column(
-        Enum('pending', 'in_progress', 'completed', name='task_status_enum'),
-        default='pending',
+        task_status_enum,
+        server_default='pending',
         nullable=False,
     )
     due_date = db.Column(db.DateTime, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    last_updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=text(UTC_NOW))
+    last_updated_at = db.Column(db.DateTime, server_default=text(UTC_NOW))
+    # NOTE: incremented by every update, for optimistic concurrency control
+    #       (see "update_by_uuid")
+    version = db.Column(db.Integer, server_default='1', nullable=False)
 
     user_uuid = db.Column(
         UUID(as_uuid=True), db.ForeignKey('user.uuid'), nullable=False
     )
 
+    # NOTE: full-text search vector of title (with higher weight) and description,
+    #       generated and stored by the database. It is deferred, so that it is
+    #       only loaded when explicitly requested.
+    search_vector = deferred(
+        db.Column(
+            TSVECTOR,
+            db.Computed(
+                f"setweight(to_tsvector('{TASK_SEARCH_CONFIG}', "
+                "coalesce(title, '')), 'A') || "
+                f"setweight(to_tsvector('{TASK_SEARCH_CONFIG}', "
+                "coalesce(description, '')), 'B')",
+                persisted=True,
+            ),
+        )
+    )
+
+    @property
+    def user_name(self) -> str:
+        return self.user.username
+
+    @staticmethod
+    def listing_columns() -> Tuple:
+        """
+        The columns needed to list tasks (see "format_list_of_tasks").
+        """
+        return (
+            Task.uuid,
+            Task.title,
+            Task.description,
+            Task.status,
+            Task.due_date,
+            Task.created_at,
+            Task.last_updated_at,
+            Task.version,
+            Task.user_uuid,
+            User.username.label('user_name'),
+        )
+
+    @staticmethod
+    def select_for_listing(query: Query, read_only: bool = False) -> Query:
+        """
+        Make a filter query load what is needed to list the tasks.
+
+        By default, it loads Task instances, with the username of each task's user
+        loaded on the same query (through a join), so that serializing the tasks
+        does not run one extra query per task.
+
+        With read_only, only the listing columns are selected, and the query
+        returns lightweight rows (named tuples) instead of Task instances. Those
+        skip the session identity map, attribute instrumentation and change
+        tracking, so they are cheaper to build but cannot be changed/saved.
+        """
+        if read_only:
+            return query.join(Task.user).with_entities(*Task.listing_columns())
+        return query.options(joinedload(Task.user).load_only(User.username))
+
     def create(
         self,
         user_uuid: str,
@@ -97,19 +428,120 @@ class Task(db.Model):
         status: str,
         due_date: datetime = None,
     ) -> 'Task':
+        """
+        Create the task, and count it on its counter, with a single
+        "INSERT ... RETURNING" statement (the counter is upserted by a CTE).
+        """
         data = {
             'user_uuid': user_uuid,
             'title': title,
             'description': description,
-            'status': status,
+            'status': status or 'pending',
         }
         if due_date:
             data['due_date'] = due_date
-        new_task = Task(**data)
-        db.session.add(new_task)
+
+        new_task = (
+            insert(Task.__table__)
+            .values(**data)
+            .returning(*returning_columns(Task))
+            .cte('new_task')
+        )
+        count_new_task = TaskCounter.add_from(
+            deltas=select(new_task.c.user_uuid, new_task.c.status, literal(1))
+        ).cte('count_new_task')
+        statement = select(new_task).add_cte(count_new_task)
+
+        values = db.session.execute(statement).one()._mapping
         db.session.commit()
-        db.session.refresh(new_task)
-        return new_task
+        tasks_cache.invalidate(user_uuids=[user_uuid])
+        return attach(Task, values)
+
+    @staticmethod
+    def create_many(
+        tasks_data: List[Dict], copy_threshold: int = settings.BULK_COPY_THRESHOLD
+    ) -> List[Dict]:
+        """
+        Create many tasks on a single transaction, with multi-row
+        "INSERT ... RETURNING" statements or, when there are more than
+        copy_threshold tasks, with "COPY ... FROM STDIN" (which is faster
+        to load many rows).
+
+        Each of tasks_data has the (already validated) arguments of "create".
+        Returns the created tasks, as dicts, on the same order.
+        """
+        if not tasks_data:
+            return []
+
+        now = datetime.utcnow()
+        rows = [
+            {
+                'uuid': uuid4(),
+                'user_uuid': data['user_uuid'],
+                'title': data['title'],
+                'description': data.get('description'),
+                'status': data.get('status') or 'pending',
+                'due_date': data.get('due_date'),
+                'created_at': now,
+                'last_updated_at': now,
+                'version': 1,
+            }
+            for data in tasks_data
+        ]
+
+        if len(rows) > copy_threshold:
+            Task.copy_rows(rows=rows)
+            created_tasks = rows
+        else:
+            # SQLAlchemy sends the rows on multi-row INSERTs ("insertmanyvalues"),
+            # which return them on any order (so they are sorted by uuid below)
+            table = Task.__table__
+            statement = insert(table).returning(
+                *(table.c[column] for column in Task.COPY_COLUMNS)
+            )
+            result = db.session.execute(statement, rows)
+            created_by_uuid = {row.uuid: dict(row._mapping) for row in result}
+            created_tasks = [created_by_uuid[row['uuid']] for row in rows]
+
+        counts = Counter((row['user_uuid'], row['status']) for row in rows)
+        for (user_uuid, status), count in counts.items():
+            TaskCounter.add(user_uuid=user_uuid, status=status, delta=count)
+
+        db.session.commit()
+        tasks_cache.invalidate(user_uuids=[user_uuid for user_uuid, _ in counts])
+        return created_tasks
+
+    # columns written by "copy_rows", on this order
+    COPY_COLUMNS = (
+        'uuid',
+        'user_uuid',
+        'title',
+        'description',
+        'status',
+        'due_date',
+        'created_at',
+        'last_updated_at',
+        'version',
+    )
+
+    @staticmethod
+    def copy_rows(rows: List[Dict]):
+        """
+        Load the rows (dicts with the COPY_COLUMNS) on the task table with
+        "COPY ... FROM STDIN", on the current transaction.
+        """
+        buffer = io.StringIO()
+        for row in rows:
+            values = (to_copy_text(row[column]) for column in Task.COPY_COLUMNS)
+            buffer.write('\t'.join(values) + '\n')
+        buffer.seek(0)
+
+        columns = ', '.join(Task.COPY_COLUMNS)
+        cursor = db.session.connection().connection.cursor()
+        try:
+            cursor.copy_expert(f'COPY task ({columns}) FROM STDIN', buffer)
+        finally:
+            cursor.close()
 
     def update(
         self,
@@ -118,110 +550,1016 @@ class Task(db.Model):
         status: str = '',
         due_date: datetime = None,
         user_uuid: str = '',
+        version: int = None,
     ):
+        """
+        Update the task (see "update_by_uuid"), refreshing this instance.
+        """
         if not (title or description or status or due_date):
             return
 
-        if title:
-            self.title = title
+        updated_task = Task.update_by_uuid(
+            uuid=self.uuid,
+            title=title,
+            description=description,
+            status=status,
+            due_date=due_date,
+            user_uuid=user_uuid,
+            version=version,
+        )
+        if updated_task is not None:
+            refresh_from(instance=self, updated=updated_task)
 
-        if description:
-            self.description = description
+    @staticmethod
+    def update_by_uuid(
+        uuid: str,
+        title: str = '',
+        description: str = '',
+        status: str = '',
+        due_date: datetime = None,
+        user_uuid: str = '',
+        version: int = None,
+    ) -> Union[None, 'Task']:
+        """
+        Update a task (without loading it first), moving it between the counters
+        when its owner or status change, with a single "UPDATE ... RETURNING"
+        statement:
 
-        if status:
-            self.status = status
+            WITH previous AS (SELECT ... FROM task WHERE uuid = :uuid FOR UPDATE),
+            updated AS (UPDATE task ... FROM previous ... RETURNING ...),
+            move_counters AS (INSERT INTO task_counters ... ON CONFLICT ...)
+            SELECT ... FROM updated
 
-        if due_date:
-            self.due_date = due_date
+        The task's version is incremented. When version is given, the task is
+        only updated if it is still on that version (optimistic concurrency
+        control): the statement has "WHERE uuid = :uuid AND version = :version"
+        instead of locking the task on "previous", since a concurrent update
+        would have changed the version (so no row is updated), otherwise
+        "previous" has the current values. If the task is on another version,
+        VersionMismatchError is raised.
 
+        Returns the updated task, or None if it does not exist.
+        """
+        changes = {
+            name: value
+            for name, value in (
+                ('title', title),
+                ('description', description),
+                ('status', status),
+                ('due_date', due_date),
+                ('user_uuid', user_uuid),
+            )
+            if value
+        }
+
+        table = Task.__table__
+        previous = select(
+            table.c.uuid, table.c.user_uuid, table.c.status, table.c.version
+        ).where(table.c.uuid == uuid)
+        if version is None:
+            previous = previous.with_for_update()
+        else:
+            previous = previous.where(table.c.version == version)
+        previous = previous.cte('previous')
+        updated = (
+            update(table)
+            .where(
+                table.c.uuid == previous.c.uuid,
+                table.c.version == previous.c.version,
+            )
+            .values(**changes, last_updated_at=utc_now(), version=table.c.version + 1)
+            .returning(
+                *returning_columns(Task),
+                previous.c.user_uuid.label('previous_user_uuid'),
+                previous.c.status.label('previous_status'),
+            )
+            .cte('updated')
+        )
+        is_moved = tuple_(updated.c.user_uuid, updated.c.status).is_distinct_from(
+            tuple_(updated.c.previous_user_uuid, updated.c.previous_status)
+        )
+        move_counters = TaskCounter.add_from(
+            deltas=union_all(
+                select(updated.c.user_uuid, updated.c.status, literal(1)).where(
+                    is_moved
+                ),
+                select(
+                    updated.c.previous_user_uuid, updated.c.previous_status, literal(-1)
+                ).where(is_moved),
+            )
+        ).cte('move_counters')
+        statement = select(updated).add_cte(move_counters)
+
+        row = db.session.execute(statement).one_or_none()
+        if row is None:
+            if version is None:
+                return None
+
+            current_version = Task.get_version(uuid=uuid)
+            if current_version is None:
+                return None
+            raise VersionMismatchError(current_version=current_version)
+
+        db.session.commit()
+        values = dict(row._mapping)
+        previous_user_uuid = values.pop('previous_user_uuid')
+        values.pop('previous_status')
+        tasks_cache.invalidate(user_uuids=[previous_user_uuid, values['user_uuid']])
+        return attach(Task, values)
+
+    @staticmethod
+    def get_version(uuid: str, user_uuid: str = None) -> Union[None, int]:
+        """
+        Get the current version of a task (of the user, if informed), or None if
+        it does not exist.
+        """
+        statement = select(Task.version).where(Task.uuid == uuid)
         if user_uuid:
-            self.user_uuid = user_uuid
+            statement = statement.where(Task.user_uuid == user_uuid)
+        return db.session.execute(statement).scalar_one_or_none()
+
+    @staticmethod
+    def get_owners(uuids: Iterable[str]) -> Set[PythonUUID]:
+        """
+        Get the users owning the tasks with the given uuids, with a single query.
+        Raises ValueError if any of the uuids is invalid.
+        """
+        uuids = [PythonUUID(str(uuid)) for uuid in uuids]
+        if not uuids:
+            return set()
+        query = db.session.query(Task.user_uuid).filter(any_of(Task.uuid, uuids))
+        return {row.user_uuid for row in query.distinct()}
+
+    # fields that can be changed by "update_many"
+    BULK_UPDATE_FIELDS = ('status', 'due_date', 'user_uuid')
+
+    @staticmethod
+    def update_many(
+        changes: Dict,
+        user_uuids: List[str] = [],
+        uuids: List[str] = [],
+        status: List[str] = [],
+        start_due_date: datetime = None,
+        end_due_date: datetime = None,
+        search: str = '',
+    ) -> List[Row]:
+        """
+        Apply the changes (to BULK_UPDATE_FIELDS) to all the tasks matching
+        the filters (the same as "filter_by"), with a single
+        "UPDATE ... FROM (SELECT ... FOR UPDATE) ... RETURNING" statement.
+
+        The subquery locks the tasks and returns their previous owner and status,
+        so that the task counters can be moved on the same transaction.
+        Returns the updated tasks (uuid, user_uuid, status, previous_user_uuid
+        and previous_status).
+        """
+        invalid_fields = set(changes) - set(Task.BULK_UPDATE_FIELDS)
+        if invalid_fields:
+            raise ValueError(f'Fields that cannot be changed: {sorted(invalid_fields)}')
+        if not changes:
+            raise ValueError('No changes to apply.')
+        if not (
+            user_uuids or uuids or status or start_due_date or end_due_date or search
+        ):
+            raise ValueError('At least one filter is required.')
+        if 'status' in changes:
+            Task.validate_status(status=[changes['status']])
+
+        where_clause = Task.build_filter_query(
+            user_uuids=user_uuids,
+            uuids=uuids,
+            status=status,
+            start_due_date=start_due_date,
+            end_due_date=end_due_date,
+            search=search,
+        ).whereclause
+
+        table = Task.__table__
+        previous = (
+            select(table.c.uuid, table.c.user_uuid, table.c.status)
+            .where(where_clause)
+            .with_for_update()
+            .subquery('previous')
+        )
+        statement = (
+            update(table)
+            .where(table.c.uuid == previous.c.uuid)
+            .values(**changes, last_updated_at=utc_now(), version=table.c.version + 1)
+            .returning(
+                table.c.uuid,
+                table.c.user_uuid,
+                table.c.status,
+                previous.c.user_uuid.label('previous_user_uuid'),
+                previous.c.status.label('previous_status'),
+            )
+        )
+        updated_tasks = db.session.execute(statement).all()
+
+        deltas = Counter()
+        for task in updated_tasks:
+            deltas[(task.previous_user_uuid, task.previous_status)] -= 1
+            deltas[(task.user_uuid, task.status)] += 1
+        for (user_uuid, task_status), delta in deltas.items():
+            if delta:
+                TaskCounter.add(user_uuid=user_uuid, status=task_status, delta=delta)
 
-        self.last_updated_at = datetime.utcnow()
-        db.session.add(self)
         db.session.commit()
-        db.session.refresh(self)
+        tasks_cache.invalidate(
+            user_uuids={task.previous_user_uuid for task in updated_tasks}
+            | {task.user_uuid for task in updated_tasks}
+        )
+        return updated_tasks
 
     @staticmethod
     def delete(user_uuid: str, uuid: str) -> bool:
+        """
+        Delete a task of the user, returning if it was deleted (see "delete_many").
+        """
+        return bool(Task.delete_many(user_uuid=user_uuid, uuids=[uuid]))
+
+    @staticmethod
+    def delete_many(user_uuid: str, uuids: List[str]) -> List[PythonUUID]:
+        """
+        Delete the tasks of the user with the given uuids, with a single
+        "DELETE ... WHERE user_uuid = :u AND uuid = ANY(:ids) RETURNING" statement.
+
+        Returns the uuids of the deleted tasks (the others were not found).
+        Raises ValueError if any of the uuids is invalid.
+        """
+        uuids = [PythonUUID(str(uuid)) for uuid in uuids]
+        if not uuids:
+            return []
+
+        table = Task.__table__
+        statement = (
+            table.delete()
+            .where(table.c.user_uuid == user_uuid, any_of(table.c.uuid, uuids))
+            .returning(table.c.uuid, table.c.status)
+        )
+        deleted_tasks = db.session.execute(statement).all()
+
+        for task_status, count in Counter(
+            task.status for task in deleted_tasks
+        ).items():
+            TaskCounter.add(user_uuid=user_uuid, status=task_status, delta=-count)
+
+        db.session.commit()
+        if deleted_tasks:
+            tasks_cache.invalidate(user_uuids=[user_uuid])
+        return [task.uuid for task in deleted_tasks]
+
+    @staticmethod
+    def validate_status(status: List[str]):
+        valid_statuses = TASK_STATUSES
+        invalid_statuses = [s for s in status if s not in valid_statuses]
+        if invalid_statuses:
+            raise ValueError(
+                f'Invalid status values: {invalid_statuses}. '
+                f'Allowed values are: {valid_statuses}'
+            )
+
+    @staticmethod
+    def validate_data(data: Dict, default_user_uuid: str) -> Tuple[Dict, List[str]]:
+        """
+        Validate a task payload (e.g. of "POST /tasks/bulk" or "flask tasks
+        import"), returning the arguments of "create" and the errors found.
+        """
+        if not isinstance(data, dict):
+            return {}, ['the task must be an object']
+
+        errors = []
+
+        title = data.get('title')
+        if not title or not isinstance(title, str):
+            errors.append('title: required')
+        elif len(title) > 255:
+            errors.append('title: must have at most 255 characters')
+
+        description = data.get('description')
+        if description is not None and not isinstance(description, str):
+            errors.append('description: must be a string')
+
+        status = data.get('status') or 'pending'
+        if status not in TASK_STATUSES:
+            errors.append(f'status: must be one of {TASK_STATUSES}')
+
+        due_date = None
+        if data.get('due_date'):
+            try:
+                due_date = datetime.strptime(data['due_date'], '%Y-%m-%d %H:%M')
+            except (TypeError, ValueError):
+                errors.append('due_date: must be on the format YYYY-MM-DD HH:MM')
+
+        user_uuid = None
         try:
-            task_instance = Task.filter_by(uuids=[uuid], user_uuids=[user_uuid])[0]
-            if not task_instance:
-                return False
-            db.session.delete(task_instance)
-            db.session.commit()
-            return True
-        except Exception:
-            return False
+            user_uuid = PythonUUID(str(data.get('user_uuid') or default_user_uuid))
+        except ValueError:
+            errors.append('user_uuid: must be a valid UUID')
+
+        task_data = {
+            'user_uuid': user_uuid,
+            'title': title,
+            'description': description,
+            'status': status,
+            'due_date': due_date,
+        }
+        return task_data, errors
 
     @staticmethod
-    def filter_by(
+    def build_filter_query(
         user_uuids: List[str] = [],
         uuids: List[str] = [],
         status: List[str] = [],
         start_due_date: datetime = None,
         end_due_date: datetime = None,
-    ) -> List['Task']:
+        search: str = '',
+    ) -> Query:
         """
-        Filter tasks based on various criteria.
+        Build (but do not run) the query used to filter tasks.
 
         This method builds a query with multiple filters:
-        - For single values of user_uuid and uuid, uses filter_by for exact matching
-        - For multiple values of user_uuid, uuid, and status, uses filter with .in_() operator
+        - For user_uuids, uuids and status, uses "= ANY(:array)" (see "any_of")
         - For date ranges, applies comparison operators on due_date
+        - For search, matches the full-text search vector (see "search_vector")
         - Validates status values against allowed options
 
-        The filtering strategy combines SQLAlchemy's filter_by() for simple equality conditions
-        and filter() for more complex conditions like lists and ranges.
+        Binding each list as a single array parameter (instead of e.g. "IN (...)"
+        with one parameter per value) keeps the number of distinct statements small:
+        one per combination of the filters used, no matter the size of the lists.
+        So SQLAlchemy's compiled cache is reused, and the statement text is stable.
+        (PostgreSQL still plans each query: psycopg2 interpolates the parameters
+        on the client, without server-side prepared statements.)
+
+        Returning the query (instead of its results) allows callers to
+        push ordering and limits to the database before running it.
         """
-        if (
-            (not user_uuids)
-            and (not uuids)
-            and (not status)
-            and (not start_due_date)
-            and (not end_due_date)
-        ):
-            return Task.query.all()
+        Task.validate_status(status=status)
 
-        filters_data = {}
+        query = Task.query
 
-        # Handle simple equality filters
-        if user_uuids and len(user_uuids) == 1:
-            filters_data['user_uuid'] = user_uuids[0]
+        if user_uuids:
+            query = query.filter(any_of(Task.user_uuid, user_uuids))
 
-        if uuids and len(uuids) == 1:
-            filters_data['uuid'] = uuids[0]
+        if uuids:
+            query = query.filter(any_of(Task.uuid, uuids))
 
-        # Validate status values
-        valid_statuses = ['pending', 'in_progress', 'completed']
         if status:
-            invalid_statuses = [s for s in status if s not in valid_statuses]
-            if invalid_statuses:
-                raise ValueError(
-                    f'Invalid status values: {invalid_statuses}. '
-                    f'Allowed values are: {valid_statuses}'
-                )
+            query = query.filter(any_of(Task.status, status))
 
-            if len(status) == 1:
-                filters_data['status'] = status[0]
+        if start_due_date:
+            query = query.filter(Task.due_date >= start_due_date)
+        if end_due_date:
+            query = query.filter(Task.due_date <= end_due_date)
 
-        # Start with basic query and add complex filters
-        query = Task.query.filter_by(**filters_data)
+        if search:
+            query = query.filter(Task.search_vector.op('@@')(Task.search_query(search)))
 
-        if user_uuids and len(user_uuids) > 1:
-            query = query.filter(Task.user_uuid.in_(user_uuids))
+        return query
 
-        if uuids and len(uuids) > 1:
-            query = query.filter(Task.uuid.in_(uuids))
+    @staticmethod
+    def search_query(search: str) -> ColumnElement:
+        """
+        Convert a search text to a full-text search query.
 
-        if status and len(status) > 1:
-            query = query.filter(Task.status.in_(status))
+        It uses "websearch_to_tsquery", which accepts a syntax similar to web search
+        engines (e.g. "quoted phrases", -excluded words and "or") and never fails
+        on invalid input.
+        """
+        return func.websearch_to_tsquery(TASK_SEARCH_CONFIG, search)
 
-        if start_due_date:
-            query = query.filter(Task.due_date >= start_due_date)
-        if end_due_date:
-            query = query.filter(Task.due_date <= end_due_date)
+    @staticmethod
+    def order_by_rank(query: Query, search: str) -> Query:
+        """
+        Order a filter query from the most to the least relevant task for a search.
+        """
+        rank = func.ts_rank(Task.search_vector, Task.search_query(search))
+        return query.order_by(rank.desc(), Task.uuid)
+
+    @staticmethod
+    def filter_by(
+        user_uuids: List[str] = [],
+        uuids: List[str] = [],
+        status: List[str] = [],
+        start_due_date: datetime = None,
+        end_due_date: datetime = None,
+        search: str = '',
+        read_only: bool = False,
+    ) -> List[Union['Task', Row]]:
+        """
+        Filter tasks based on various criteria.
+
+        See "build_filter_query" for how each filter is applied,
+        and "select_for_listing" for the read_only mode.
+
+        When searching, the tasks are ordered by relevance (see "order_by_rank"),
+        otherwise by uuid (so the listing, and its ETag, is the same on every call).
+        """
+        query = Task.build_filter_query(
+            user_uuids=user_uuids,
+            uuids=uuids,
+            status=status,
+            start_due_date=start_due_date,
+            end_due_date=end_due_date,
+            search=search,
+        )
 
-        raw_query = get_query_raw_sql(query=query)
+        query = Task.select_for_listing(query=query, read_only=read_only)
+        if search:
+            query = Task.order_by_rank(query=query, search=search)
+        else:
+            query = query.order_by(Task.uuid)
 
         return query.all()
+
+    @staticmethod
+    def get_fingerprint(
+        user_uuids: List[str] = [],
+        uuids: List[str] = [],
+        status: List[str] = [],
+        start_due_date: datetime = None,
+        end_due_date: datetime = None,
+        search: str = '',
+    ) -> Tuple[int, Union[None, datetime]]:
+        """
+        Get how many tasks match the filters (see "filter_by"), and when the
+        last of them was updated, computed on the database without loading them.
+
+        Since creating and updating tasks changes "last_updated_at" and deleting them
+        changes the count, this changes whenever the filtered tasks change.
+        """
+        query = Task.build_filter_query(
+            user_uuids=user_uuids,
+            uuids=uuids,
+            status=status,
+            start_due_date=start_due_date,
+            end_due_date=end_due_date,
+            search=search,
+        )
+        query = query.with_entities(
+            func.count(Task.uuid), func.max(Task.last_updated_at)
+        )
+        count, last_updated_at = query.one()
+        return count, last_updated_at
+
+    @staticmethod
+    def count_by_status(
+        user_uuids: List[str] = [],
+        uuids: List[str] = [],
+        status: List[str] = [],
+        start_due_date: datetime = None,
+        end_due_date: datetime = None,
+        search: str = '',
+        group_by_user: bool = False,
+    ) -> Dict:
+        """
+        Count the filtered tasks (see "filter_by") by status,
+        and optionally also by user.
+
+        When filtering only by users and/or status, the counts are read from
+        the task counters (see "TaskCounter"), so no task is scanned. Otherwise,
+        the counting runs on the database through a single GROUP BY query,
+        so no task is loaded.
+        """
+        if uuids or start_due_date or end_due_date or search:
+            query = Task.build_filter_query(
+                user_uuids=user_uuids,
+                uuids=uuids,
+                status=status,
+                start_due_date=start_due_date,
+                end_due_date=end_due_date,
+                search=search,
+            )
+            status_column, user_uuid_column = Task.status, Task.user_uuid
+            count_column = func.count(Task.uuid)
+        else:
+            query = TaskCounter.build_filter_query(user_uuids=user_uuids, status=status)
+            status_column, user_uuid_column = TaskCounter.status, TaskCounter.user_uuid
+            count_column = func.sum(TaskCounter.count)
+
+        group_by_columns = [status_column]
+        if group_by_user:
+            group_by_columns.append(user_uuid_column)
+
+        query = query.with_entities(*group_by_columns, count_column)
+        query = query.group_by(*group_by_columns)
+
+        counts = dict.fromkeys(TASK_STATUSES, 0)
+        users_counts = {}
+        for task_status, *user_uuid, count in query.all():
+            counts[task_status] += count
+            if group_by_user:
+                user_counts = users_counts.setdefault(
+                    str(user_uuid[0]), dict.fromkeys(TASK_STATUSES, 0)
+                )
+                user_counts[task_status] = count
+
+        result = {'status': counts, 'total': sum(counts.values())}
+        if group_by_user:
+            result['users'] = users_counts
+        return result
+
+    @staticmethod
+    def iterate_by(
+        batch_size: int,
+        user_uuids: List[str] = [],
+        uuids: List[str] = [],
+        status: List[str] = [],
+        start_due_date: datetime = None,
+        end_due_date: datetime = None,
+        search: str = '',
+        read_only: bool = False,
+    ) -> Iterator[Union['Task', Row]]:
+        """
+        Filter tasks (see "filter_by", also for their order), lazily iterating
+        over the results.
+
+        The rows are fetched from a server-side cursor, "batch_size" rows at a time,
+        so memory usage does not grow with the number of filtered tasks.
+        """
+        query = Task.build_filter_query(
+            user_uuids=user_uuids,
+            uuids=uuids,
+            status=status,
+            start_due_date=start_due_date,
+            end_due_date=end_due_date,
+            search=search,
+        )
+        query = Task.select_for_listing(query=query, read_only=read_only)
+        if search:
+            query = Task.order_by_rank(query=query, search=search)
+        else:
+            query = query.order_by(Task.uuid)
+
+        return iter(query.yield_per(batch_size))
+
+    EXPORT_FORMATS = ('csv', 'ndjson')
+
+    @staticmethod
+    def build_export_sql(
+        file_format: str,
+        user_uuids: List[str] = [],
+        uuids: List[str] = [],
+        status: List[str] = [],
+        start_due_date: datetime = None,
+        end_due_date: datetime = None,
+        search: str = '',
+    ) -> str:
+        """
+        Build the "COPY (SELECT ...) TO STDOUT" statement exporting the filtered
+        tasks (see "filter_by"), with the columns listed by "GET /tasks", on CSV
+        (with a header) or NDJSON (one JSON object per line, built by the database).
+        """
+        if file_format not in Task.EXPORT_FORMATS:
+            raise ValueError(f'Invalid export format: {file_format}')
+
+        query = Task.build_filter_query(
+            # as strings, so that psycopg2 can adapt them (see "mogrify" below)
+            user_uuids=[str(user_uuid) for user_uuid in user_uuids],
+            uuids=[str(uuid) for uuid in uuids],
+            status=status,
+            start_due_date=start_due_date,
+            end_due_date=end_due_date,
+            search=search,
+        )
+        query = Task.select_for_listing(query=query, read_only=True).order_by(
+            Task.due_date.asc().nulls_last(), Task.uuid.asc()
+        )
+        select_statement = query.statement.compile(dialect=db.engine.dialect)
+
+        if file_format == 'csv':
+            sql = f'COPY ({select_statement}) TO STDOUT WITH (FORMAT csv, HEADER)'
+        else:
+            # CSV with quote and delimiter characters that are never on the JSON,
+            # so that it is written as is (the text format would escape it)
+            sql = (
+                f'COPY (SELECT row_to_json(tasks) FROM ({select_statement}) AS tasks) '
+                "TO STDOUT WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')"
+            )
+
+        # COPY does not take parameters, so they are bound on the client
+        with db.session.connection().connection.cursor() as cursor:
+            return cursor.mogrify(sql, select_statement.params).decode('utf-8')
+
+    @staticmethod
+    def export(file: BinaryIO, file_format: str, **filters):
+        """
+        Write the filtered tasks to the (binary) file, see "build_export_sql".
+        The rows are written as they come from the database.
+        """
+        sql = Task.build_export_sql(file_format=file_format, **filters)
+        with db.session.connection().connection.cursor() as cursor:
+            cursor.copy_expert(sql, file)
+
+    @staticmethod
+    def iterate_export(file_format: str, chunk_size: int, **filters) -> Iterator[bytes]:
+        """
+        Iterate over the export of the filtered tasks (see "export"), in chunks
+        of about chunk_size bytes (see "iterate_copy_to").
+        """
+        sql = Task.build_export_sql(file_format=file_format, **filters)
+        connection = db.session.connection().connection
+        cursor = connection.cursor()
+
+        def copy(file):
+            try:
+                cursor.copy_expert(sql, file)
+            finally:
+                cursor.close()
+
+        return iterate_copy_to(
+            copy=copy, cancel=connection.driver_connection.cancel, chunk_size=chunk_size
+        )
+
+    @staticmethod
+    def filter_page(
+        limit: int,
+        after: Tuple[Union[None, datetime], str] = None,
+        user_uuids: List[str] = [],
+        uuids: List[str] = [],
+        status: List[str] = [],
+        start_due_date: datetime = None,
+        end_due_date: datetime = None,
+        search: str = '',
+        read_only: bool = False,
+    ) -> List[Union['Task', Row]]:
+        """
+        Filter tasks returning a single page, using keyset (a.k.a. "seek") pagination.
+
+        Tasks are ordered by (due_date, uuid), with tasks without a due_date last.
+        "after" is the (due_date, uuid) of the last task of the previous page;
+        when it is informed, only the tasks after it are returned.
+
+        Both the ordering and the limit run on the database, so the cost of
+        fetching a page does not depend on how many pages come before it.
+
+        Since the pages are ordered by due date, searching here filters
+        the tasks but does not order them by relevance.
+        """
+        query = Task.build_filter_query(
+            user_uuids=user_uuids,
+            uuids=uuids,
+            status=status,
+            start_due_date=start_due_date,
+            end_due_date=end_due_date,
+            search=search,
+        )
+
+        if after:
+            after_due_date, after_uuid = after
+            if after_due_date is None:
+                # NULL due dates sort last, so only those can still come next.
+                query = query.filter(Task.due_date.is_(None), Task.uuid > after_uuid)
+            else:
+                query = query.filter(
+                    or_(
+                        tuple_(Task.due_date, Task.uuid)
+                        > tuple_(after_due_date, after_uuid),
+                        Task.due_date.is_(None),
+                    )
+                )
+
+        query = Task.select_for_listing(query=query, read_only=read_only)
+        query = query.order_by(Task.due_date.asc().nulls_last(), Task.uuid.asc())
+
+        return query.limit(limit).all()
+
+
+class TaskCounter(db.Model):
+    """
+    The number of tasks of each user on each status.
+
+    The counters are changed by "Task.create", "Task.update" and "Task.delete"
+    on the same transaction as the tasks, so reading them is cheap no matter
+    how many tasks a user has. "reconcile" recomputes them from the tasks.
+    """
+
+    __tablename__ = 'task_counters'
+
+    user_uuid = db.Column(
+        UUID(as_uuid=True), db.ForeignKey('user.uuid'), primary_key=True
+    )
+    status = db.Column(task_status_enum, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    @staticmethod
+    def add(user_uuid: str, status: str, delta: int):
+        """
+        Add delta (which can be negative) to a counter, with a single upsert,
+        so concurrent changes to the same counter do not overwrite each other.
+        """
+        table = TaskCounter.__table__
+        statement = pg_insert(table).values(
+            user_uuid=user_uuid, status=status, count=delta
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.user_uuid, table.c.status],
+            set_={'count': table.c.count + statement.excluded.count},
+        )
+        db.session.execute(statement)
+
+    @staticmethod
+    def add_from(deltas: Select) -> Insert:
+        """
+        Build (but do not run) an upsert adding the deltas, a select of
+        (user_uuid, status, delta) with at most one row per counter, to the
+        counters. It can be run on a CTE, to count the rows changed by another
+        statement on the same statement (see "Task.create").
+        """
+        table = TaskCounter.__table__
+        statement = pg_insert(table).from_select(
+            [table.c.user_uuid, table.c.status, table.c.count], deltas
+        )
+        return statement.on_conflict_do_update(
+            index_elements=[table.c.user_uuid, table.c.status],
+            set_={'count': table.c.count + statement.excluded.count},
+        )
+
+    @staticmethod
+    def build_filter_query(user_uuids: List[str] = [], status: List[str] = []) -> Query:
+        Task.validate_status(status=status)
+
+        query = TaskCounter.query.filter(TaskCounter.count > 0)
+        if user_uuids:
+            query = query.filter(any_of(TaskCounter.user_uuid, user_uuids))
+        if status:
+            query = query.filter(any_of(TaskCounter.status, status))
+        return query
+
+    @staticmethod
+    def reconcile() -> List[Dict]:
+        """
+        Recompute the counters from the tasks, fixing the ones that drifted.
+
+        The task table is locked (in SHARE mode, which blocks writes but not reads)
+        while reconciling, so that tasks do not change between counting and fixing.
+
+        Returns the drifted counters, with the expected (from the tasks)
+        and the found (on the counters) values.
+        """
+        db.session.execute(text('LOCK TABLE task IN SHARE MODE'))
+
+        expected_counts = {
+            (str(user_uuid), status): count
+            for user_uuid, status, count in db.session.query(
+                Task.user_uuid, Task.status, func.count(Task.uuid)
+            ).group_by(Task.user_uuid, Task.status)
+        }
+        found_counts = {
+            (str(user_uuid), status): count
+            for user_uuid, status, count in db.session.query(
+                TaskCounter.user_uuid, TaskCounter.status, TaskCounter.count
+            )
+        }
+
+        drifts = []
+        for user_uuid, status in sorted(expected_counts.keys() | found_counts.keys()):
+            expected = expected_counts.get((user_uuid, status), 0)
+            found = found_counts.get((user_uuid, status), 0)
+            if expected != found:
+                drifts.append(
+                    {
+                        'user_uuid': user_uuid,
+                        'status': status,
+                        'expected': expected,
+                        'found': found,
+                    }
+                )
+
+        if drifts:
+            table = TaskCounter.__table__
+            statement = pg_insert(table).values(
+                [
+                    {
+                        'user_uuid': drift['user_uuid'],
+                        'status': drift['status'],
+                        'count': drift['expected'],
+                    }
+                    for drift in drifts
+                ]
+            )
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.user_uuid, table.c.status],
+                set_={'count': statement.excluded.count},
+            )
+            db.session.execute(statement)
+
+        db.session.commit()
+        return drifts
+
+
+class IdempotencyKey(db.Model):
+    """
+    The first response to a request sent with an "Idempotency-Key" header,
+    replayed to the retries of the request (see "idempotent" on api.py)
+    instead of running it again, until it expires.
+
+    A key is reserved (with no response yet) before its request runs, so
+    concurrent retries do not run it too. Expired keys are deleted in
+    batches by "sweep" (see the "sweep_idempotency_keys" celery task).
+    """
+
+    __tablename__ = 'idempotency_keys'
+
+    # NOTE: sha256 digests (of the endpoint, the user and the key, and of the
+    #       request), so that rows are small and have a fixed size
+    digest = db.Column(db.LargeBinary(32), primary_key=True)
+    request_digest = db.Column(db.LargeBinary(32), nullable=False)
+    # NOTE: None while the request is running
+    status_code = db.Column(db.SmallInteger, nullable=True)
+    headers = db.Column(JSONB, nullable=True)
+    body = db.Column(db.LargeBinary, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    @staticmethod
+    def reserve(
+        digest: bytes, request_digest: bytes, lock_timeout: float
+    ) -> Union[None, 'IdempotencyKey']:
+        """
+        Reserve the key for a request, for up to lock_timeout seconds (so that
+        the key is freed if the request never finishes), returning None.
+
+        If the key is already reserved or has a response (and has not expired),
+        it is returned instead.
+        """
+        table = IdempotencyKey.__table__
+        statement = pg_insert(table).values(
+            digest=digest,
+            request_digest=request_digest,
+            expires_at=utc_now() + timedelta(seconds=lock_timeout),
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.digest],
+            set_={
+                'request_digest': statement.excluded.request_digest,
+                'status_code': None,
+                'headers': None,
+                'body': None,
+                'expires_at': statement.excluded.expires_at,
+            },
+            where=table.c.expires_at < utc_now(),
+        ).returning(table.c.digest)
+
+        # the existing key can expire (and be swept) right after the upsert,
+        # so it is retried once
+        for _ in range(2):
+            reserved = db.session.execute(statement).one_or_none()
+            db.session.commit()
+            if reserved is not None:
+                return None
+
+            existing = db.session.get(IdempotencyKey, digest, populate_existing=True)
+            if existing is not None:
+                return existing
+
+        raise RuntimeError('Could not reserve the idempotency key.')
+
+    @staticmethod
+    def complete(
+        digest: bytes, status_code: int, headers: Dict, body: bytes, ttl: float
+    ):
+        """
+        Record the response of the request that reserved the key, keeping
+        it for ttl seconds.
+        """
+        db.session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.digest == digest)
+            .values(
+                status_code=status_code,
+                headers=headers,
+                body=body,
+                expires_at=utc_now() + timedelta(seconds=ttl),
+            )
+        )
+        db.session.commit()
+
+    @staticmethod
+    def release(digest: bytes):
+        """
+        Free the key reserved by a request that failed, so it can be retried.
+        """
+        db.session.rollback()
+        db.session.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.digest == digest, IdempotencyKey.status_code.is_(None)
+            )
+        )
+        db.session.commit()
+
+    @staticmethod
+    def sweep(batch_size: int) -> int:
+        """
+        Delete the expired keys, batch_size at a time (each on its own short
+        transaction, skipping the locked rows), returning how many were deleted.
+        """
+        return delete_expired(model=IdempotencyKey, batch_size=batch_size)
+
+
+class RevokedToken(db.Model):
+    """
+    The revoked refresh tokens: a single token (by its "jti", see "revoke"), or
+    all the tokens of a user issued before "token_generation" (see
+    "build_revoke_user").
+
+    Each process mirrors them into a Bloom filter (see pydo/revocation.py), so
+    the tokens are only checked here when the filter says they may be revoked.
+    The rows are kept until the tokens they revoke expire ("expires_at"), and
+    then deleted by "sweep" (see the "sweep_revoked_tokens" celery task).
+    """
+
+    __tablename__ = 'revoked_tokens'
+    __table_args__ = (
+        db.Index(
+            'ix_revoked_tokens_user_uuid',
+            'user_uuid',
+            postgresql_where=text('jti IS NULL'),
+        ),
+    )
+
+    # NOTE: increasing, so it is also the version of the revocations
+    #       polled by the processes (see "get_keys_since")
+    id = db.Column(db.BigInteger, primary_key=True)
+    # NOTE: None when revoking all the tokens of the user
+    jti = db.Column(db.String(36), unique=True, nullable=True)
+    user_uuid = db.Column(
+        UUID(as_uuid=True), db.ForeignKey('user.uuid'), nullable=False
+    )
+    # NOTE: None when revoking a single token
+    token_generation = db.Column(db.Integer, nullable=True)
+    revoked_at = db.Column(db.DateTime, server_default=text(UTC_NOW), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    @staticmethod
+    def get_keys(jti: str, user_uuid: str) -> List[str]:
+        """
+        The keys of the Bloom filter that a token of the jti and user is
+        checked against.
+        """
+        return [f'jti:{jti}', f'user:{user_uuid}']
+
+    @staticmethod
+    def get_keys_since(version: int) -> List[Tuple[int, str]]:
+        """
+        Get the (id, key) of the revocations (that did not expire) with an id
+        greater than version, see "RevocationFilter.refresh".
+        """
+        table = RevokedToken.__table__
+        rows = db.session.execute(
+            select(table.c.id, table.c.jti, table.c.user_uuid)
+            .where(table.c.id > version, table.c.expires_at > utc_now())
+            .order_by(table.c.id)
+        )
+        return [
+            (row.id, f'jti:{row.jti}' if row.jti else f'user:{row.user_uuid}')
+            for row in rows
+        ]
+
+    @staticmethod
+    def revoke(jti: str, user_uuid: str, expires_at: datetime):
+        """
+        Revoke a token, until it expires (at expires_at).
+        """
+        table = RevokedToken.__table__
+        db.session.execute(
+            pg_insert(table)
+            .values(jti=jti, user_uuid=user_uuid, expires_at=expires_at)
+            .on_conflict_do_nothing(index_elements=[table.c.jti])
+        )
+        db.session.commit()
+        revocation_filter.add(keys=[f'jti:{jti}'])
+
+    @staticmethod
+    def build_revoke_user(updated: CTE) -> Insert:
+        """
+        Build (but do not run) the insert revoking the tokens of the users of
+        the updated CTE (their "uuid" and new "token_generation"), of the
+        generations before it, until the last of them expires. It is run on the
+        same statement of the change that requires it (see "User.update").
+        """
+        expires_in = jwt_config.refresh_expires or timedelta(days=365)
+        return insert(RevokedToken.__table__).from_select(
+            ['user_uuid', 'token_generation', 'expires_at'],
+            select(updated.c.uuid, updated.c.token_generation, utc_now() + expires_in),
+        )
+
+    @staticmethod
+    def is_revoked(jti: str, user_uuid: str, token_generation: int) -> bool:
+        """
+        Check on the database if a token (of the jti, user and the user's
+        token_generation when it was issued) was revoked.
+        """
+        table = RevokedToken.__table__
+        revoked_user_tokens = and_(
+            table.c.jti.is_(None),
+            table.c.user_uuid == user_uuid,
+            table.c.token_generation > token_generation,
+        )
+        statement = select(exists().where(or_(table.c.jti == jti, revoked_user_tokens)))
+        return db.session.execute(statement).scalar()
+
+    @staticmethod
+    def sweep(batch_size: int) -> int:
+        """
+        Delete the revocations of tokens that expired, see "delete_expired".
+        """
+        return delete_expired(model=RevokedToken, batch_size=batch_size)
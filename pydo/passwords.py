@@ -0,0 +1,195 @@
+"""
+Password hashing (bcrypt) on a pool of worker processes.
+
+Hashing or checking a password takes about 250ms of CPU (with the default cost).
+Running it on the threads that handle the requests would make a burst of logins
+starve the other requests of the gunicorn worker, so it is sent to a small,
+dedicated pool of processes instead. The number of operations waiting for the
+pool is limited too: above it, "PasswordHasherBusyError" is raised (and the API
+answers 503), instead of piling up requests that would time out anyway.
+
+Each process keeps metrics of its operations (see "PasswordHasher.get_metrics"):
+how long they waited for the pool and how long the hashing took.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Tuple
+
+import bcrypt
+
+from pydo.exceptions import PasswordHasherBusyError
+
+logger = logging.getLogger(__name__)
+
+
+def get_rounds(password_hash: str) -> int:
+    """
+    Get the cost factor (log2 of the rounds) of a bcrypt hash ("$2b$12$...").
+    """
+    return int(password_hash.split('$')[2])
+
+
+# NOTE: the functions below run on the pool's processes. They get the (monotonic,
+#       so comparable between processes) time the operation was submitted, and
+#       return how long it waited for a process and how long it took.
+
+
+def run_hash(password: bytes, rounds: int, submitted_at: float) -> Tuple:
+    started_at = time.monotonic()
+    password_hash = bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+    return password_hash, started_at - submitted_at, time.monotonic() - started_at
+
+
+def run_check(password_hash: bytes, password: bytes, submitted_at: float) -> Tuple:
+    started_at = time.monotonic()
+    is_valid = bcrypt.checkpw(password, password_hash)
+    return is_valid, started_at - submitted_at, time.monotonic() - started_at
+
+
+class PasswordHasherMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.operations = 0
+        self.rejected = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.hash_time_total = 0.0
+        self.hash_time_max = 0.0
+
+    def add(self, queue_wait: float, hash_time: float):
+        with self.lock:
+            self.operations += 1
+            self.queue_wait_total += queue_wait
+            self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+            self.hash_time_total += hash_time
+            self.hash_time_max = max(self.hash_time_max, hash_time)
+
+    def add_rejected(self):
+        with self.lock:
+            self.rejected += 1
+
+    def to_dict(self) -> Dict:
+        with self.lock:
+            operations = self.operations or 1
+            return {
+                'operations': self.operations,
+                'rejected': self.rejected,
+                'queue_wait_ms': {
+                    'average': self.queue_wait_total / operations * 1000,
+                    'max': self.queue_wait_max * 1000,
+                },
+                'hash_time_ms': {
+                    'average': self.hash_time_total / operations * 1000,
+                    'max': self.hash_time_max * 1000,
+                },
+            }
+
+
+class PasswordHasher:
+    """
+    Hashes and checks passwords with bcrypt, on a pool of "workers" processes,
+    configured by "init_app" (see "init_bcrypt" on extensions.py).
+
+    With 0 workers, it runs on the calling thread (e.g. for development).
+    """
+
+    def __init__(self):
+        self.rounds = 12
+        self.workers = 0
+        self.slots = None
+        self.queue_timeout = 0.0
+        self.pool = None
+        self.pool_pid = None
+        self.pool_lock = threading.Lock()
+        self.metrics = PasswordHasherMetrics()
+
+    def init_app(
+        self, rounds: int, workers: int, max_pending: int, queue_timeout: float
+    ):
+        self.rounds = rounds
+        self.workers = workers
+        # the operations running on the pool plus the ones waiting for it
+        self.slots = threading.BoundedSemaphore(workers + max_pending)
+        self.queue_timeout = queue_timeout
+        self.metrics = PasswordHasherMetrics()
+
+    def get_pool(self) -> ProcessPoolExecutor:
+        # pools must not be shared with forked processes (e.g. gunicorn workers)
+        with self.pool_lock:
+            if self.pool_pid != os.getpid():
+                self.pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('fork'),
+                )
+                self.pool_pid = os.getpid()
+            return self.pool
+
+    def start(self):
+        """
+        Start the pool's processes now, instead of on the first operation. It is
+        better to fork them while the process has a single thread (see
+        "post_worker_init" on gunicorn_settings.py).
+        """
+        if self.workers:
+            self.get_pool().submit(time.monotonic).result()
+
+    def run(self, function, *args):
+        if not self.workers:
+            result, queue_wait, hash_time = function(*args, time.monotonic())
+            self.metrics.add(queue_wait=queue_wait, hash_time=hash_time)
+            return result
+
+        if not self.slots.acquire(timeout=self.queue_timeout):
+            self.metrics.add_rejected()
+            logger.warning('Password hasher busy: operation rejected.')
+            raise PasswordHasherBusyError()
+
+        try:
+            future = self.get_pool().submit(function, *args, time.monotonic())
+            result, queue_wait, hash_time = future.result()
+        except BrokenProcessPool:
+            # a process of the pool died (e.g. killed for using too much memory),
+            # so a new pool is created on the next operation
+            with self.pool_lock:
+                self.pool_pid = None
+            raise
+        finally:
+            self.slots.release()
+
+        self.metrics.add(queue_wait=queue_wait, hash_time=hash_time)
+        logger.debug(
+            f'Password hasher: {function.__name__} waited {queue_wait * 1000:.1f}ms, '
+            f'took {hash_time * 1000:.1f}ms.'
+        )
+        return result
+
+    def hash(self, password: str) -> str:
+        password_hash = self.run(run_hash, password.encode('utf-8'), self.rounds)
+        return password_hash.decode('utf-8')
+
+    def check(self, password_hash: str, password: str) -> bool:
+        return self.run(
+            run_check, password_hash.encode('utf-8'), password.encode('utf-8')
+        )
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """
+        If the hash was made with another cost factor (the settings changed).
+        """
+        return get_rounds(password_hash) != self.rounds
+
+    def get_metrics(self) -> Dict:
+        """
+        The metrics of the operations of this process, since it started.
+        """
+        return {
+            'workers': self.workers,
+            'rounds': self.rounds,
+            **self.metrics.to_dict(),
+        }
@@ -0,0 +1,157 @@
+"""
+Revocation of refresh tokens, checked without querying the database on
+every request.
+
+The revocations are stored on PostgreSQL (see "RevokedToken" on models.py):
+of a single token (by its "jti", on logout), or of all the tokens of a user
+issued until then (on password changes). Each process mirrors them into a Bloom
+filter (a compact set which can only answer "maybe present" or "surely absent"),
+so checking a token that was not revoked, the common case, is a memory probe.
+Only when the filter answers "maybe" the database is queried, to confirm it.
+
+The filter polls the new revocations (the ones with a greater id, its version)
+every "poll_interval" seconds, so a revocation made by another process is seen
+after up to that. The ids are not committed in order, so each poll also reloads
+the last "poll_overlap" ids, picking up the ones committed after a greater one
+was polled. Since items cannot be removed from a Bloom filter, it is rebuilt
+(without the expired revocations) every "rebuild_interval" seconds, or when it
+has more items than it was sized for.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from typing import Callable, Iterable, List, Set, Tuple
+
+# (id, key) of the revocations with an id greater than the given one
+LoadRevocations = Callable[[int], List[Tuple[int, str]]]
+
+
+class BloomFilter:
+    """
+    A Bloom filter sized for "capacity" items with (at most) the given false
+    positive rate, using double hashing of a blake2b digest of the items.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        self.capacity = capacity
+        self.size = max(
+            8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def get_positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first_hash = int.from_bytes(digest[:8], 'little')
+        second_hash = int.from_bytes(digest[8:], 'little') | 1
+        for index in range(self.hashes):
+            yield (first_hash + index * second_hash) % self.size
+
+    def add(self, item: str):
+        for position in self.get_positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self.get_positions(item)
+        )
+
+
+class RevocationFilter:
+    """
+    The Bloom filter of the revocations of this process, configured by
+    "init_app" (see "init_jwt" on extensions.py).
+    """
+
+    def __init__(self):
+        self.capacity = 0
+        self.false_positive_rate = 0.0
+        self.poll_interval = 0.0
+        self.rebuild_interval = 0.0
+        self.poll_overlap = 0
+        self.load_revocations = None
+        self.bloom = None
+        self.version = 0
+        # the ids already added, of the ones reloaded by the polls
+        self.recent_ids: Set[int] = set()
+        self.polled_at = 0.0
+        self.built_at = 0.0
+        self.lock = threading.Lock()
+
+    def init_app(
+        self,
+        capacity: int,
+        false_positive_rate: float,
+        poll_interval: float,
+        rebuild_interval: float,
+        poll_overlap: int,
+        load_revocations: LoadRevocations,
+    ):
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.poll_interval = poll_interval
+        self.rebuild_interval = rebuild_interval
+        self.poll_overlap = poll_overlap
+        self.load_revocations = load_revocations
+        self.bloom = None
+
+    def refresh(self):
+        """
+        Add the revocations made since the last poll, or rebuild the filter.
+        """
+        now = time.monotonic()
+        with self.lock:
+            if self.bloom is not None and now - self.polled_at < self.poll_interval:
+                return
+
+            must_rebuild = (
+                self.bloom is None
+                or now - self.built_at >= self.rebuild_interval
+                or self.bloom.count > self.bloom.capacity
+            )
+            version = 0 if must_rebuild else max(0, self.version - self.poll_overlap)
+            revocations = self.load_revocations(version)
+
+            if must_rebuild:
+                capacity = max(self.capacity, 2 * len(revocations))
+                self.bloom = BloomFilter(
+                    capacity=capacity, false_positive_rate=self.false_positive_rate
+                )
+                self.version = 0
+                self.recent_ids = set()
+                self.built_at = now
+
+            for revocation_id, key in revocations:
+                if revocation_id in self.recent_ids:
+                    continue
+                self.bloom.add(key)
+                self.recent_ids.add(revocation_id)
+                self.version = max(self.version, revocation_id)
+
+            overlap_start = self.version - self.poll_overlap
+            self.recent_ids = {
+                revocation_id
+                for revocation_id in self.recent_ids
+                if revocation_id > overlap_start
+            }
+            self.polled_at = now
+
+    def add(self, keys: Iterable[str]):
+        """
+        Add revocations made by this process, so they are seen before the
+        next poll.
+        """
+        self.refresh()
+        with self.lock:
+            for key in keys:
+                self.bloom.add(key)
+
+    def might_contain(self, keys: Iterable[str]) -> bool:
+        self.refresh()
+        bloom = self.bloom
+        return any(key in bloom for key in keys)
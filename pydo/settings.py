@@ -41,6 +41,11 @@ LOGGING = {
             'handlers': ['console'],
             'propagate': False,
         },
+        'pydo': {
+            'level': LOG_LEVEL,
+            'handlers': ['console'],
+            'propagate': False,
+        },
         'celery': {
             'level': LOG_LEVEL,
             'handlers': ['console'],
@@ -97,3 +102,115 @@ TASKS_QUEUES = {
 }
 
 JWT_SECRET_KEY = config('JWT_SECRET_KEY', cast=str)
+
+# Number of tasks returned on each page by GET /tasks
+ITEMS_PER_PAGE = config('ITEMS_PER_PAGE', cast=int, default=5)
+
+# Number of tasks fetched from the database at a time when streaming GET /tasks
+STREAM_BATCH_SIZE = config('STREAM_BATCH_SIZE', cast=int, default=1000)
+
+# Size (in bytes) of the chunks sent by "GET /tasks/export"
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', cast=int, default=64 * 1024)
+
+# Maximum number of tasks created by each "POST /tasks/bulk" request
+BULK_MAX_TASKS = config('BULK_MAX_TASKS', cast=int, default=10_000)
+# Bulk creations of more tasks than this are loaded with COPY instead of INSERTs
+BULK_COPY_THRESHOLD = config('BULK_COPY_THRESHOLD', cast=int, default=1000)
+
+# Idempotency keys of "POST /task", "/compute" and "/string" (see "idempotent" on api.py).
+# Seconds the first response to a key is replayed to the retries of its request:
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', cast=float, default=24 * 60 * 60)
+# Seconds a key is reserved for its running request (freed if it never finishes):
+IDEMPOTENCY_KEY_LOCK_TIMEOUT = config(
+    'IDEMPOTENCY_KEY_LOCK_TIMEOUT', cast=float, default=60
+)
+IDEMPOTENCY_KEY_MAX_LENGTH = config('IDEMPOTENCY_KEY_MAX_LENGTH', cast=int, default=255)
+# The expired keys are deleted every IDEMPOTENCY_SWEEP_INTERVAL seconds (by celery beat),
+# IDEMPOTENCY_SWEEP_BATCH_SIZE keys at a time:
+IDEMPOTENCY_SWEEP_INTERVAL = config(
+    'IDEMPOTENCY_SWEEP_INTERVAL', cast=float, default=300
+)
+IDEMPOTENCY_SWEEP_BATCH_SIZE = config(
+    'IDEMPOTENCY_SWEEP_BATCH_SIZE', cast=int, default=1000
+)
+
+# Password hashing (see pydo/passwords.py).
+# bcrypt cost factor (each +1 doubles the time), the passwords hashed with another
+# one are hashed again on login:
+BCRYPT_ROUNDS = config('BCRYPT_ROUNDS', cast=int, default=12)
+# Processes (of each gunicorn worker) hashing passwords, 0 hashes on the request thread:
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', cast=int, default=1)
+# Operations that can wait for the processes, and for how many seconds, before
+# being rejected (with a 503):
+PASSWORD_HASH_MAX_PENDING = config('PASSWORD_HASH_MAX_PENDING', cast=int, default=8)
+PASSWORD_HASH_QUEUE_TIMEOUT = config(
+    'PASSWORD_HASH_QUEUE_TIMEOUT', cast=float, default=2
+)
+
+# Verified access tokens (their claims) kept by each process until they expire
+# (see "CachedJWTManager" on extensions.py), 0 disables it:
+JWT_DECODE_CACHE_MAX_SIZE = config('JWT_DECODE_CACHE_MAX_SIZE', cast=int, default=4096)
+
+# Revoked refresh tokens (see pydo/revocation.py), mirrored by each process into a
+# Bloom filter sized for REVOCATION_FILTER_CAPACITY revocations with (at most) the
+# REVOCATION_FILTER_FALSE_POSITIVE_RATE (false positives are checked on the database):
+REVOCATION_FILTER_CAPACITY = config(
+    'REVOCATION_FILTER_CAPACITY', cast=int, default=100_000
+)
+REVOCATION_FILTER_FALSE_POSITIVE_RATE = config(
+    'REVOCATION_FILTER_FALSE_POSITIVE_RATE', cast=float, default=0.001
+)
+# Seconds between polls of the new revocations (the delay to see the ones made by
+# other processes), and between rebuilds of the filter (dropping the expired ones):
+REVOCATION_POLL_INTERVAL = config('REVOCATION_POLL_INTERVAL', cast=float, default=5)
+REVOCATION_FILTER_REBUILD_INTERVAL = config(
+    'REVOCATION_FILTER_REBUILD_INTERVAL', cast=float, default=3600
+)
+# Ids (of the last polled ones) reloaded by each poll, since the ids are not
+# committed in order (a revocation may commit after one with a greater id):
+REVOCATION_POLL_OVERLAP = config('REVOCATION_POLL_OVERLAP', cast=int, default=1000)
+# The expired revocations are deleted every REVOKED_TOKENS_SWEEP_INTERVAL seconds
+# (by celery beat), REVOKED_TOKENS_SWEEP_BATCH_SIZE at a time:
+REVOKED_TOKENS_SWEEP_INTERVAL = config(
+    'REVOKED_TOKENS_SWEEP_INTERVAL', cast=float, default=3600
+)
+REVOKED_TOKENS_SWEEP_BATCH_SIZE = config(
+    'REVOKED_TOKENS_SWEEP_BATCH_SIZE', cast=int, default=1000
+)
+
+# SQL tracing (see pydo/tracing.py), disabled by default.
+# Fraction (0 to 1) of the requests that have their SQL statements traced:
+SQL_TRACE_SAMPLE_RATE = config('SQL_TRACE_SAMPLE_RATE', cast=float, default=0.0)
+# Allow clients to trace a request by sending the "X-SQL-Trace: 1" header:
+SQL_TRACE_ALLOW_REQUEST_HEADER = config(
+    'SQL_TRACE_ALLOW_REQUEST_HEADER', cast=bool, default=False
+)
+# Traced SELECTs slower than this also have their "EXPLAIN (ANALYZE, BUFFERS)" logged:
+SQL_SLOW_QUERY_MS = config('SQL_SLOW_QUERY_MS', cast=float, default=500)
+
+# Cache of the "GET /tasks" responses (see pydo/cache.py).
+# Backend: "in_process" (one cache per process), "shared_memory" (one cache
+# shared by the processes of the host, e.g. the gunicorn workers), "disabled" or
+# "auto": "shared_memory" when WEB_WORKERS > 1, else "in_process"
+# (with "in_process", a change handled by a worker is not seen by the others):
+TASKS_CACHE_BACKEND = config('TASKS_CACHE_BACKEND', cast=str, default='auto')
+# Processes serving the API (set for its workers by gunicorn_settings.py):
+WEB_WORKERS = config('WEB_WORKERS', cast=int, default=1)
+# Seconds a response is kept in the cache:
+TASKS_CACHE_TTL = config('TASKS_CACHE_TTL', cast=float, default=30)
+# Maximum size of the cached responses, the least recently used are evicted above it:
+TASKS_CACHE_MAX_BYTES = config(
+    'TASKS_CACHE_MAX_BYTES', cast=int, default=64 * 1024 * 1024
+)
+# Database file of the "shared_memory" backend (/dev/shm is a memory backed filesystem):
+TASKS_CACHE_PATH = config(
+    'TASKS_CACHE_PATH', cast=str, default='/dev/shm/pydo-tasks-cache.sqlite3'
+)
+
+# Identities of the users recently authenticated, kept on each process so that
+# loading the current user of a request does not need to query the database.
+# Their changes are seen by all the processes through the versions of the tasks
+# cache, so with TASKS_CACHE_BACKEND=disabled the identities are not cached (and
+# with "in_process" and several workers, they may be stale for USERS_CACHE_TTL):
+USERS_CACHE_TTL = config('USERS_CACHE_TTL', cast=float, default=60)
+USERS_CACHE_MAX_SIZE = config('USERS_CACHE_MAX_SIZE', cast=int, default=1024)
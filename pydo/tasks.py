@@ -4,6 +4,9 @@ from random import SystemRandom, randint
 
 from celery import shared_task
 
+from pydo import settings
+from pydo.models import IdempotencyKey, RevokedToken
+
 logger = logging.getLogger(__name__)
 
 
@@ -26,3 +29,15 @@ def generate_random_string() -> None:
         for _ in range(randint(10, 20))
     )
     logger.info(f'Random string successfully generated: {random_string}')
+
+
+@shared_task()
+def sweep_idempotency_keys() -> None:
+    deleted = IdempotencyKey.sweep(batch_size=settings.IDEMPOTENCY_SWEEP_BATCH_SIZE)
+    logger.info(f'{deleted} expired idempotency key(s) deleted.')
+
+
+@shared_task()
+def sweep_revoked_tokens() -> None:
+    deleted = RevokedToken.sweep(batch_size=settings.REVOKED_TOKENS_SWEEP_BATCH_SIZE)
+    logger.info(f'{deleted} expired token revocation(s) deleted.')
@@ -1,9 +1,13 @@
+import json
 from datetime import datetime
 from typing import Dict
 from unittest import mock
+from uuid import uuid4
 
+from pydo.commons import format_task
+from pydo.exceptions import PasswordHasherBusyError
 from pydo.models import User, Task
-from pydo.tests.utils import create_tasks_for_various_users
+from pydo.tests.utils import count_queries, create_tasks_for_various_users
 
 
 def test_compute_sent_to_queue(test_client):
@@ -12,6 +16,26 @@ def test_compute_sent_to_queue(test_client):
     assert response.json == {'message': 'Successfully sent to queue.'}
 
 
+@mock.patch('pydo.api.generate_random_string.apply_async')
+@mock.patch('pydo.api.compute.apply_async')
+def test_queue_endpoints_must_not_publish_again_on_retries(
+    compute_apply_async, generate_random_string_apply_async, test_client, db_session
+):
+    headers = {'Idempotency-Key': 'a2c5e3c0-4d8b-4c3a-9d0e-3f1b2a6c7d8e'}
+
+    responses = [test_client.get(path, headers=headers) for path in ('/compute',) * 3]
+    string_response = test_client.get('/string', headers=headers)
+
+    assert [response.status_code for response in responses] == [200] * 3
+    assert 'Idempotent-Replayed' not in responses[0].headers
+    assert responses[1].headers['Idempotent-Replayed'] == 'true'
+    assert responses[2].json == responses[0].json
+    assert compute_apply_async.call_count == 1
+    # the keys are per endpoint
+    assert string_response.status_code == 200
+    assert generate_random_string_apply_async.call_count == 1
+
+
 def test_404(test_client):
     response = test_client.get('/api/echoes')
     assert response.status_code == 404
@@ -31,6 +55,20 @@ def test_healthcheck_liveness(_mocked_version, test_client):
     assert set(response.json.keys()) == {'live', 'version', 'timestamp'}
 
 
+def test_metrics_must_report_the_password_hasher(test_client):
+    response = test_client.get('/health-check/metrics')
+
+    assert response.status_code == 200
+    assert set(response.json['password_hasher']) == {
+        'workers',
+        'rounds',
+        'operations',
+        'rejected',
+        'queue_wait_ms',
+        'hash_time_ms',
+    }
+
+
 class TestUserAPI:
     def submit_create_user_request(self, test_client):
         payload = {
@@ -57,6 +95,19 @@ class TestUserAPI:
         new_user_uuid = response.json['uuid']
         assert isinstance(new_user_uuid, str)
 
+    def test_login_must_be_rejected_when_the_password_hasher_is_busy(
+        self, test_client, db_session
+    ):
+        self.submit_create_user_request(test_client=test_client)
+
+        with mock.patch(
+            'pydo.models.password_hasher.check', side_effect=PasswordHasherBusyError
+        ):
+            login_response = self.submit_login_request(test_client=test_client)
+
+        assert login_response.status_code == 503
+        assert login_response.headers['Retry-After'] == '1'
+
     def test_login_successful(self, test_client, db_session):
         create_user_response = self.submit_create_user_request(test_client=test_client)
         new_user_uuid = create_user_response.json['uuid']
@@ -143,6 +194,94 @@ class TestUserAPI:
         assert new_access_token is not None
         assert new_access_token != access_token
 
+    def test_user_writes_must_run_a_single_statement(self, test_client, db_session):
+        with count_queries() as create_statements:
+            create_response = self.submit_create_user_request(test_client=test_client)
+        assert create_response.status_code == 201
+        assert len(create_statements) == 1
+
+        login_response = self.submit_login_request(test_client=test_client)
+        access_token = login_response.json['access_token']
+        headers = {'Authorization': f'Bearer {access_token}'}
+        # loads the current user on the identity cache
+        test_client.get('/user', headers=headers)
+
+        with count_queries() as update_statements:
+            update_response = test_client.patch(
+                '/user', headers=headers, json={'email': 'picard@startrek.com'}
+            )
+        assert update_response.status_code == 200
+        assert update_response.json['email'] == 'picard@startrek.com'
+        assert len(update_statements) == 1
+
+    def test_logout_must_revoke_the_refresh_token(self, test_client, db_session):
+        self.submit_create_user_request(test_client=test_client)
+        refresh_token = self.submit_login_request(test_client=test_client).json[
+            'refresh_token'
+        ]
+        other_refresh_token = self.submit_login_request(test_client=test_client).json[
+            'refresh_token'
+        ]
+        headers = {'Authorization': f'Bearer {refresh_token}'}
+
+        logout_response = test_client.post('/logout', headers=headers)
+        assert logout_response.status_code == 200
+
+        response = test_client.post('/token/new', headers=headers)
+        assert response.status_code == 401
+        assert test_client.post('/logout', headers=headers).status_code == 401
+
+        # the other sessions are kept
+        other_headers = {'Authorization': f'Bearer {other_refresh_token}'}
+        response = test_client.post('/token/new', headers=other_headers)
+        assert response.status_code == 200
+
+    def test_password_change_must_revoke_the_refresh_tokens(
+        self, test_client, db_session
+    ):
+        self.submit_create_user_request(test_client=test_client)
+        login_response = self.submit_login_request(test_client=test_client)
+        access_headers = {
+            'Authorization': f'Bearer {login_response.json["access_token"]}'
+        }
+        refresh_headers = {
+            'Authorization': f'Bearer {login_response.json["refresh_token"]}'
+        }
+
+        update_response = test_client.patch(
+            '/user', headers=access_headers, json={'password': 'resistance-is-futile'}
+        )
+        assert update_response.status_code == 200
+
+        response = test_client.post('/token/new', headers=refresh_headers)
+        assert response.status_code == 401
+
+        # the tokens issued right after the change are valid
+        new_login_response = self.submit_login_request(
+            test_client=test_client, password='resistance-is-futile'
+        )
+        new_refresh_headers = {
+            'Authorization': f'Bearer {new_login_response.json["refresh_token"]}'
+        }
+        response = test_client.post('/token/new', headers=new_refresh_headers)
+        assert response.status_code == 200
+
+    def test_refresh_must_not_query_the_database_when_not_revoked(
+        self, test_client, db_session
+    ):
+        self.submit_create_user_request(test_client=test_client)
+        refresh_token = self.submit_login_request(test_client=test_client).json[
+            'refresh_token'
+        ]
+        headers = {'Authorization': f'Bearer {refresh_token}'}
+        # loads the revocations filter
+        test_client.post('/token/new', headers=headers)
+
+        with count_queries() as statements:
+            response = test_client.post('/token/new', headers=headers)
+        assert response.status_code == 200
+        assert statements == []
+
 
 class TestTaskAPI:
     def submit_create_user_request(
@@ -205,6 +344,7 @@ class TestTaskAPI:
             'status': 'pending',
             'title': 'Study for the test',
             'user_uuid': user_uuid,
+            'version': 1,
         }
 
         assert response_data.pop('created_at') is not None
@@ -252,6 +392,7 @@ class TestTaskAPI:
             'status': 'pending',
             'title': 'Study for the test',
             'user_uuid': user_uuid_to_assign_to,
+            'version': 1,
         }
 
         assert response_data.pop('created_at') is not None
@@ -299,6 +440,7 @@ class TestTaskAPI:
             'status': 'completed',
             'title': 'Study for the test * updated',
             'user_uuid': user_uuid,
+            'version': 2,
         }
         assert response_data.pop('created_at') is not None
         assert response_data.pop('last_updated_at') is not None
@@ -354,6 +496,7 @@ class TestTaskAPI:
             'status': 'completed',
             'title': 'Study for the test * updated',
             'user_uuid': user_uuid_to_assign_to,
+            'version': 2,
         }
         assert response_data.pop('created_at') is not None
         assert response_data.pop('last_updated_at') is not None
@@ -416,6 +559,7 @@ class TestTaskAPI:
             'due_date': '2025-03-31T11:00:00',
             'status': 'pending',
             'title': 'Study for the test',
+            'version': 1,
         }
         assert response_data.pop('created_at') is not None
         assert response_data.pop('last_updated_at') is not None
@@ -471,6 +615,7 @@ class TestTaskAPI:
                 'user_name',
                 'user_uuid',
                 'uuid',
+                'version',
             }
             assert set(record.keys()) == expected_keys
             for key in expected_keys:
@@ -533,6 +678,7 @@ class TestTaskAPI:
                 'user_name',
                 'user_uuid',
                 'uuid',
+                'version',
             }
             assert set(record.keys()) == expected_keys
             for key in expected_keys:
@@ -578,6 +724,7 @@ class TestTaskAPI:
                 'user_name',
                 'user_uuid',
                 'uuid',
+                'version',
             }
             assert set(record.keys()) == expected_keys
             for key in expected_keys:
@@ -631,9 +778,761 @@ class TestTaskAPI:
                 'user_name',
                 'user_uuid',
                 'uuid',
+                'version',
             }
             assert set(record.keys()) == expected_keys
             for key in expected_keys:
                 record[key] is not None
 
             response_uuids.append(record.pop('uuid'))
+
+    def test_get_tasks_with_cursor_pagination_must_retrieve_all_pages(
+        self, test_client, db_session
+    ):
+        # GIVEN
+        uuids = create_tasks_for_various_users()
+        assert len(uuids) == 15
+
+        # WHEN
+        login_response = self.submit_login_request(test_client=test_client)
+        access_token = login_response.json['access_token']
+        headers = {'Authorization': f'Bearer {access_token}'}
+
+        pages = []
+        cursor = ''
+        while cursor is not None:
+            request_params = {'cursor': cursor}
+            get_response = test_client.get(
+                '/tasks', headers=headers, json=request_params
+            )
+            assert get_response.status_code == 200
+            pages.append(get_response.json)
+            cursor = get_response.json['next_cursor']
+
+        # THEN
+        assert len(pages) == 3
+        assert [page['has_next'] for page in pages] == [True, True, False]
+
+        records = [record for page in pages for record in page['records']]
+        assert len(records) == 15
+        assert {record['uuid'] for record in records} == set(uuids)
+
+        due_dates = [record['due_date'] for record in records]
+        assert due_dates == sorted(due_dates)
+
+    def test_get_tasks_with_invalid_cursor_must_fail(self, test_client, db_session):
+        user_info = self.create_user_and_login(
+            test_client=test_client, db_session=db_session
+        )
+        request_headers = user_info['request_headers']
+
+        request_params = {'cursor': 'not-a-valid-cursor'}
+        get_response = test_client.get(
+            '/tasks', headers=request_headers, json=request_params
+        )
+        assert get_response.status_code == 400
+
+    def test_get_tasks_streamed_as_ndjson_must_retrieve_all_tasks(
+        self, test_client, db_session
+    ):
+        # GIVEN
+        uuids = create_tasks_for_various_users()
+        assert len(uuids) == 15
+
+        login_response = self.submit_login_request(test_client=test_client)
+        access_token = login_response.json['access_token']
+
+        for headers, query_string in (
+            ({'Accept': 'application/x-ndjson'}, {}),
+            ({}, {'stream': '1'}),
+        ):
+            headers['Authorization'] = f'Bearer {access_token}'
+
+            # WHEN
+            get_response = test_client.get(
+                '/tasks', headers=headers, query_string=query_string, json={}
+            )
+
+            # THEN
+            assert get_response.status_code == 200
+            assert get_response.mimetype == 'application/x-ndjson'
+
+            lines = get_response.text.splitlines()
+            assert len(lines) == 15
+
+            records = [json.loads(line) for line in lines]
+            assert {record['uuid'] for record in records} == set(uuids)
+            assert all(record['user_name'] for record in records)
+
+    def test_get_tasks_stats_must_count_tasks_by_status_and_user(
+        self, test_client, db_session
+    ):
+        # GIVEN
+        uuids = create_tasks_for_various_users()
+        assert len(uuids) == 15
+
+        first_user = User.get_by(username='jean_luc_picard')
+        second_user = User.get_by(username='william_riker')
+
+        # WHEN
+        login_response = self.submit_login_request(test_client=test_client)
+        access_token = login_response.json['access_token']
+        headers = {'Authorization': f'Bearer {access_token}'}
+        request_params = {
+            'user_uuids': [str(first_user.uuid), str(second_user.uuid)],
+            'group_by_user': True,
+        }
+        get_response = test_client.get(
+            '/tasks/stats', headers=headers, json=request_params
+        )
+
+        # THEN
+        assert get_response.status_code == 200
+        assert get_response.json == {
+            'status': {'pending': 4, 'in_progress': 4, 'completed': 2},
+            'total': 10,
+            'users': {
+                str(first_user.uuid): {
+                    'pending': 2,
+                    'in_progress': 2,
+                    'completed': 1,
+                },
+                str(second_user.uuid): {
+                    'pending': 2,
+                    'in_progress': 2,
+                    'completed': 1,
+                },
+            },
+        }
+
+    def test_get_tasks_with_search_must_retrieve_matching_tasks_by_relevance(
+        self, test_client, db_session
+    ):
+        # GIVEN
+        uuids = create_tasks_for_various_users()
+        assert len(uuids) == 15
+
+        # WHEN
+        login_response = self.submit_login_request(test_client=test_client)
+        access_token = login_response.json['access_token']
+        headers = {'Authorization': f'Bearer {access_token}'}
+        request_params = {'search': 'presentation'}
+        get_response = test_client.get('/tasks', headers=headers, json=request_params)
+        assert get_response.status_code == 200
+
+        # THEN
+        response_data = get_response.json
+
+        # "Project" has "presentation" on its description; "Meeting" also does
+        assert [record['uuid'] for record in response_data] in (
+            [uuids[3], uuids[13]],
+            [uuids[13], uuids[3]],
+        )
+
+    def test_get_tasks_with_matching_etag_must_not_be_modified(
+        self, test_client, db_session
+    ):
+        # GIVEN
+        uuids = create_tasks_for_various_users()
+        assert len(uuids) == 15
+
+        login_response = self.submit_login_request(test_client=test_client)
+        access_token = login_response.json['access_token']
+        headers = {'Authorization': f'Bearer {access_token}'}
+        request_params = {'status': ['pending']}
+
+        first_response = test_client.get('/tasks', headers=headers, json=request_params)
+        assert first_response.status_code == 200
+        etag = first_response.headers['ETag']
+
+        # WHEN
+        with mock.patch('pydo.api.format_list_of_tasks') as mocked_format:
+            cached_response = test_client.get(
+                '/tasks',
+                headers={**headers, 'If-None-Match': etag},
+                json=request_params,
+            )
+
+        # THEN
+        assert cached_response.status_code == 304
+        assert cached_response.headers['ETag'] == etag
+        mocked_format.assert_not_called()
+
+        # a different filter must have a different etag
+        other_filter_response = test_client.get(
+            '/tasks',
+            headers={**headers, 'If-None-Match': etag},
+            json={'status': ['completed']},
+        )
+        assert other_filter_response.status_code == 200
+        assert other_filter_response.headers['ETag'] != etag
+
+        # changing one of the tasks must change the etag
+        task = Task.filter_by(uuids=[uuids[0]])[0]
+        task.update(title='Study harder')
+        changed_response = test_client.get(
+            '/tasks', headers={**headers, 'If-None-Match': etag}, json=request_params
+        )
+        assert changed_response.status_code == 200
+        assert changed_response.headers['ETag'] != etag
+
+        # deleting one of the tasks must change the etag
+        etag = changed_response.headers['ETag']
+        Task.delete(user_uuid=str(task.user_uuid), uuid=uuids[2])
+        deleted_response = test_client.get(
+            '/tasks', headers={**headers, 'If-None-Match': etag}, json=request_params
+        )
+        assert deleted_response.status_code == 200
+        assert len(deleted_response.json) == len(changed_response.json) - 1
+
+    def test_get_task_with_matching_etag_must_not_be_modified(
+        self, test_client, db_session
+    ):
+        user_info = self.create_user_and_login(
+            test_client=test_client, db_session=db_session
+        )
+        request_headers = user_info['request_headers']
+
+        create_payload = {
+            'title': 'Study for the test',
+            'description': 'Mathematics 101',
+            'due_date': '2025-03-31 11:00',
+        }
+        create_response = test_client.post(
+            '/task', headers=request_headers, json=create_payload
+        )
+        payload = {'uuid': create_response.json['uuid']}
+
+        get_response = test_client.get('/task', headers=request_headers, json=payload)
+        assert get_response.status_code == 200
+        etag = get_response.headers['ETag']
+        assert etag == create_response.headers['ETag']
+
+        headers = {**request_headers, 'If-None-Match': etag}
+        cached_response = test_client.get('/task', headers=headers, json=payload)
+        assert cached_response.status_code == 304
+
+        update_payload = {**payload, 'status': 'completed'}
+        test_client.patch('/task', headers=request_headers, json=update_payload)
+        changed_response = test_client.get('/task', headers=headers, json=payload)
+        assert changed_response.status_code == 200
+        assert changed_response.json['status'] == 'completed'
+
+    def test_get_tasks_must_be_cached_until_the_tasks_change(
+        self, test_client, db_session
+    ):
+        # GIVEN
+        uuids = create_tasks_for_various_users()
+
+        login_response = self.submit_login_request(test_client=test_client)
+        access_token = login_response.json['access_token']
+        headers = {'Authorization': f'Bearer {access_token}'}
+        request_params = {'status': ['pending', 'completed']}
+
+        first_response = test_client.get('/tasks', headers=headers, json=request_params)
+        assert first_response.status_code == 200
+
+        # WHEN
+        with mock.patch('pydo.api.Task.get_fingerprint') as mocked_fingerprint:
+            cached_response = test_client.get(
+                '/tasks',
+                headers=headers,
+                json={'status': ['completed', 'pending']},
+            )
+
+        # THEN
+        mocked_fingerprint.assert_not_called()
+        assert cached_response.status_code == 200
+        assert cached_response.data == first_response.data
+        assert cached_response.headers['ETag'] == first_response.headers['ETag']
+
+        # changing one of the tasks must invalidate the cached response
+        task = Task.filter_by(uuids=[uuids[0]])[0]
+        task.update(title='Study harder')
+        changed_response = test_client.get(
+            '/tasks', headers=headers, json=request_params
+        )
+        assert changed_response.headers['ETag'] != first_response.headers['ETag']
+        assert 'Study harder' in [record['title'] for record in changed_response.json]
+
+    def test_get_tasks_cache_must_be_invalidated_for_non_canonical_user_uuids(
+        self, test_client, db_session
+    ):
+        create_tasks_for_various_users()
+        login_response = self.submit_login_request(test_client=test_client)
+        headers = {'Authorization': f'Bearer {login_response.json["access_token"]}'}
+        user_uuid = User.get_by(email='jlp@startrek.com').uuid
+        request_params = {'user_uuids': [str(user_uuid).upper()]}
+
+        first_response = test_client.get('/tasks', headers=headers, json=request_params)
+        assert first_response.status_code == 200
+
+        Task().create(
+            user_uuid=user_uuid,
+            title='Study harder',
+            description='',
+            status='pending',
+            due_date=datetime(2025, 3, 31),
+        )
+        changed_response = test_client.get(
+            '/tasks', headers=headers, json=request_params
+        )
+        assert len(changed_response.json) == len(first_response.json) + 1
+
+        invalid_response = test_client.get(
+            '/tasks', headers=headers, json={'user_uuids': ['not-a-uuid']}
+        )
+        assert invalid_response.status_code == 400
+
+    def test_task_requests_must_not_load_the_current_user(
+        self, test_client, db_session
+    ):
+        user_info = self.create_user_and_login(
+            test_client=test_client, db_session=db_session
+        )
+        request_headers = user_info['request_headers']
+        create_response = test_client.post(
+            '/task',
+            headers=request_headers,
+            json={
+                'title': 'Study',
+                'description': 'Mathematics 101',
+                'due_date': '2025-03-31 11:00',
+            },
+        )
+        payload = {'uuid': create_response.json['uuid']}
+
+        with count_queries() as statements:
+            get_response = test_client.get(
+                '/task', headers=request_headers, json=payload
+            )
+            delete_response = test_client.delete(
+                '/task', headers=request_headers, json=payload
+            )
+
+        assert get_response.status_code == 200
+        assert delete_response.status_code == 204
+        assert not [s for s in statements if s.startswith('SELECT "user"')]
+
+    def test_get_user_must_load_the_current_user_from_the_identity_cache(
+        self, test_client, db_session
+    ):
+        user_info = self.create_user_and_login(
+            test_client=test_client, db_session=db_session
+        )
+        request_headers = user_info['request_headers']
+        test_client.get('/user', headers=request_headers)
+
+        with count_queries() as statements:
+            response = test_client.get('/user', headers=request_headers)
+
+        assert response.status_code == 200
+        assert response.json['username'] == 'jean_luc_picard'
+        assert statements == []
+
+    def test_create_many_tasks_must_return_the_result_of_each_task(
+        self, test_client, db_session
+    ):
+        user_info = self.create_user_and_login(
+            test_client=test_client, db_session=db_session
+        )
+        request_headers = user_info['request_headers']
+        payload = [
+            {
+                'title': 'Study for the test',
+                'description': 'Mathematics 101',
+                'due_date': '2025-03-31 11:00',
+            },
+            {'title': 'Gym', 'status': 'in_progress'},
+            {'title': 'Invalid', 'status': 'unknown', 'due_date': '31/03/2025'},
+            {'title': 'Unknown user', 'user_uuid': str(uuid4())},
+        ]
+
+        response = test_client.post(
+            '/tasks/bulk', headers=request_headers, json=payload
+        )
+
+        assert response.status_code == 207
+        assert response.json['created'] == 2
+        assert response.json['failed'] == 2
+        results = response.json['results']
+        assert [result['created'] for result in results] == [True, True, False, False]
+        assert results[0]['task']['title'] == 'Study for the test'
+        assert results[0]['task']['due_date'] == '2025-03-31T11:00:00'
+        assert results[1]['task']['status'] == 'in_progress'
+        assert len(results[2]['errors']) == 2
+        assert results[3]['errors'] == ['user_uuid: user not found']
+
+        list_response = test_client.get('/tasks', headers=request_headers, json={})
+        assert {task['title'] for task in list_response.json} == {
+            'Study for the test',
+            'Gym',
+        }
+
+    def test_create_many_tasks_must_reject_invalid_payloads(
+        self, test_client, db_session
+    ):
+        user_info = self.create_user_and_login(
+            test_client=test_client, db_session=db_session
+        )
+        request_headers = user_info['request_headers']
+
+        not_a_list_response = test_client.post(
+            '/tasks/bulk', headers=request_headers, json={'title': 'Gym'}
+        )
+        all_invalid_response = test_client.post(
+            '/tasks/bulk', headers=request_headers, json=[{'description': 'no title'}]
+        )
+
+        assert not_a_list_response.status_code == 400
+        assert all_invalid_response.status_code == 400
+        assert all_invalid_response.json['results'][0]['errors'] == ['title: required']
+
+    def test_update_many_tasks_must_return_the_updated_tasks(
+        self, test_client, db_session
+    ):
+        uuids = create_tasks_for_various_users()
+        login_response = self.submit_login_request(test_client=test_client)
+        access_token = login_response.json['access_token']
+        headers = {'Authorization': f'Bearer {access_token}'}
+
+        response = test_client.patch(
+            '/tasks/bulk',
+            headers=headers,
+            json={
+                'uuids': uuids[:3],
+                'changes': {'status': 'completed', 'due_date': '2025-03-31 11:00'},
+            },
+        )
+
+        assert response.status_code == 200
+        assert response.json['updated'] == 3
+        assert set(response.json['uuids']) == set(uuids[:3])
+        get_response = test_client.get(
+            '/tasks', headers=headers, json={'uuids': uuids[:3]}
+        )
+        assert {task['status'] for task in get_response.json} == {'completed'}
+        assert {task['due_date'] for task in get_response.json} == {
+            '2025-03-31T11:00:00'
+        }
+
+        no_filters_response = test_client.patch(
+            '/tasks/bulk', headers=headers, json={'changes': {'status': 'pending'}}
+        )
+        assert no_filters_response.status_code == 400
+
+    def test_update_many_tasks_must_not_update_tasks_of_other_users(
+        self, test_client, db_session
+    ):
+        # the first 5 tasks are of the logged in user, the others of other users
+        uuids = create_tasks_for_various_users()
+        login_response = self.submit_login_request(test_client=test_client)
+        user_uuid = str(User.get_by(email='jlp@startrek.com').uuid)
+        access_token = login_response.json['access_token']
+        headers = {'Authorization': f'Bearer {access_token}'}
+        foreign_task = format_task(Task.filter_by(uuids=[uuids[5]])[0])
+        other_user_uuid = str(foreign_task['user_uuid'])
+
+        response = test_client.patch(
+            '/tasks/bulk',
+            headers=headers,
+            json={'status': ['pending'], 'changes': {'status': 'completed'}},
+        )
+        assert response.status_code == 200
+        assert set(response.json['uuids']) <= set(uuids[:5])
+
+        foreign_uuids_response = test_client.patch(
+            '/tasks/bulk',
+            headers=headers,
+            json={'uuids': [uuids[0], uuids[5]], 'changes': {'status': 'completed'}},
+        )
+        assert foreign_uuids_response.status_code == 403
+
+        foreign_users_response = test_client.patch(
+            '/tasks/bulk',
+            headers=headers,
+            json={
+                'user_uuids': [user_uuid, other_user_uuid],
+                'changes': {'user_uuid': user_uuid},
+            },
+        )
+        assert foreign_users_response.status_code == 403
+
+        assert format_task(Task.filter_by(uuids=[uuids[5]])[0]) == foreign_task
+
+    def test_delete_many_tasks_must_report_the_deleted_uuids(
+        self, test_client, db_session
+    ):
+        user_info = self.create_user_and_login(
+            test_client=test_client, db_session=db_session
+        )
+        request_headers = user_info['request_headers']
+        create_response = test_client.post(
+            '/tasks/bulk',
+            headers=request_headers,
+            json=[{'title': 'Study'}, {'title': 'Gym'}],
+        )
+        uuids = [result['task']['uuid'] for result in create_response.json['results']]
+        missing_uuid = str(uuid4())
+
+        response = test_client.delete(
+            '/tasks', headers=request_headers, json={'uuids': uuids + [missing_uuid]}
+        )
+
+        assert response.status_code == 200
+        assert response.json['deleted'] == 2
+        assert set(response.json['uuids']) == set(uuids)
+        assert response.json['not_found'] == [missing_uuid]
+
+        invalid_response = test_client.delete(
+            '/tasks', headers=request_headers, json={'uuids': ['not-an-uuid']}
+        )
+        assert invalid_response.status_code == 400
+
+    def test_task_writes_must_run_a_single_statement(self, test_client, db_session):
+        user_info = self.create_user_and_login(
+            test_client=test_client, db_session=db_session
+        )
+        request_headers = user_info['request_headers']
+        payload = {
+            'title': 'Study for the test',
+            'description': 'Mathematics 101',
+            'due_date': '2025-03-31 11:00',
+        }
+
+        with count_queries() as create_statements:
+            create_response = test_client.post(
+                '/task', headers=request_headers, json=payload
+            )
+        assert create_response.status_code == 201
+        assert len(create_statements) == 1
+
+        update_payload = {'uuid': create_response.json['uuid'], 'status': 'completed'}
+        with count_queries() as update_statements:
+            update_response = test_client.patch(
+                '/task', headers=request_headers, json=update_payload
+            )
+        assert update_response.status_code == 200
+        assert update_response.json['status'] == 'completed'
+        assert len(update_statements) == 1
+
+        # the counters were changed on the same statements
+        assert Task.count_by_status(user_uuids=[user_info['user_uuid']])['status'] == {
+            'pending': 0,
+            'in_progress': 0,
+            'completed': 1,
+        }
+
+        missing_payload = {'uuid': str(uuid4()), 'status': 'completed'}
+        missing_response = test_client.patch(
+            '/task', headers=request_headers, json=missing_payload
+        )
+        assert missing_response.status_code == 404
+
+    def test_update_task_with_if_match_must_detect_conflicts(
+        self, test_client, db_session
+    ):
+        user_info = self.create_user_and_login(
+            test_client=test_client, db_session=db_session
+        )
+        request_headers = user_info['request_headers']
+        payload = {
+            'title': 'Study for the test',
+            'description': 'Mathematics 101',
+            'due_date': '2025-03-31 11:00',
+        }
+        create_response = test_client.post(
+            '/task', headers=request_headers, json=payload
+        )
+        assert create_response.json['version'] == 1
+        assert create_response.headers['ETag'] == '"1"'
+        task_uuid = create_response.json['uuid']
+
+        update_payload = {'uuid': task_uuid, 'title': 'first writer'}
+        with count_queries() as update_statements:
+            first_response = test_client.patch(
+                '/task',
+                headers={**request_headers, 'If-Match': '"1"'},
+                json=update_payload,
+            )
+        assert first_response.status_code == 200
+        assert first_response.json['version'] == 2
+        assert first_response.headers['ETag'] == '"2"'
+        assert len(update_statements) == 1
+        assert 'FOR UPDATE' not in update_statements[0]
+
+        # a second writer, based on the same version, must not overwrite the changes
+        second_response = test_client.patch(
+            '/task',
+            headers={**request_headers, 'If-Match': '"1"'},
+            json={'uuid': task_uuid, 'title': 'second writer'},
+        )
+        assert second_response.status_code == 412
+        assert second_response.json['version'] == 2
+        assert Task.filter_by(uuids=[task_uuid])[0].title == 'first writer'
+
+        for if_match in ('"abc"', '"1", "2"', 'W/"2"'):
+            invalid_response = test_client.patch(
+                '/task',
+                headers={**request_headers, 'If-Match': if_match},
+                json={'uuid': task_uuid, 'title': 'third writer'},
+            )
+            assert invalid_response.status_code == 412
+
+        any_version_response = test_client.patch(
+            '/task',
+            headers={**request_headers, 'If-Match': '*'},
+            json={'uuid': task_uuid, 'title': 'third writer'},
+        )
+        assert any_version_response.json['version'] == 3
+
+        missing_response = test_client.patch(
+            '/task',
+            headers={**request_headers, 'If-Match': '"1"'},
+            json={'uuid': str(uuid4()), 'title': 'missing'},
+        )
+        assert missing_response.status_code == 404
+
+    def test_update_task_with_the_etag_of_get_task(self, test_client, db_session):
+        user_info = self.create_user_and_login(
+            test_client=test_client, db_session=db_session
+        )
+        request_headers = user_info['request_headers']
+        create_response = test_client.post(
+            '/task',
+            headers=request_headers,
+            json={'title': 'Study for the test', 'due_date': '2025-03-31 11:00'},
+        )
+        payload = {'uuid': create_response.json['uuid']}
+
+        get_response = test_client.get('/task', headers=request_headers, json=payload)
+        etag = get_response.headers['ETag']
+        update_response = test_client.patch(
+            '/task',
+            headers={**request_headers, 'If-Match': etag},
+            json={**payload, 'title': 'Study harder'},
+        )
+        assert update_response.status_code == 200
+
+        # the ETag of the update is the one of the next read
+        headers = {**request_headers, 'If-None-Match': update_response.headers['ETag']}
+        cached_response = test_client.get('/task', headers=headers, json=payload)
+        assert cached_response.status_code == 304
+
+        stale_response = test_client.patch(
+            '/task',
+            headers={**request_headers, 'If-Match': etag},
+            json={**payload, 'title': 'Study less'},
+        )
+        assert stale_response.status_code == 412
+
+    def test_create_task_with_idempotency_key_must_replay_the_first_response(
+        self, test_client, db_session
+    ):
+        user_info = self.create_user_and_login(
+            test_client=test_client, db_session=db_session
+        )
+        request_headers = {
+            **user_info['request_headers'],
+            'Idempotency-Key': 'create-study-task',
+        }
+        payload = {
+            'title': 'Study for the test',
+            'description': 'Mathematics 101',
+            'due_date': '2025-03-31 11:00',
+        }
+
+        create_response = test_client.post(
+            '/task', headers=request_headers, json=payload
+        )
+        with count_queries() as retry_statements:
+            retry_response = test_client.post(
+                '/task', headers=request_headers, json=payload
+            )
+
+        assert create_response.status_code == 201
+        assert retry_response.status_code == 201
+        assert retry_response.json == create_response.json
+        assert retry_response.headers['ETag'] == create_response.headers['ETag']
+        assert retry_response.headers['Idempotent-Replayed'] == 'true'
+        assert not [s for s in retry_statements if s.startswith('INSERT INTO task')]
+        assert Task.count_by_status(user_uuids=[user_info['user_uuid']])['total'] == 1
+
+        other_payload_response = test_client.post(
+            '/task', headers=request_headers, json={**payload, 'title': 'Gym'}
+        )
+        assert other_payload_response.status_code == 422
+
+        invalid_key_response = test_client.post(
+            '/task',
+            headers={**request_headers, 'Idempotency-Key': 'k' * 256},
+            json=payload,
+        )
+        assert invalid_key_response.status_code == 400
+
+    def test_create_task_with_a_running_idempotency_key_must_conflict(
+        self, test_client, db_session
+    ):
+        user_info = self.create_user_and_login(
+            test_client=test_client, db_session=db_session
+        )
+        request_headers = {**user_info['request_headers'], 'Idempotency-Key': 'k1'}
+        payload = {'title': 'Study for the test', 'due_date': '2025-03-31 11:00'}
+
+        with mock.patch(
+            'pydo.api.Task.create', side_effect=RuntimeError('connection lost')
+        ):
+            failed_response = test_client.post(
+                '/task', headers=request_headers, json=payload
+            )
+        assert failed_response.status_code == 500
+
+        # the key was released, so the request can be retried
+        retry_response = test_client.post(
+            '/task', headers=request_headers, json=payload
+        )
+        assert retry_response.status_code == 201
+
+        running_key = mock.Mock(status_code=None)
+        with mock.patch('pydo.api.IdempotencyKey.reserve', return_value=running_key):
+            running_response = test_client.post(
+                '/task',
+                headers={**request_headers, 'Idempotency-Key': 'k2'},
+                json=payload,
+            )
+        assert running_response.status_code == 409
+        assert running_response.headers['Retry-After'] == '1'
+
+    def test_export_tasks_must_stream_the_users_tasks(self, test_client, db_session):
+        create_tasks_for_various_users()
+        login_response = self.submit_login_request(test_client=test_client)
+        access_token = login_response.json['access_token']
+        headers = {'Authorization': f'Bearer {access_token}'}
+        user = User.get_by(username='jean_luc_picard')
+
+        # streamed responses keep the request context until they are consumed
+        csv_response = test_client.get('/tasks/export', headers=headers)
+        csv_body = csv_response.get_data(as_text=True)
+        ndjson_response = test_client.get(
+            '/tasks/export?format=ndjson',
+            headers=headers,
+            json={'status': ['pending']},
+        )
+        ndjson_body = ndjson_response.get_data()
+        invalid_response = test_client.get('/tasks/export?format=xml', headers=headers)
+
+        assert csv_response.status_code == 200
+        assert csv_response.mimetype == 'text/csv'
+        lines = csv_body.splitlines()
+        assert lines[0] == (
+            'uuid,title,description,status,due_date,created_at,last_updated_at,'
+            'version,user_uuid,user_name'
+        )
+        assert len(lines) == 6
+
+        assert ndjson_response.mimetype == 'application/x-ndjson'
+        tasks = [json.loads(line) for line in ndjson_body.splitlines()]
+        assert {task['title'] for task in tasks} == {'Study', 'Reading'}
+        assert {task['user_uuid'] for task in tasks} == {str(user.uuid)}
+
+        assert invalid_response.status_code == 400
@@ -0,0 +1,127 @@
+from unittest import mock
+
+import pytest
+
+from pydo.cache import (
+    ALL_USERS,
+    InProcessCacheBackend,
+    SharedMemoryCacheBackend,
+    TasksCache,
+    TTLCache,
+)
+
+
+@pytest.fixture(params=['in_process', 'shared_memory'])
+def tasks_cache(request, tmp_path):
+    cache = TasksCache()
+    cache.init_app(
+        backend_name=request.param,
+        ttl=30,
+        max_bytes=100,
+        path=str(tmp_path / 'tasks-cache.sqlite3'),
+    )
+    return cache
+
+
+def test_cache_must_return_the_cached_etag_and_body(tasks_cache):
+    assert tasks_cache.get(key='a') is None
+
+    tasks_cache.set(key='a', etag='abc123', body=b'[{"title": "a b"}]\n')
+
+    assert tasks_cache.get(key='a') == ('abc123', b'[{"title": "a b"}]\n')
+
+
+def test_cache_must_evict_the_least_recently_used_above_max_bytes(tasks_cache):
+    tasks_cache.set(key='a', etag='a', body=b'a' * 40)
+    tasks_cache.set(key='b', etag='b', body=b'b' * 40)
+    tasks_cache.get(key='a')
+
+    tasks_cache.set(key='c', etag='c', body=b'c' * 40)
+
+    assert tasks_cache.get(key='a') is not None
+    assert tasks_cache.get(key='b') is None
+    assert tasks_cache.get(key='c') is not None
+
+    # values larger than the cache are not stored
+    tasks_cache.set(key='d', etag='d', body=b'd' * 200)
+    assert tasks_cache.get(key='d') is None
+
+
+@pytest.mark.parametrize('clock', ['time.monotonic', 'time.time'])
+def test_cache_must_expire_entries_after_ttl(clock, tmp_path):
+    backends = {
+        'time.monotonic': InProcessCacheBackend(ttl=30, max_bytes=100),
+        'time.time': SharedMemoryCacheBackend(
+            ttl=30, max_bytes=100, path=str(tmp_path / 'tasks-cache.sqlite3')
+        ),
+    }
+    backend = backends[clock]
+
+    with mock.patch(f'pydo.cache.{clock}', return_value=1000):
+        backend.set('a', b'value')
+    with mock.patch(f'pydo.cache.{clock}', return_value=1029):
+        assert backend.get('a') == b'value'
+    with mock.patch(f'pydo.cache.{clock}', return_value=1031):
+        assert backend.get('a') is None
+
+
+def test_invalidate_must_bump_the_users_versions(tasks_cache):
+    versions = tasks_cache.get_versions(user_uuids=['u2', 'u1'])
+    assert versions == [('u1', 0), ('u2', 0)]
+    assert tasks_cache.get_versions(user_uuids=[]) == [(ALL_USERS, 0)]
+
+    tasks_cache.invalidate(user_uuids=['u1'])
+
+    assert tasks_cache.get_versions(user_uuids=['u1', 'u2']) == [('u1', 1), ('u2', 0)]
+    assert tasks_cache.get_versions(user_uuids=[]) == [(ALL_USERS, 1)]
+
+
+def test_shared_memory_backend_must_be_shared_by_its_instances(tmp_path):
+    path = str(tmp_path / 'tasks-cache.sqlite3')
+    worker_1 = SharedMemoryCacheBackend(ttl=30, max_bytes=100, path=path)
+    worker_2 = SharedMemoryCacheBackend(ttl=30, max_bytes=100, path=path)
+
+    worker_1.set('a', b'value')
+    worker_1.bump_versions(['u1'])
+
+    assert worker_2.get('a') == b'value'
+    assert worker_2.get_versions(['u1']) == {'u1': 1}
+
+
+def test_auto_backend_must_be_shared_by_many_processes(tmp_path):
+    cache = TasksCache()
+    path = str(tmp_path / 'tasks-cache.sqlite3')
+
+    cache.init_app(backend_name='auto', ttl=30, max_bytes=100, path=path)
+    assert isinstance(cache.backend, InProcessCacheBackend)
+
+    cache.init_app(backend_name='auto', ttl=30, max_bytes=100, path=path, processes=3)
+    assert isinstance(cache.backend, SharedMemoryCacheBackend)
+
+
+def test_disabled_cache_must_do_nothing():
+    cache = TasksCache()
+    cache.init_app(backend_name='disabled', ttl=30, max_bytes=100, path='')
+
+    cache.set(key='a', etag='a', body=b'a')
+    cache.invalidate(user_uuids=['u1'])
+
+    assert not cache.enabled
+    assert cache.get(key='a') is None
+
+
+def test_ttl_cache_must_evict_the_least_recently_used_and_expired_items():
+    cache = TTLCache(ttl=30, max_size=2)
+
+    with mock.patch('pydo.cache.time.monotonic', return_value=1000):
+        cache.set('a', {'username': 'a'})
+        cache.set('b', {'username': 'b'})
+        cache.get('a')
+        cache.set('c', {'username': 'c'})
+
+        assert cache.get('a') == {'username': 'a'}
+        assert cache.get('b') is None
+
+    with mock.patch('pydo.cache.time.monotonic', return_value=1031):
+        assert cache.get('a') is None
+        assert cache.get('c') is None
@@ -0,0 +1,136 @@
+import csv
+import json
+from datetime import datetime
+
+from pydo.models import Task, TaskCounter, User
+from pydo.tests.utils import create_tasks_for_various_users
+
+
+def test_reconcile_counters_must_report_drift(app, db_session):
+    create_tasks_for_various_users()
+    user = User.get_by(username='william_riker')
+    TaskCounter.add(user_uuid=user.uuid, status='completed', delta=2)
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['tasks', 'reconcile-counters'])
+
+    assert result.exit_code == 0
+    assert result.output == (
+        f'user_uuid={user.uuid} status=completed: expected 1, found 3\n'
+        '1 drifted counter(s) fixed.\n'
+    )
+
+    result = runner.invoke(args=['tasks', 'reconcile-counters'])
+    assert result.output == '0 drifted counter(s) fixed.\n'
+
+
+def test_import_must_load_the_valid_tasks_of_csv_files(app, db_session, tmp_path):
+    create_tasks_for_various_users()
+    user = User.get_by(username='william_riker')
+    tasks_file = tmp_path / 'tasks.csv'
+    tasks_file.write_text(
+        'username,user_uuid,title,description,status,due_date\n'
+        'william_riker,,Imported 1,"first, task",completed,2025-03-31 11:00:15\n'
+        ',' + str(user.uuid) + ',Imported 2,,,\n'
+        'william_riker,,Invalid,,unknown,\n'
+        'q,,Unknown user,,,\n'
+        'william_riker,,Imported 3,,in_progress,2025-04-01T08:00\n'
+    )
+    counts_before = Task.count_by_status(user_uuids=[user.uuid])
+
+    runner = app.test_cli_runner(mix_stderr=False)
+    result = runner.invoke(
+        args=['tasks', 'import', str(tasks_file), '--chunk-size', '2']
+    )
+
+    assert result.exit_code == 0, result.output
+    assert result.stderr.splitlines() == [
+        "line 4: status: must be one of ['pending', 'in_progress', 'completed']",
+        'line 5: username: user not found: q',
+    ]
+    assert result.stdout.splitlines()[-1].startswith(
+        'Done: 3 task(s) imported, 2 skipped'
+    )
+
+    imported = {
+        task.title: task
+        for task in Task.filter_by(search='imported', user_uuids=[user.uuid])
+    }
+    assert set(imported) == {'Imported 1', 'Imported 2', 'Imported 3'}
+    assert imported['Imported 1'].description == 'first, task'
+    assert imported['Imported 1'].due_date == datetime(2025, 3, 31, 11, 0, 15)
+    assert imported['Imported 2'].status == 'pending'
+    counts_after = Task.count_by_status(user_uuids=[user.uuid])
+    assert counts_after['total'] == counts_before['total'] + 3
+
+
+def test_import_must_load_ndjson_files(app, db_session, tmp_path):
+    create_tasks_for_various_users()
+    tasks_file = tmp_path / 'tasks.ndjson'
+    tasks_file.write_text(
+        '{"username": "deanna_troy", "title": "Imported", "status": "pending"}\n'
+        '\n'
+        'not json\n'
+    )
+
+    runner = app.test_cli_runner(mix_stderr=False)
+    result = runner.invoke(args=['tasks', 'import', str(tasks_file)])
+
+    assert result.exit_code == 0, result.output
+    assert result.stderr == 'line 3: invalid JSON object\n'
+    user = User.get_by(username='deanna_troy')
+    assert [
+        task.title for task in Task.filter_by(search='imported', user_uuids=[user.uuid])
+    ] == ['Imported']
+
+
+def test_export_must_write_the_filtered_tasks(app, db_session, tmp_path):
+    create_tasks_for_various_users()
+    user = User.get_by(username='william_riker')
+    csv_file = tmp_path / 'tasks.csv'
+    ndjson_file = tmp_path / 'tasks.ndjson'
+
+    runner = app.test_cli_runner()
+    csv_result = runner.invoke(
+        args=['tasks', 'export', str(csv_file), '--username', 'william_riker']
+    )
+    ndjson_result = runner.invoke(
+        args=[
+            'tasks',
+            'export',
+            str(ndjson_file),
+            '--format',
+            'ndjson',
+            '--status',
+            'completed',
+        ]
+    )
+
+    assert csv_result.exit_code == 0, csv_result.output
+    rows = list(csv.DictReader(csv_file.open()))
+    assert len(rows) == 5
+    assert {row['user_uuid'] for row in rows} == {str(user.uuid)}
+    assert {row['user_name'] for row in rows} == {'william_riker'}
+    assert [row['due_date'] for row in rows] == sorted(row['due_date'] for row in rows)
+
+    assert ndjson_result.exit_code == 0, ndjson_result.output
+    tasks = [json.loads(line) for line in ndjson_file.read_text().splitlines()]
+    expected_tasks = Task.filter_by(status=['completed'])
+    assert {task['uuid'] for task in tasks} == {
+        str(task.uuid) for task in expected_tasks
+    }
+    assert set(tasks[0]) == {
+        'uuid',
+        'title',
+        'description',
+        'status',
+        'due_date',
+        'created_at',
+        'last_updated_at',
+        'version',
+        'user_uuid',
+        'user_name',
+    }
+
+    missing_user_result = runner.invoke(args=['tasks', 'export', '--username', 'q'])
+    assert missing_user_result.exit_code != 0
@@ -0,0 +1,39 @@
+import threading
+
+import pytest
+
+from pydo.commons import iterate_copy_to
+
+
+def test_iterate_copy_to_must_yield_the_output_in_chunks():
+    def copy(file):
+        for index in range(10):
+            file.write(f'row {index}\n'.encode('utf-8'))
+
+    chunks = list(iterate_copy_to(copy=copy, cancel=lambda: None, chunk_size=20))
+
+    assert b''.join(chunks) == b''.join(f'row {i}\n'.encode('utf-8') for i in range(10))
+    assert all(len(chunk) >= 20 for chunk in chunks[:-1])
+
+
+def test_iterate_copy_to_must_raise_the_copy_errors():
+    def copy(file):
+        file.write(b'row 0\n')
+        raise RuntimeError('canceling statement due to user request')
+
+    with pytest.raises(RuntimeError):
+        list(iterate_copy_to(copy=copy, cancel=lambda: None, chunk_size=1))
+
+
+def test_iterate_copy_to_must_cancel_the_copy_when_stopped():
+    cancelled = threading.Event()
+
+    def copy(file):
+        while not cancelled.is_set():
+            file.write(b'row\n')
+
+    chunks = iterate_copy_to(copy=copy, cancel=cancelled.set, chunk_size=4)
+    assert next(chunks) == b'row\n'
+    chunks.close()
+
+    assert cancelled.is_set()
@@ -0,0 +1,80 @@
+import json
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+from uuid import uuid4
+
+import pytest
+from flask_jwt_extended import create_access_token, decode_token, jwt_manager
+from jwt import ExpiredSignatureError, InvalidSignatureError
+
+from pydo.extensions import FastJSONProvider, JSONProvider, jwt_decode_cache
+
+
+def test_json_providers_must_serialize_the_same_way(app):
+    payload = {
+        'uuid': uuid4(),
+        'due_date': datetime(2025, 3, 31, 11, 0),
+        'created_at': datetime(2025, 3, 1, 8, 30, 15, 123456),
+        'title': 'Study for the test ✓',
+        'nested': [{'b': 1, 'a': None}],
+    }
+
+    fast_json = FastJSONProvider(app).dumps(payload)
+    stdlib_json = JSONProvider(app).dumps(payload)
+
+    assert json.loads(fast_json) == json.loads(stdlib_json)
+    assert json.loads(fast_json) == {
+        'uuid': str(payload['uuid']),
+        'due_date': '2025-03-31T11:00:00',
+        'created_at': '2025-03-01T08:30:15.123456',
+        'title': 'Study for the test ✓',
+        'nested': [{'a': None, 'b': 1}],
+    }
+
+
+def test_app_must_use_fast_json_provider_when_available(app):
+    assert isinstance(app.json, FastJSONProvider)
+
+    response = app.json.response({'uuid': uuid4()})
+    assert response.mimetype == 'application/json'
+    assert set(response.json.keys()) == {'uuid'}
+
+
+def test_jwt_decode_cache_must_verify_each_token_once(app):
+    jwt_decode_cache.clear()
+    token = create_access_token(identity=str(uuid4()), expires_delta=timedelta(hours=1))
+    other_token = create_access_token(identity=str(uuid4()))
+
+    with mock.patch(
+        'flask_jwt_extended.jwt_manager._decode_jwt', wraps=jwt_manager._decode_jwt
+    ) as verify:
+        claims = [decode_token(token) for _ in range(3)]
+        decode_token(other_token)
+
+    assert verify.call_count == 2
+    assert claims[0] == claims[2]
+    assert claims[0] is not claims[1]
+    assert jwt_decode_cache.get_metrics() == {'size': 2, 'hits': 2, 'misses': 2}
+
+    # kept until the token expires
+    (_, expires_at), _ = jwt_decode_cache.items.values()
+    assert 3590 < expires_at - time.monotonic() <= 3600
+
+
+def test_jwt_decode_cache_must_not_keep_invalid_tokens(app):
+    jwt_decode_cache.clear()
+    expired_token = create_access_token(
+        identity=str(uuid4()), expires_delta=timedelta(seconds=-1)
+    )
+    token = create_access_token(identity=str(uuid4()))
+    decode_token(token)
+    tampered_token = token[:-2] + ('AA' if token[-2:] != 'AA' else 'BB')
+
+    with pytest.raises(ExpiredSignatureError):
+        decode_token(expired_token)
+    with pytest.raises(InvalidSignatureError):
+        decode_token(tampered_token)
+
+    assert decode_token(expired_token, allow_expired=True)['exp'] < time.time()
+    assert jwt_decode_cache.get_metrics()['size'] == 1
@@ -1,11 +1,16 @@
 from datetime import datetime, timedelta
-from typing import List
+from typing import Dict, List
+from uuid import UUID, uuid4
 
 import pytest
 from sqlalchemy.exc import DataError
 
-from pydo.models import User, Task
-from pydo.tests.utils import create_tasks_for_various_users
+from pydo.cache import SharedMemoryCacheBackend, TasksCache
+from pydo.commons import format_list_of_tasks
+from pydo.exceptions import VersionMismatchError
+from pydo.extensions import db, password_hasher, revocation_filter, tasks_cache
+from pydo.models import IdempotencyKey, RevokedToken, User, Task, TaskCounter
+from pydo.tests.utils import count_queries, create_tasks_for_various_users
 
 
 # TODO: the functions below could be fixtures on conftest.py
@@ -143,6 +148,89 @@ class TestUserModel:
 
         assert new_user.last_updated_at == old_last_updated_at
 
+    def test_get_cached_must_not_query_the_database_again(self, db_session):
+        new_user = create_user()
+        db_session.expunge_all()
+
+        first_user = User.get_cached(uuid=str(new_user.uuid))
+        db_session.expunge_all()
+        with count_queries() as statements:
+            cached_user = User.get_cached(uuid=str(new_user.uuid))
+            assert cached_user.username == 'jean_luc_picard'
+            assert cached_user.check_password(password='12345678') is True
+
+        assert statements == []
+        assert cached_user is not first_user
+
+        # the cached user can be changed, which invalidates the cache
+        cached_user.update(email='picard@startrek.com')
+        db_session.expunge_all()
+        updated_user = User.get_cached(uuid=str(new_user.uuid))
+        assert updated_user.email == 'picard@startrek.com'
+        assert User.get_by(uuid=str(new_user.uuid)).email == 'picard@startrek.com'
+
+    def test_get_cached_must_see_the_updates_of_other_processes(
+        self, db_session, monkeypatch, tmp_path
+    ):
+        path = str(tmp_path / 'cache.sqlite3')
+        monkeypatch.setattr(
+            tasks_cache,
+            'backend',
+            SharedMemoryCacheBackend(ttl=60, max_bytes=1024 * 1024, path=path),
+        )
+        new_user = create_user()
+        db_session.expunge_all()
+        assert User.get_cached(uuid=str(new_user.uuid)).email == 'jlp@startrek.com'
+
+        # another process (with its own cache) updates the user
+        other_process_cache = TasksCache()
+        other_process_cache.init_app(
+            backend_name='shared_memory', ttl=60, max_bytes=1024 * 1024, path=path
+        )
+        db_session.execute(
+            User.__table__.update()
+            .where(User.__table__.c.uuid == new_user.uuid)
+            .values(email='picard@startrek.com')
+        )
+        db_session.commit()
+        other_process_cache.invalidate_user(user_uuid=str(new_user.uuid))
+        db_session.expunge_all()
+
+        updated_user = User.get_cached(uuid=str(new_user.uuid))
+        assert updated_user.email == 'picard@startrek.com'
+
+    def test_get_cached_must_not_cache_without_the_tasks_cache(
+        self, db_session, monkeypatch
+    ):
+        monkeypatch.setattr(tasks_cache, 'backend', None)
+        new_user = create_user()
+        db_session.expunge_all()
+
+        User.get_cached(uuid=str(new_user.uuid))
+        db_session.expunge_all()
+        with count_queries() as statements:
+            assert User.get_cached(uuid=str(new_user.uuid)) is not None
+
+        assert len(statements) == 1
+
+    def test_check_password_must_rehash_when_the_cost_factor_changes(
+        self, db_session, monkeypatch
+    ):
+        monkeypatch.setattr(password_hasher, 'rounds', 4)
+        new_user = create_user()
+        assert new_user.password_hash.startswith('$2b$04$')
+
+        monkeypatch.setattr(password_hasher, 'rounds', 5)
+        assert new_user.check_password(password='wrong password') is False
+        assert new_user.password_hash.startswith('$2b$04$')
+
+        assert new_user.check_password(password='12345678') is True
+        assert new_user.password_hash.startswith('$2b$05$')
+        db_session.expunge_all()
+        stored_user = User.get_by(uuid=str(new_user.uuid))
+        assert stored_user.password_hash == new_user.password_hash
+        assert stored_user.check_password(password='12345678') is True
+
 
 class TestTaskModel:
     def test_create_tasks_for_single_user_with_valid_status(self, db_session):
@@ -202,6 +290,29 @@ class TestTaskModel:
 
         assert first_task.last_updated_at == first_task_original_last_updated_at
 
+    def test_update_with_version_must_only_update_the_same_version(self, db_session):
+        tasks_uuids = create_tasks_for_single_user()
+        task = Task.filter_by(uuids=[tasks_uuids[0]])[0]
+        assert task.version == 1
+
+        task.update(title='first writer', version=1)
+        assert task.version == 2
+
+        with pytest.raises(VersionMismatchError) as exc_info:
+            Task.update_by_uuid(uuid=task.uuid, title='second writer', version=1)
+        assert exc_info.value.current_version == 2
+        assert Task.get_version(uuid=task.uuid) == 2
+        assert Task.filter_by(uuids=[task.uuid])[0].title == 'first writer'
+
+        assert Task.update_by_uuid(uuid=uuid4(), title='missing', version=1) is None
+
+        # updates without version and bulk updates increment it too
+        Task.update_by_uuid(uuid=task.uuid, status='completed')
+        Task.update_many(changes={'status': 'pending'}, uuids=tasks_uuids)
+        assert Task.get_version(uuid=task.uuid) == 4
+        assert Task.get_version(uuid=tasks_uuids[1]) == 2
+        assert TaskCounter.reconcile() == []
+
     def test_filters_must_get_correct_tasks(self, db_session):
         uuids = create_tasks_for_various_users()
         assert len(uuids) == 15
@@ -229,3 +340,479 @@ class TestTaskModel:
         expected_uuids_values = {uuids[4], uuids[6], uuids[12]}
         uuid_values = {str(task.uuid) for task in multi_user_tasks}
         assert uuid_values == expected_uuids_values
+
+    def test_filters_must_list_tasks_in_uuid_order(self, db_session):
+        uuids = create_tasks_for_various_users()
+        # updated rows are moved on the table, so a scan would return them last
+        db_session.execute(
+            Task.__table__.update()
+            .where(Task.__table__.c.uuid.in_(uuids[:5]))
+            .values(title='Updated')
+        )
+        db_session.commit()
+
+        expected_uuids = sorted(uuids)
+        listed_uuids = [str(task.uuid) for task in Task.filter_by(read_only=True)]
+        assert listed_uuids == expected_uuids
+        iterated_uuids = [
+            str(task.uuid) for task in Task.iterate_by(batch_size=4, read_only=True)
+        ]
+        assert iterated_uuids == expected_uuids
+
+    def test_filter_page_must_walk_all_tasks_in_due_date_order(self, db_session):
+        uuids = create_tasks_for_various_users()
+        assert len(uuids) == 15
+
+        user = User.get_by(username='jean_luc_picard')
+        task_without_due_date = Task().create(
+            user_uuid=user.uuid,
+            title='Someday',
+            description='No due date',
+            status='pending',
+        )
+
+        paged_tasks = []
+        after = None
+        while True:
+            page = Task.filter_page(limit=4, after=after)
+            if not page:
+                break
+            paged_tasks.extend(page)
+            after = (page[-1].due_date, str(page[-1].uuid))
+
+        assert len(paged_tasks) == 16
+        assert {str(task.uuid) for task in paged_tasks} == set(uuids) | {
+            str(task_without_due_date.uuid)
+        }
+        assert paged_tasks[-1].uuid == task_without_due_date.uuid
+
+        due_dates = [task.due_date for task in paged_tasks[:-1]]
+        assert due_dates == sorted(due_dates)
+
+    def test_filter_and_format_tasks_must_run_a_single_query(self, db_session):
+        uuids = create_tasks_for_various_users()
+        assert len(uuids) == 15
+
+        for filters in ({}, {'uuids': uuids[:2]}, {'status': ['pending']}):
+            # start without any user on the identity map
+            db.session.expunge_all()
+
+            with count_queries() as statements:
+                tasks = Task.filter_by(**filters)
+                formatted_tasks = format_list_of_tasks(tasks=tasks)
+
+            assert formatted_tasks
+            assert all(task['user_name'] for task in formatted_tasks)
+            assert len(statements) == 1
+
+    def test_read_only_filter_must_format_same_as_task_instances(self, db_session):
+        uuids = create_tasks_for_various_users()
+        assert len(uuids) == 15
+
+        filters = {'status': ['pending', 'completed']}
+        formatted_tasks = format_list_of_tasks(tasks=Task.filter_by(**filters))
+
+        db.session.expunge_all()
+        with count_queries() as statements:
+            rows = Task.filter_by(read_only=True, **filters)
+            formatted_rows = format_list_of_tasks(tasks=rows)
+
+        assert len(statements) == 1
+        assert not any(isinstance(row, Task) for row in rows)
+        assert len(db.session.identity_map) == 0
+
+        def by_uuid(formatted):
+            return sorted(formatted, key=lambda task: task['uuid'])
+
+        assert by_uuid(formatted_rows) == by_uuid(formatted_tasks)
+
+    def test_count_by_status_must_count_filtered_tasks(self, db_session):
+        uuids = create_tasks_for_various_users()
+        assert len(uuids) == 15
+
+        with count_queries() as statements:
+            stats = Task.count_by_status()
+        assert len(statements) == 1
+        assert stats == {
+            'status': {'pending': 6, 'in_progress': 6, 'completed': 3},
+            'total': 15,
+        }
+
+        stats = Task.count_by_status(
+            status=['completed'],
+            start_due_date=datetime.strptime('2025-01-02 13:00', '%Y-%m-%d %H:%M'),
+            end_due_date=datetime.strptime('2025-01-06 10:20', '%Y-%m-%d %H:%M'),
+        )
+        assert stats == {
+            'status': {'pending': 0, 'in_progress': 0, 'completed': 3},
+            'total': 3,
+        }
+
+    def test_filter_query_statement_must_not_change_with_list_sizes(self, app):
+        def compile_statement(**filters):
+            query = Task.build_filter_query(**filters)
+            statement = query.statement.compile(
+                dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True}
+            )
+            return str(statement)
+
+        statements = {
+            compile_statement(
+                user_uuids=[str(uuid4()) for _ in range(size)], status=status
+            )
+            for size, status in ((1, ['pending']), (5, ['pending', 'completed']))
+        }
+        assert len(statements) == 1
+        assert 'task.user_uuid = ANY' in statements.pop()
+
+    @pytest.mark.parametrize('copy_threshold', [1000, 0])
+    def test_create_many_must_create_the_tasks_and_counters(
+        self, copy_threshold, db_session
+    ):
+        user = create_user()
+        tasks_data = [
+            {
+                'user_uuid': user.uuid,
+                'title': f'task {index}',
+                'description': None if index == 0 else f'description\t"{index}"\\n',
+                'status': ['pending', 'completed', ''][index],
+                'due_date': datetime(2025, 3, 31, 11, index) if index else None,
+            }
+            for index in range(3)
+        ]
+
+        with count_queries() as statements:
+            created_tasks = Task.create_many(
+                tasks_data=tasks_data, copy_threshold=copy_threshold
+            )
+
+        # COPY is sent straight to the cursor (so it is not on the statements)
+        inserts = [s for s in statements if s.startswith('INSERT INTO task ')]
+        assert len(inserts) == (1 if copy_threshold else 0)
+        assert [task['title'] for task in created_tasks] == [
+            'task 0',
+            'task 1',
+            'task 2',
+        ]
+
+        tasks = {
+            task.title: task
+            for task in Task.filter_by(uuids=[task['uuid'] for task in created_tasks])
+        }
+        assert tasks['task 0'].description is None
+        assert tasks['task 0'].due_date is None
+        assert tasks['task 1'].description == 'description\t"1"\\n'
+        assert tasks['task 1'].due_date == datetime(2025, 3, 31, 11, 1)
+        assert tasks['task 2'].status == 'pending'
+        assert Task.count_by_status(user_uuids=[user.uuid])['status'] == {
+            'pending': 2,
+            'in_progress': 0,
+            'completed': 1,
+        }
+
+    def test_update_many_must_update_the_tasks_and_counters(self, db_session):
+        uuids = create_tasks_for_various_users()
+        first_user_uuid = Task.filter_by(uuids=[uuids[0]])[0].user_uuid
+        second_user_uuid = Task.filter_by(uuids=[uuids[5]])[0].user_uuid
+        counts_before = Task.count_by_status()
+
+        with count_queries() as statements:
+            updated_tasks = Task.update_many(
+                changes={'status': 'completed', 'user_uuid': second_user_uuid},
+                user_uuids=[first_user_uuid],
+                status=['pending', 'in_progress'],
+            )
+
+        assert len([s for s in statements if s.startswith('UPDATE task ')]) == 1
+        assert {str(task.uuid) for task in updated_tasks} == set(uuids[:4])
+        assert {task.previous_status for task in updated_tasks} == {
+            'pending',
+            'in_progress',
+        }
+        for task in Task.filter_by(uuids=uuids[:4]):
+            assert (task.status, task.user_uuid) == ('completed', second_user_uuid)
+
+        counts_after = Task.count_by_status()
+        assert counts_after['total'] == counts_before['total']
+        assert counts_after['status']['completed'] == (
+            counts_before['status']['completed'] + 4
+        )
+        assert Task.count_by_status(user_uuids=[first_user_uuid])['total'] == 1
+        assert TaskCounter.reconcile() == []
+
+    def test_update_many_must_require_filters_and_valid_changes(self, db_session):
+        create_tasks_for_various_users()
+
+        with pytest.raises(ValueError):
+            Task.update_many(changes={'status': 'completed'})
+        with pytest.raises(ValueError):
+            Task.update_many(changes={'title': 'Study'}, status=['pending'])
+        with pytest.raises(ValueError):
+            Task.update_many(changes={'status': 'unknown'}, status=['pending'])
+
+    def test_delete_many_must_delete_only_the_users_tasks(self, db_session):
+        uuids = create_tasks_for_various_users()
+        first_user_uuid = Task.filter_by(uuids=[uuids[0]])[0].user_uuid
+
+        with count_queries() as statements:
+            deleted_uuids = Task.delete_many(
+                user_uuid=first_user_uuid, uuids=[uuids[0], uuids[4], uuids[5]]
+            )
+
+        assert len([s for s in statements if s.startswith('DELETE FROM task ')]) == 1
+        # uuids[5] is of another user
+        assert {str(uuid) for uuid in deleted_uuids} == {uuids[0], uuids[4]}
+        assert len(Task.filter_by(uuids=uuids[:6])) == 4
+        assert Task.count_by_status(user_uuids=[first_user_uuid])['total'] == 3
+        assert TaskCounter.reconcile() == []
+
+        with pytest.raises(ValueError):
+            Task.delete_many(user_uuid=first_user_uuid, uuids=['not-an-uuid'])
+
+    def test_search_must_rank_title_matches_first_and_compose_with_filters(
+        self, db_session
+    ):
+        uuids = create_tasks_for_various_users()
+        assert len(uuids) == 15
+
+        user = User.get_by(username='jean_luc_picard')
+        description_match = Task().create(
+            user_uuid=user.uuid,
+            title='Groceries',
+            description='Buy books about math and reading',
+            status='pending',
+            due_date=datetime(2025, 1, 2),
+        )
+
+        # "Reading" tasks have it on the title, which weighs more
+        tasks = Task.filter_by(search='reading')
+        assert [str(task.uuid) for task in tasks[:2]] in (
+            [uuids[2], uuids[12]],
+            [uuids[12], uuids[2]],
+        )
+        assert tasks[2].uuid == description_match.uuid
+        assert len(tasks) == 3
+
+        tasks = Task.filter_by(
+            search='reading', user_uuids=[user.uuid], status=['pending']
+        )
+        assert [task.uuid for task in tasks] == [
+            UUID(uuids[2]),
+            description_match.uuid,
+        ]
+
+        tasks = Task.filter_by(search='reading -books', read_only=True)
+        assert {str(task.uuid) for task in tasks} == {uuids[2], uuids[12]}
+
+        stats = Task.count_by_status(search='reading')
+        assert stats['total'] == 3
+
+
+class TestTaskCounterModel:
+    def get_counts(self, user_uuid) -> Dict:
+        counters = TaskCounter.query.filter_by(user_uuid=user_uuid).all()
+        return {counter.status: counter.count for counter in counters}
+
+    def test_counters_must_follow_task_create_update_and_delete(self, db_session):
+        tasks_uuids = create_tasks_for_single_user(status=['pending', 'completed'])
+        user = User.get_by(username='jean_luc_picard')
+        assert self.get_counts(user.uuid) == {'pending': 1, 'completed': 1}
+
+        first_task = Task.filter_by(uuids=[tasks_uuids[0]])[0]
+        first_task.update(status='in_progress')
+        assert self.get_counts(user.uuid) == {
+            'pending': 0,
+            'in_progress': 1,
+            'completed': 1,
+        }
+
+        other_user = User().register(
+            username='deanna_troy', email='dt@startrek.com', password='12345678'
+        )
+        first_task.update(title='reassigned', user_uuid=other_user.uuid)
+        assert self.get_counts(user.uuid) == {
+            'pending': 0,
+            'in_progress': 0,
+            'completed': 1,
+        }
+        assert self.get_counts(other_user.uuid) == {'in_progress': 1}
+
+        deleted = Task.delete(user_uuid=str(user.uuid), uuid=tasks_uuids[1])
+        assert deleted is True
+        assert self.get_counts(user.uuid) == {
+            'pending': 0,
+            'in_progress': 0,
+            'completed': 0,
+        }
+
+        assert TaskCounter.reconcile() == []
+
+    def test_reconcile_must_fix_drifted_counters(self, db_session):
+        create_tasks_for_single_user(status=['pending', 'completed'])
+        user = User.get_by(username='jean_luc_picard')
+
+        TaskCounter.add(user_uuid=user.uuid, status='pending', delta=5)
+        TaskCounter.add(user_uuid=user.uuid, status='in_progress', delta=1)
+
+        drifts = TaskCounter.reconcile()
+        assert drifts == [
+            {
+                'user_uuid': str(user.uuid),
+                'status': 'in_progress',
+                'expected': 0,
+                'found': 1,
+            },
+            {
+                'user_uuid': str(user.uuid),
+                'status': 'pending',
+                'expected': 1,
+                'found': 6,
+            },
+        ]
+        assert self.get_counts(user.uuid) == {
+            'pending': 1,
+            'in_progress': 0,
+            'completed': 1,
+        }
+
+
+class TestIdempotencyKeyModel:
+    def test_reserve_must_return_the_existing_key_until_it_expires(self, db_session):
+        digest, request_digest = b'k' * 32, b'r' * 32
+
+        assert (
+            IdempotencyKey.reserve(
+                digest=digest, request_digest=request_digest, lock_timeout=60
+            )
+            is None
+        )
+        running_key = IdempotencyKey.reserve(
+            digest=digest, request_digest=request_digest, lock_timeout=60
+        )
+        assert running_key.status_code is None
+
+        IdempotencyKey.complete(
+            digest=digest,
+            status_code=201,
+            headers={'Content-Type': 'application/json'},
+            body=b'{}',
+            ttl=60,
+        )
+        completed_key = IdempotencyKey.reserve(
+            digest=digest, request_digest=request_digest, lock_timeout=60
+        )
+        assert (completed_key.status_code, completed_key.body) == (201, b'{}')
+
+        IdempotencyKey.complete(
+            digest=digest, status_code=201, headers={}, body=b'{}', ttl=-1
+        )
+        assert (
+            IdempotencyKey.reserve(
+                digest=digest, request_digest=request_digest, lock_timeout=60
+            )
+            is None
+        )
+
+    def test_release_must_only_free_running_keys(self, db_session):
+        IdempotencyKey.reserve(digest=b'a' * 32, request_digest=b'r', lock_timeout=60)
+        IdempotencyKey.reserve(digest=b'b' * 32, request_digest=b'r', lock_timeout=60)
+        IdempotencyKey.complete(
+            digest=b'b' * 32, status_code=200, headers={}, body=b'', ttl=60
+        )
+
+        IdempotencyKey.release(digest=b'a' * 32)
+        IdempotencyKey.release(digest=b'b' * 32)
+
+        assert db.session.get(IdempotencyKey, b'a' * 32) is None
+        assert db.session.get(IdempotencyKey, b'b' * 32) is not None
+
+    def test_sweep_must_delete_the_expired_keys_in_batches(self, db_session):
+        for index in range(5):
+            digest = bytes([index]) * 32
+            IdempotencyKey.reserve(digest=digest, request_digest=b'r', lock_timeout=60)
+            ttl = -1 if index < 4 else 60
+            IdempotencyKey.complete(
+                digest=digest, status_code=200, headers={}, body=b'', ttl=ttl
+            )
+
+        with count_queries() as statements:
+            deleted = IdempotencyKey.sweep(batch_size=3)
+
+        assert deleted == 4
+        assert len([s for s in statements if s.startswith('DELETE')]) == 2
+        assert db.session.query(IdempotencyKey).count() == 1
+
+
+class TestRevokedTokenModel:
+    def test_revoke_must_revoke_only_that_token(self, db_session):
+        user = create_user()
+        jti = str(uuid4())
+
+        RevokedToken.revoke(
+            jti=jti, user_uuid=user.uuid, expires_at=datetime.utcnow() + timedelta(1)
+        )
+        # revoking it again is a no-op
+        RevokedToken.revoke(
+            jti=jti, user_uuid=user.uuid, expires_at=datetime.utcnow() + timedelta(1)
+        )
+
+        assert RevokedToken.is_revoked(jti=jti, user_uuid=user.uuid, token_generation=0)
+        assert not RevokedToken.is_revoked(
+            jti=str(uuid4()), user_uuid=user.uuid, token_generation=0
+        )
+        assert [key for _, key in RevokedToken.get_keys_since(version=0)] == [
+            f'jti:{jti}'
+        ]
+
+    def test_password_change_must_revoke_the_tokens_of_older_generations(
+        self, db_session
+    ):
+        user = create_user()
+        assert user.token_generation == 0
+        revocation_filter.refresh()
+
+        with count_queries() as statements:
+            user.update(password='resistance-is-futile')
+        assert len(statements) == 1
+        assert user.token_generation == 1
+
+        assert RevokedToken.is_revoked(
+            jti=str(uuid4()), user_uuid=user.uuid, token_generation=0
+        )
+        assert not RevokedToken.is_revoked(
+            jti=str(uuid4()), user_uuid=user.uuid, token_generation=1
+        )
+        assert RevokedToken.get_keys_since(version=0)[0][1] == f'user:{user.uuid}'
+
+        user.update(email='picard@startrek.com')
+        assert user.token_generation == 1
+        assert len(RevokedToken.get_keys_since(version=0)) == 1
+
+    def test_get_keys_since_must_skip_older_and_expired_revocations(self, db_session):
+        user = create_user()
+        for days in (1, -1, 1):
+            RevokedToken.revoke(
+                jti=str(uuid4()),
+                user_uuid=user.uuid,
+                expires_at=datetime.utcnow() + timedelta(days),
+            )
+
+        first, last = RevokedToken.get_keys_since(version=0)
+        assert RevokedToken.get_keys_since(version=first[0]) == [last]
+        assert RevokedToken.get_keys_since(version=last[0]) == []
+
+    def test_sweep_must_delete_the_expired_revocations_in_batches(self, db_session):
+        user = create_user()
+        for index in range(5):
+            RevokedToken.revoke(
+                jti=str(uuid4()),
+                user_uuid=user.uuid,
+                expires_at=datetime.utcnow() + timedelta(-1 if index < 4 else 1),
+            )
+
+        with count_queries() as statements:
+            deleted = RevokedToken.sweep(batch_size=3)
+
+        assert deleted == 4
+        assert len([s for s in statements if s.startswith('DELETE')]) == 2
+        assert db.session.query(RevokedToken).count() == 1
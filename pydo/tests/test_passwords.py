@@ -0,0 +1,51 @@
+import pytest
+
+from pydo.exceptions import PasswordHasherBusyError
+from pydo.passwords import PasswordHasher, get_rounds
+
+
+@pytest.fixture(params=[0, 1], ids=['inline', 'pool'])
+def password_hasher(request):
+    hasher = PasswordHasher()
+    hasher.init_app(rounds=4, workers=request.param, max_pending=1, queue_timeout=0)
+    return hasher
+
+
+def test_hasher_must_hash_and_check_passwords(password_hasher):
+    password_hash = password_hasher.hash('12345678')
+
+    assert get_rounds(password_hash) == 4
+    assert password_hasher.check(password_hash, '12345678')
+    assert not password_hasher.check(password_hash, '87654321')
+    assert not password_hasher.needs_rehash(password_hash)
+
+    password_hasher.rounds = 5
+    assert password_hasher.needs_rehash(password_hash)
+
+
+def test_hasher_must_report_its_metrics(password_hasher):
+    password_hasher.hash('12345678')
+    password_hasher.hash('87654321')
+
+    metrics = password_hasher.get_metrics()
+
+    assert metrics['operations'] == 2
+    assert metrics['rejected'] == 0
+    assert metrics['hash_time_ms']['average'] > 0
+    assert metrics['hash_time_ms']['max'] >= metrics['hash_time_ms']['average']
+    assert metrics['queue_wait_ms']['max'] >= 0
+
+
+def test_hasher_must_reject_operations_above_max_pending():
+    password_hasher = PasswordHasher()
+    password_hasher.init_app(rounds=4, workers=1, max_pending=1, queue_timeout=0)
+    # as if 2 operations were running or waiting for the pool
+    password_hasher.slots.acquire()
+    password_hasher.slots.acquire()
+
+    with pytest.raises(PasswordHasherBusyError):
+        password_hasher.hash('12345678')
+
+    assert password_hasher.get_metrics()['rejected'] == 1
+    password_hasher.slots.release()
+    assert password_hasher.check(password_hasher.hash('12345678'), '12345678')
@@ -0,0 +1,126 @@
+from uuid import uuid4
+
+from pydo.revocation import BloomFilter, RevocationFilter
+
+
+def test_bloom_filter_must_not_have_false_negatives():
+    bloom = BloomFilter(capacity=1000, false_positive_rate=0.01)
+    items = [f'jti:{uuid4()}' for _ in range(1000)]
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+    assert bloom.count == 1000
+
+
+def test_bloom_filter_must_keep_its_false_positive_rate():
+    bloom = BloomFilter(capacity=1000, false_positive_rate=0.01)
+    for _ in range(1000):
+        bloom.add(f'jti:{uuid4()}')
+
+    false_positives = sum(f'jti:{uuid4()}' in bloom for _ in range(10_000))
+    assert false_positives < 300
+
+
+class FakeRevocations:
+    def __init__(self):
+        self.revocations = []
+        self.versions = []
+
+    def add(self, key: str, revocation_id: int = None):
+        revocation_id = revocation_id or len(self.revocations) + 1
+        self.revocations.append((revocation_id, key))
+
+    def load(self, version: int):
+        self.versions.append(version)
+        return sorted(
+            revocation for revocation in self.revocations if revocation[0] > version
+        )
+
+
+def create_filter(
+    revocations: FakeRevocations,
+    poll_interval: float = 0,
+    rebuild_interval: float = 3600,
+    capacity: int = 100,
+    poll_overlap: int = 0,
+) -> RevocationFilter:
+    revocation_filter = RevocationFilter()
+    revocation_filter.init_app(
+        capacity=capacity,
+        false_positive_rate=0.001,
+        poll_interval=poll_interval,
+        rebuild_interval=rebuild_interval,
+        poll_overlap=poll_overlap,
+        load_revocations=revocations.load,
+    )
+    return revocation_filter
+
+
+def test_filter_must_poll_only_the_new_revocations():
+    revocations = FakeRevocations()
+    revocations.add('jti:a')
+    revocation_filter = create_filter(revocations=revocations)
+
+    assert revocation_filter.might_contain(keys=['jti:a'])
+    assert not revocation_filter.might_contain(keys=['jti:b'])
+
+    revocations.add('jti:b')
+    assert revocation_filter.might_contain(keys=['jti:b'])
+    assert revocations.versions == [0, 1, 1]
+
+
+def test_filter_must_not_poll_before_the_interval():
+    revocations = FakeRevocations()
+    revocation_filter = create_filter(revocations=revocations, poll_interval=3600)
+
+    assert not revocation_filter.might_contain(keys=['jti:a'])
+    revocations.add('jti:a')
+    assert not revocation_filter.might_contain(keys=['jti:a'])
+
+    # the ones of this process are seen right away
+    revocation_filter.add(keys=['jti:b'])
+    assert revocation_filter.might_contain(keys=['jti:b'])
+    assert revocations.versions == [0]
+
+
+def test_filter_must_be_rebuilt_after_the_interval_or_when_full():
+    revocations = FakeRevocations()
+    revocation_filter = create_filter(revocations=revocations, rebuild_interval=0)
+
+    revocation_filter.might_contain(keys=['jti:a'])
+    revocation_filter.might_contain(keys=['jti:a'])
+    assert revocations.versions == [0, 0]
+
+    revocations = FakeRevocations()
+    revocation_filter = create_filter(revocations=revocations, capacity=2)
+    for key in ('jti:a', 'jti:b', 'jti:c'):
+        revocations.add(key)
+    revocation_filter.might_contain(keys=['jti:a'])
+    revocation_filter.might_contain(keys=['jti:a'])
+    assert revocations.versions == [0, 3]
+    # rebuilt with room for twice the revocations
+    assert revocation_filter.bloom.capacity == 6
+
+
+def test_filter_must_pick_up_revocations_committed_out_of_order():
+    revocations = FakeRevocations()
+    revocation_filter = create_filter(revocations=revocations, poll_overlap=10)
+
+    # the revocation with id 2 commits before the one with id 1
+    revocations.add('jti:a', revocation_id=2)
+    assert revocation_filter.might_contain(keys=['jti:a'])
+    revocations.add('jti:b', revocation_id=1)
+    assert revocation_filter.might_contain(keys=['jti:b'])
+
+    # the reloaded revocations are not added again
+    revocation_filter.might_contain(keys=['jti:b'])
+    assert revocation_filter.bloom.count == 2
+    assert revocations.versions == [0, 0, 0]
+
+    # only the last poll_overlap ids are reloaded
+    revocations.add('jti:c', revocation_id=20)
+    revocation_filter.might_contain(keys=['jti:c'])
+    revocation_filter.might_contain(keys=['jti:c'])
+    assert revocations.versions[-1] == 10
+    assert revocation_filter.recent_ids == {20}
@@ -0,0 +1,108 @@
+import logging
+
+import pytest
+from flask import g
+from flask_jwt_extended import create_access_token
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+
+from pydo import settings, tracing
+from pydo.extensions import db
+from pydo.models import User
+
+
+@pytest.fixture
+def trace_logs(caplog):
+    # the "pydo" logger does not propagate, so caplog must be attached to it
+    caplog.set_level(logging.INFO, logger=tracing.logger.name)
+    tracing.logger.addHandler(caplog.handler)
+    yield caplog
+    tracing.logger.removeHandler(caplog.handler)
+
+
+@pytest.fixture
+def request_headers(db_session):
+    user = User().register(
+        username='jean_luc_picard', email='jlp@startrek.com', password='12345678'
+    )
+    access_token = create_access_token(identity=str(user.uuid))
+    return {'Authorization': f'Bearer {access_token}'}
+
+
+def get_messages(trace_logs, prefix):
+    return [
+        record.getMessage()
+        for record in trace_logs.records
+        if record.getMessage().startswith(prefix)
+    ]
+
+
+def test_requests_must_not_be_traced_by_default(
+    test_client, request_headers, trace_logs
+):
+    headers = {**request_headers, tracing.TRACE_HEADER: '1'}
+    response = test_client.get('/tasks', headers=headers, json={})
+    assert response.status_code == 200
+
+    assert get_messages(trace_logs, 'SQL') == []
+
+
+def test_request_header_must_trace_request_when_allowed(
+    monkeypatch, test_client, request_headers, trace_logs
+):
+    monkeypatch.setattr(settings, 'SQL_TRACE_ALLOW_REQUEST_HEADER', True)
+
+    headers = {**request_headers, tracing.TRACE_HEADER: '1'}
+    response = test_client.get('/tasks', headers=headers, json={})
+    assert response.status_code == 200
+
+    traces = get_messages(trace_logs, 'SQL trace: SELECT')
+    tasks_traces = [trace for trace in traces if 'FROM task JOIN "user"' in trace]
+    assert len(tasks_traces) == 1
+    assert '| rows=0 |' in tasks_traces[0]
+    assert get_messages(trace_logs, 'SQL slow query') == []
+
+
+def test_bind_parameters_must_not_be_logged(monkeypatch, app, db_session, trace_logs):
+    monkeypatch.setattr(settings, 'SQL_SLOW_QUERY_MS', 0)
+
+    with app.test_request_context():
+        g.sql_trace = True
+        db.session.execute(text('SELECT :password_hash'), {'password_hash': 'secret'})
+
+    traces = get_messages(trace_logs, 'SQL trace: SELECT')
+    slow_queries = get_messages(trace_logs, 'SQL slow query')
+    assert len(traces) == 1
+    assert len(slow_queries) == 1
+    assert not any('secret' in message for message in traces + slow_queries)
+
+
+def test_failed_statements_must_not_affect_the_next_ones(app, db_session, trace_logs):
+    with app.test_request_context():
+        g.sql_trace = True
+        savepoint = db.session.begin_nested()
+        with pytest.raises(ProgrammingError):
+            db.session.execute(text('SELECT * FROM missing_table'))
+        savepoint.rollback()
+
+        # the next statements, on the same connection, are not traced
+        g.sql_trace = False
+        db.session.execute(text('SELECT 1'))
+
+    assert get_messages(trace_logs, 'SQL trace: SELECT') == []
+
+
+def test_sampled_slow_queries_must_be_explained(
+    monkeypatch, test_client, request_headers, trace_logs
+):
+    monkeypatch.setattr(settings, 'SQL_TRACE_SAMPLE_RATE', 1.0)
+    monkeypatch.setattr(settings, 'SQL_SLOW_QUERY_MS', 0)
+
+    response = test_client.get('/tasks', headers=request_headers, json={})
+    assert response.status_code == 200
+
+    slow_queries = get_messages(trace_logs, 'SQL slow query')
+    assert slow_queries
+    for slow_query in slow_queries:
+        assert 'actual time=' in slow_query
+        assert 'Execution Time' in slow_query
@@ -1,9 +1,30 @@
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import List
 
+from sqlalchemy import event
+
+from pydo.extensions import db
 from pydo.models import User, Task
 
 
+@contextmanager
+def count_queries():
+    """
+    Collect the SQL statements sent to the database while inside this context.
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
 def create_multi_users():
     created_users = []
     users_data = [
@@ -0,0 +1,117 @@
+"""
+Opt-in tracing of the SQL statements run while handling requests.
+
+It is disabled by default, so it costs nothing on most requests. A request
+is traced when it is sampled (see SQL_TRACE_SAMPLE_RATE on the settings) or,
+if allowed by the settings, when it has the "X-SQL-Trace: 1" header.
+
+For each statement of a traced request, its normalized SQL, row count and
+duration are logged. The bind parameters are not, since they may have secrets
+(e.g. password hashes). Traced SELECTs slower than SQL_SLOW_QUERY_MS also have
+their "EXPLAIN (ANALYZE, BUFFERS)" logged. Since "ANALYZE" runs the statement
+again, this only happens for traced requests.
+"""
+
+import logging
+import time
+from random import random
+
+from flask import Flask, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from pydo import settings
+from pydo.commons import normalize_sql
+
+logger = logging.getLogger(__name__)
+
+TRACE_HEADER = 'X-SQL-Trace'
+# attribute of the execution context with the time its statement started
+START_TIME_ATTRIBUTE = '_sql_trace_start_time'
+
+
+def init_sql_tracing(app: Flask):
+    app.before_request(decide_request_trace)
+
+    if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+        event.listen(Engine, 'handle_error', handle_error)
+
+
+def decide_request_trace():
+    requested = (
+        settings.SQL_TRACE_ALLOW_REQUEST_HEADER
+        and request.headers.get(TRACE_HEADER) == '1'
+    )
+    g.sql_trace = requested or random() < settings.SQL_TRACE_SAMPLE_RATE
+
+
+def is_tracing_enabled() -> bool:
+    return has_request_context() and g.get('sql_trace', False)
+
+
+# pylint: disable=unused-argument,too-many-arguments
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # NOTE: kept on the execution context (instead of e.g. the connection, which
+    #       is reused by other requests), so it is discarded with the statement
+    if context is not None and is_tracing_enabled():
+        setattr(context, START_TIME_ATTRIBUTE, time.perf_counter())
+
+
+# pylint: disable=unused-argument,too-many-arguments
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_time = getattr(context, START_TIME_ATTRIBUTE, None)
+    if start_time is None:
+        return
+    delattr(context, START_TIME_ATTRIBUTE)
+
+    duration_ms = (time.perf_counter() - start_time) * 1000
+    normalized_statement = normalize_sql(statement=statement)
+
+    logger.info(
+        f'SQL trace: {normalized_statement} '
+        f'| rows={cursor.rowcount} | duration={duration_ms:.2f}ms'
+    )
+
+    is_slow = duration_ms >= settings.SQL_SLOW_QUERY_MS
+    is_select = normalized_statement.upper().startswith('SELECT')
+    if is_slow and is_select and not executemany:
+        query_plan = explain_statement(
+            conn=conn, statement=statement, parameters=parameters
+        )
+        logger.warning(
+            f'SQL slow query ({duration_ms:.2f}ms): {normalized_statement}\n'
+            f'{query_plan}'
+        )
+
+
+def handle_error(exception_context):
+    # the statement failed, so "after_cursor_execute" is not called for it
+    context = exception_context.execution_context
+    if context is not None and hasattr(context, START_TIME_ATTRIBUTE):
+        delattr(context, START_TIME_ATTRIBUTE)
+
+
+def explain_statement(conn, statement: str, parameters) -> str:
+    """
+    Get the "EXPLAIN (ANALYZE, BUFFERS)" of a statement.
+
+    It runs inside a savepoint, so that if it fails the transaction
+    of the request is not aborted.
+    """
+    explain_cursor = conn.connection.cursor()
+    try:
+        explain_cursor.execute('SAVEPOINT sql_trace_explain')
+        try:
+            explain_cursor.execute(
+                f'EXPLAIN (ANALYZE, BUFFERS) {statement}', parameters
+            )
+            query_plan = '\n'.join(row[0] for row in explain_cursor.fetchall())
+            explain_cursor.execute('RELEASE SAVEPOINT sql_trace_explain')
+        except Exception as exc:
+            explain_cursor.execute('ROLLBACK TO SAVEPOINT sql_trace_explain')
+            query_plan = f'(could not explain the query: {exc})'
+        return query_plan
+    finally:
+        explain_cursor.close()